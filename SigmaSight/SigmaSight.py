@@ -1,255 +1,49 @@
 ## Imports
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from datetime import datetime
-from watchlist import open_watchlist
+import startup  # Starts the startup clock, keep this first
+import tracing
+
+from workers import UiWorkerPool
 from tkinter import PhotoImage  
 
-import yfinance as yf
-import matplotlib.ticker as mticker
-import matplotlib.pyplot as plt
 import customtkinter as ctk
 
 import os
+import time
 import tkinter as tk
+import traceback
 
-## Graph Formatting
-def format_num(value, tick_number):
-    # Format the number based on its size
-    if value >= 1e12:
-        return f'{value * 1e-12:.0f}T'
-    elif value >= 1e9:
-        return f'{value * 1e-9:.0f}B'  # Billions
-    elif value >= 1e6:
-        return f'{value * 1e-6:.0f}M'  # Millions
-    elif value >= 1e3:
-        return f'{value * 1e-3:.0f}K'  # Thousands
-    else:
-        return f'{value}'  # Less than thousand
-    
-def set_colours(ax):
-    ax.spines['bottom'].set_color('white')
-    ax.spines['top'].set_color('black')
-    ax.spines['left'].set_color('black')
-    ax.spines['right'].set_color('black')
-    
-    ax.xaxis.label.set_color('white')
-    ax.yaxis.label.set_color('white')
-    
-    ax.set_facecolor('black') 
-    
-    ax.tick_params(axis='x', colors='white')  # Set tick label color
-    ax.tick_params(axis='y', colors='white')  # Set y-tick color
-    ax.tick_params(bottom=True, left=False)
-    
-    ax.set_axisbelow(True)
-    
-    ax.yaxis.grid(True, color='#333333')
-    ax.xaxis.grid(False)
+startup.mark('imports')
 
-## Graphs
-def plot_stock_ytd(stock_symbol, ax):
-    today = datetime.today().strftime('%Y-%m-%d')
-    stock_data = yf.download(stock_symbol, start=f'{datetime.today().year}-01-01', end=today, multi_level_index=False)
-    
-    # Plot the stock data
-    ax.plot(stock_data.index, stock_data['Close'], label='YTD Price', color='blue')
-    ax.set_title('Year-to-Date Price', color='white', loc='left')
-    
-    # Format x-axis to show only the month numbers
-    months = stock_data.index.strftime('%m')  # Extract only month numbers
-    ax.set_xticks(stock_data.index[::30])  # Set ticks approximately monthly (adjust the step if necessary)
-    ax.set_xticklabels(months[::30], fontsize=8)  # Use month numbers for the labels
+# matplotlib, pandas and the data modules take longer to import than the
+# window takes to build, so they are imported after the first paint
+def import_dashboard_modules():
+    import matplotlib.pyplot
+    import matplotlib.backends.backend_tkagg
+    import charts
+    import prefetch
+    import sidebar
+    import snapshot
 
-    # Label the x-axis
-    ax.set_xlabel('Month', fontsize=8, color='white')
-    
-    # Format y-axis
-    ax.yaxis.set_major_formatter(mticker.FuncFormatter(format_num))
-    
-    # Set chart colors and other properties
-    set_colours(ax)
-    ax.tick_params(axis='x', labelsize=6)
-    ax.tick_params(axis='y', labelsize=6)
-    ax.legend()
-
-def plot_revenue(stock_symbol, ax):
-    stock = yf.Ticker(stock_symbol)
-    financials = stock.financials.T
-    revenue = financials['Total Revenue'].dropna()
-    revenue = revenue[revenue.index.year >= 2002]
-    
-    ax.bar(revenue.index.year, revenue.values, color='#3b86ff', width=0.95)
-    ax.set_title('Revenue', color='white', loc='left', fontsize=18, x=-0.1258)
+def dashboard_datasets():
+    # Everything an update loads for the charts and the sidebar
+    from charts import CHART_LAYOUT
+    from sidebar import SIDEBAR_DATASETS
+    return list(dict.fromkeys([dataset for _, datasets in CHART_LAYOUT.values() for dataset in datasets] + SIDEBAR_DATASETS))
 
-    ax.set_xticks(revenue.index.year)
-    ax.set_xticklabels(revenue.index.year, fontsize=6)
-    ax.tick_params(axis='y', labelsize=6)
-    ax.yaxis.set_major_formatter(mticker.FuncFormatter(format_num))
+# The 3x4 chart grid, see CHART_LAYOUT in charts.py
+CHART_POSITIONS = [(i, j) for i in range(3) for j in range(4)]
 
-    set_colours(ax)
+def entered_symbols(text, limit=None):
+    # "AAPL, msft GOOG" -> ['AAPL', 'MSFT', 'GOOG'], more than one are
+    # compared, up to charts.MAX_COMPARE
+    symbols = text.replace(',', ' ').upper().split()
+    return list(dict.fromkeys(symbols))[:limit]
 
-def plot_ebitda(stock_symbol, ax):
-    stock = yf.Ticker(stock_symbol)
-    financials = stock.financials.T
-    ebitda = financials['EBITDA'].dropna()
-    ebitda = ebitda[ebitda.index.year >= 2002]
-    
-    ax.bar(ebitda.index.year, ebitda.values, color='#00b5d9', width=0.95)
-    ax.set_title('EBITDA', color='white', loc='left', x=-0.1258)
-    ax.set_xticks(ebitda.index.year)
-    ax.set_xticklabels(ebitda.index.year, fontsize=6)
-    ax.tick_params(axis='y', labelsize=6)
-    ax.yaxis.set_major_formatter(mticker.FuncFormatter(format_num))
-    set_colours(ax)
-
-def plot_free_cash_flow(stock_symbol, ax):
-    stock = yf.Ticker(stock_symbol)
-    financials = stock.cashflow.T
-    free_cash_flow = financials['Free Cash Flow'].dropna()
-    free_cash_flow = free_cash_flow[free_cash_flow.index.year >= 2002]
-    
-    ax.bar(free_cash_flow.index.year, free_cash_flow.values, color='#03045e', width=0.95)
-    ax.set_title('Free Cash Flow', color='white',  loc='left', x=-0.1258)
-    ax.set_xticks(free_cash_flow.index.year)
-    ax.set_xticklabels(free_cash_flow.index.year, fontsize=6)
-    ax.tick_params(axis='y', labelsize=6)
-    ax.yaxis.set_major_formatter(mticker.FuncFormatter(format_num))
-    set_colours(ax)
-
-def plot_net_income(stock_symbol, ax):
-    stock = yf.Ticker(stock_symbol)
-    financials = stock.financials.T
-    net_income = financials['Net Income'].dropna()
-    net_income = net_income[net_income.index.year >= 2002]
-    
-    ax.bar(net_income.index.year, net_income.values, color='#004d00', width=0.95)
-    ax.set_title('Net Income', color='white', loc='left', x=-0.1258)
-    ax.set_xticks(net_income.index.year)
-    ax.set_xticklabels(net_income.index.year, fontsize=6)
-    ax.tick_params(axis='y', labelsize=6)
-    ax.yaxis.set_major_formatter(mticker.FuncFormatter(format_num))
-    set_colours(ax)
-    
-def plot_eps(stock_symbol, ax):
-    stock = yf.Ticker(stock_symbol)
-    financials = stock.financials.T
-    shares_outstanding = stock.balance_sheet.T['Ordinary Shares Number'].dropna()
-    net_income = financials['Net Income'].dropna()
-    eps = net_income / shares_outstanding
-    eps = eps[eps.index.year >= 2002]
-    
-    ax.bar(eps.index.year, eps.values, color='#009933', width=0.95)
-    ax.set_title('Earnings Per Share (EPS)', color='white',  loc='left', x=-0.1258)
-    ax.set_xticks(eps.index.year)
-    ax.set_xticklabels(eps.index.year, fontsize=6)
-    ax.tick_params(axis='y', labelsize=6)
-    ax.yaxis.set_major_formatter(mticker.FuncFormatter(format_num))
-    set_colours(ax)
-
-def plot_cash_debt(stock_symbol, ax):
-    stock = yf.Ticker(stock_symbol)
-    balance_sheet = stock.balance_sheet.T
-    cash = balance_sheet['Cash And Cash Equivalents'].dropna()
-    debt = balance_sheet['Total Debt'].dropna()
-    cash = cash[cash.index.year >= 2002]
-    debt = debt[debt.index.year >= 2002]
-    
-    ax.bar(cash.index.year - 0.2, cash.values, width=0.475, label='Cash', color='#00d346')
-    ax.bar(debt.index.year + 0.2, debt.values, width=0.475, label='Debt', color='#e31c1c')
-    ax.set_title('Cash & Debt', color='white',  loc='left', x=-0.1258)
-    ax.set_xticks(cash.index.year)
-    ax.set_xticklabels(cash.index.year, fontsize=6)
-    ax.tick_params(axis='y', labelsize=6)
-    ax.legend()
-    ax.yaxis.set_major_formatter(mticker.FuncFormatter(format_num))
-    set_colours(ax)
-
-def plot_dividend_rate(stock_symbol, ax):
-    stock = yf.Ticker(stock_symbol)
-    dividends = stock.dividends
-    dividend_rate = dividends.resample('YE').sum()  # Sum of dividends per year
-    dividend_rate = dividend_rate[dividend_rate.index.year >= 2000]
-    
-    # Plot the data
-    ax.bar(dividend_rate.index.year, dividend_rate.values, color='#66cc99', width=0.95)
-    ax.set_title('Dividend Rate ($)', color='white', loc='left', x=-0.1258)
-    
-    years = dividend_rate.index.year
-    ax.set_xticks(years[::5])
-    ax.set_xticklabels(years[::5], fontsize=6)
-    
-    ax.tick_params(axis='y', labelsize=6)
-    
-    set_colours(ax)
-
-def plot_shares_outstanding(stock_symbol, ax):
-    stock = yf.Ticker(stock_symbol)
-    shares_outstanding = stock.balance_sheet.T['Ordinary Shares Number'].dropna()
-    shares_outstanding = shares_outstanding[shares_outstanding.index.year >= 2002]
-    
-    ax.bar(shares_outstanding.index.year, shares_outstanding.values, color='#FFD700', width=0.95)
-    ax.set_title('Shares Outstanding (Billion)', color='white',  loc='left', x=-0.1258)
-    ax.set_xticks(shares_outstanding.index.year)
-    ax.set_xticklabels(shares_outstanding.index.year, fontsize=6)
-    ax.tick_params(axis='y', labelsize=6)
-    ax.yaxis.set_major_formatter(mticker.FuncFormatter(format_num))
-    set_colours(ax)
-
-def plot_market_cap(stock_symbol, ax):
-    stock = yf.Ticker(stock_symbol)
-    stock_data = yf.download(stock_symbol, start='2002-01-01', multi_level_index=False)
-    shares_outstanding = stock.balance_sheet.T['Ordinary Shares Number'].dropna()
-    
-    market_cap = stock_data['Close'] * (shares_outstanding)  # Convert to billions
-    market_cap = market_cap.dropna()  # Remove empty values
-    
-    ax.bar(market_cap.index.year, market_cap.values, color='#FFA500', width=0.95)
-    ax.set_title('Market Capitalization', color='white',  loc='left', x=-0.1258)
-    ax.set_xticks(market_cap.index.year)
-    ax.set_xticklabels(market_cap.index.year, fontsize=6)
-    ax.tick_params(axis='y', labelsize=6)
-    ax.yaxis.set_major_formatter(mticker.FuncFormatter(format_num))
-    set_colours(ax)
-
-def plot_ev(stock_symbol, ax):
-    stock = yf.Ticker(stock_symbol)
-    stock_data = yf.download(stock_symbol, start='2002-01-01', multi_level_index=False)
-    balance_sheet = stock.balance_sheet.T
-    cash = balance_sheet['Cash And Cash Equivalents'].dropna()
-    total_debt = balance_sheet['Total Debt'].dropna()
-    shares_outstanding = balance_sheet['Ordinary Shares Number'].dropna()
-    
-    market_cap = stock_data['Close'] * (shares_outstanding)  # Convert to billions
-    ev = market_cap + total_debt - cash  # Enterprise Value formula
-    ev = ev.dropna()  # Remove empty values
-    
-    ax.bar(ev.index.year, ev.values, color='#bf9b30', width=0.95)
-    ax.set_title('Enterprise Value', color='white',  loc='left', x=-0.1258)
-    ax.set_xticks(ev.index.year)
-    ax.set_xticklabels(ev.index.year, fontsize=6)
-    ax.tick_params(axis='y', labelsize=6)
-    ax.yaxis.set_major_formatter(mticker.FuncFormatter(format_num))
-    set_colours(ax)
-
-def plot_pe_ratio(stock_symbol, ax):
-    stock = yf.Ticker(stock_symbol)
-    financials = stock.financials.T
-    shares_outstanding = stock.balance_sheet.T['Ordinary Shares Number'].dropna()
-    net_income = financials['Net Income'].dropna()
-    eps = net_income / shares_outstanding
-    stock_data = yf.download(stock_symbol, start='2002-01-01', multi_level_index=False)
-    
-    pe_ratio = stock_data['Close'] / eps  # P/E ratio
-    pe_ratio = pe_ratio.dropna()  # Remove empty values
-    
-    ax.bar(pe_ratio.index.year, pe_ratio.values, color='#ffcf40', width=0.95)
-    ax.set_title('Price/Earnings Ratio (P/E)', color='white',  loc='left', x=-0.1258)
-    ax.set_xticks(pe_ratio.index.year)
-    ax.set_xticklabels(pe_ratio.index.year, fontsize=6)
-    ax.tick_params(axis='y', labelsize=6)
-    ax.yaxis.set_major_formatter(mticker.FuncFormatter(format_num))
-    set_colours(ax)
+# The Year-to-Date price cell, it follows the first ticker intraday in live mode
+LIVE_POSITION = (0, 0)
 
+# How long the worker pool has to sit idle before likely next tickers are prefetched
+PREFETCH_IDLE_MS = 2000
 
 ##  GUI Content
 def toggle_sidebar(sidebar_frame):
@@ -269,7 +63,19 @@ def display_charts_with_sidebar(default_symbol='AAPL'):
     icon = PhotoImage(file="SigmaSight Icon.png")  
     root.iconphoto(True, icon)
     
-    root.protocol("WM_DELETE_WINDOW", root.destroy)
+    workers = UiWorkerPool(root)
+    prefetcher = []  # Created with the data modules, see get_prefetcher
+
+    def close():
+        if prefetcher:
+            prefetcher[0].cancel()
+        stop_live()
+        workers.shutdown()
+        if live_workers:
+            live_workers[0].shutdown()
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", close)
     root.state('zoomed')
     
     root.configure(background="#23222b")
@@ -284,160 +90,369 @@ def display_charts_with_sidebar(default_symbol='AAPL'):
     content_frame = ctk.CTkScrollableFrame(root, fg_color="transparent")
     content_frame.grid(row=0, column=1, sticky="nsew")
     
-    # Create a grid of frames for charts
+    # Create a grid of frames for charts. The frames are part of the first
+    # paint, the figures inside them are built once matplotlib is imported.
     chart_frames = []
     for i in range(3):  # 3 rows
         row_frames = []
         content_frame.grid_rowconfigure(i, weight=1)  # Make rows expandable
         for j in range(4):  # 4 columns
-            frame = ctk.CTkFrame(content_frame, fg_color="black", corner_radius=7.5)
+            frame = ctk.CTkFrame(content_frame, fg_color="black", corner_radius=7.5, width=450, height=350)
             frame.grid(row=i, column=j, padx=5, pady=2.5, sticky="nsew")
             
             content_frame.grid_columnconfigure(j, weight=1)  # Make columns expandable
-            
-            canvas = FigureCanvasTkAgg(plt.Figure(figsize=(4.5, 3.5), facecolor='black'), master=frame)  # Adjust size here
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx= 2.5, pady = 2.5)  # Added padding inside frame
-            
-            row_frames.append((frame, canvas))
+
+            placeholder = ctk.CTkLabel(frame, text="Loading...", text_color="white")
+            placeholder.place(relx=0.5, rely=0.5, anchor='center')
+
+            row_frames.append([frame, placeholder, None, None])  # frame, placeholder, canvas, cell
         chart_frames.append(row_frames)
-        
-    def update_charts():
-        stock_symbol = stock_symbol_var.get()
-        for i, row in enumerate(chart_frames):
-            for j, (frame, canvas) in enumerate(row):
-                canvas.figure.clear()  # Clear the figure
-                ax = canvas.figure.add_subplot(111)  # Create a new subplot for each canvas
-
-                # Fill each frame with the corresponding chart
-                if i == 0 and j == 0:
-                    plot_stock_ytd(stock_symbol, ax)  # Example for YTD chart
-                elif i == 0 and j == 1:
-                    plot_revenue(stock_symbol, ax)  # Example for Revenue chart
-                elif i == 0 and j == 2:
-                    plot_ebitda(stock_symbol, ax)  # Example for EBITDA chart
-                elif i == 0 and j == 3:
-                    plot_free_cash_flow(stock_symbol, ax)  # Example for Free Cash Flow chart
-                elif i == 1 and j == 0:
-                    plot_net_income(stock_symbol, ax)  # Example for Net Income chart
-                elif i == 1 and j == 1:
-                    plot_eps(stock_symbol, ax)  # Example for EPS chart
-                elif i == 1 and j == 2:
-                    plot_cash_debt(stock_symbol, ax)  # Example for Cash Debt chart
-                elif i == 1 and j == 3:
-                    plot_dividend_rate(stock_symbol, ax)  # Example for Dividend Rate chart
-                elif i == 2 and j == 0:
-                    plot_shares_outstanding(stock_symbol, ax)  # Example for Shares Outstanding chart
-                elif i == 2 and j == 1:
-                    plot_market_cap(stock_symbol, ax)  # Example for Market Cap chart
-                elif i == 2 and j == 2:
-                    plot_ev(stock_symbol, ax)  # Example for EV chart
-                elif i == 2 and j == 3:
-                    plot_pe_ratio(stock_symbol, ax)  # Example for PE Ratio chart
-
-                update_dividend_info(stock_symbol)
-                update_balance_info(stock_symbol)
-                update_margins_growth_info(stock_symbol)
-                update_value_info(stock_symbol)
-                update_quality_info(stock_symbol)
-                
-                canvas.draw()  # Draw the updated figure
-
-    def update_dividend_info(stock_symbol):
-        stock = yf.Ticker(stock_symbol)
-        info = stock.info
-        calendar = stock.calendar
+
+    def build_cell(position):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        import matplotlib.pyplot as plt
+        from charts import CHART_LAYOUT
+
+        entry = chart_frames[position[0]][position[1]]
+        frame, placeholder = entry[0], entry[1]
+
+        canvas = FigureCanvasTkAgg(plt.Figure(figsize=(4.5, 3.5), facecolor='black'), master=frame)  # Adjust size here
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx= 2.5, pady = 2.5)  # Added padding inside frame
+        placeholder.destroy()
+
+        # Axes and styling are built once, updates only change the data
+        make_cell, datasets = CHART_LAYOUT[position]
+        cell = make_cell(canvas.figure)
+        tracing.trace_draws(canvas, cell.title, lambda: cell.symbol)
+        entry[2], entry[3] = canvas, cell
+        if position == LIVE_POSITION and live_series[0] is not None:
+            cell.set_live(True)
+
+    def draw_chart(canvas, cell, snapshots):
         try:
-            dividend_yield.set(f"Dividend Yield: {info.get('dividendYield', 'N/A')}")
-            payout_ratio.set(f"Payout Ratio: {round(float(info.get('payoutRatio', 'N/A')) * 100, 2)}%") 
-            ex_div_date.set(f"Ex-Div Date: {datetime.fromtimestamp(info.get('exDividendDate', 'N/A')).strftime('%d/%m/%Y')}")
-            payout_date.set(f"Payout Date: {calendar.get('Dividend Date', 'N/A').strftime('%d/%m/%Y')}")
-        except Exception as e:
-            dividend_yield.set(f"N/A")
-            payout_ratio.set(f"N/A") 
-            ex_div_date.set(f"N/A")
-            payout_date.set(f"N/A")
-
-    def update_balance_info(stock_symbol):
-        stock = yf.Ticker(stock_symbol)
-        balance_sheet = stock.balance_sheet.T
-        cash = balance_sheet['Cash And Cash Equivalents'].dropna().iloc[-1] if not balance_sheet.empty else 0
-        debt = balance_sheet['Total Debt'].dropna().iloc[-1] if not balance_sheet.empty else 0
-        net = cash - debt
-        
-        cash_var.set(f"Cash: ${cash:,.2f}")
-        debt_var.set(f"Debt: ${debt:,.2f}")
-        net_var.set(f"Net: ${net:,.2f}")
-
-    def update_margins_growth_info(stock_symbol):
-        stock = yf.Ticker(stock_symbol)
-        info = stock.info
-        financials = stock.financials.T
-        
-        profit_margin_value = info.get('profitMargins', 0)
-        operating_margin_value = info.get('operatingMargins', 0)
-        
-        quarterly_earnings = financials['Gross Profit'].iloc[-1] if not financials.empty else 0
-        quarterly_revenue = financials['Total Revenue'].iloc[-1] if not financials.empty else 0
-        
-        profit_margin.set(f"Profit Margin: {profit_margin_value:.2%}" if profit_margin_value else "Profit Margin: N/A")
-        operating_margin.set(f"Operating Margin: {operating_margin_value:.2%}" if operating_margin_value else "Operating Margin: N/A")
-        quarterly_earnings_var.set(f"Quart. Earnings: ${quarterly_earnings:,.2f}" if quarterly_earnings else "Quart. Earnings: N/A")
-        quarterly_revenue_var.set(f"Quart. Revenue: ${quarterly_revenue:,.2f}" if quarterly_revenue else "Quart. Revenue: N/A")
-
-    def update_value_info(stock_symbol):
-        stock = yf.Ticker(stock_symbol)
-        info = stock.info
-        
-        market_cap.set(f"Market Cap: ${info.get('marketCap', 'N/A'):,}")
-        pe.set(f"P/E: {info.get('trailingPE', 'N/A')}")
-        price_to_sales.set(f"Price to Sales: {info.get('priceToSalesTrailing12Months', 'N/A')}")
-        ev_to_ebitda.set(f"EV/EBITDA: {info.get('enterpriseToEbitda', 'N/A')}")
-        price_to_book.set(f"Price to Book: {info.get('priceToBook', 'N/A')}")
-        free_cash_flow_yield.set(f"Free Cash Flow Yield: {info.get('freeCashflow', 'N/A')}")
-
-    def update_quality_info(stock_symbol):
-        stock = yf.Ticker(stock_symbol)
-        financials = stock.financials.T
-        balance_sheet = stock.balance_sheet.T
-        info = stock.info
-        
-        score = 0
-        profitability_criteria = [
-            info.get('netIncome', 0) > 0,
-            info.get('returnOnAssets', 0) > 0,
-            info.get('operatingCashflow', 0) > 0,
-            info.get('operatingCashflow', 0) > info.get('netIncome', 0)
-        ]
-        
-        leverage_criteria = [
-            balance_sheet['Total Debt'].dropna().iloc[-1] < balance_sheet['Total Debt'].dropna().iloc[-2],
-            info.get('currentRatio', 0) > (balance_sheet['Total Assets'].dropna().iloc[-2] / balance_sheet['Total Liabilities Net Minority Interest'].dropna().iloc[-2]),
-            info.get('sharesOutstanding', 0) <= info.get('sharesOutstanding', 0)  # Assuming no new shares were issued
-        ]
-        
-        efficiency_criteria = [
-            financials['Gross Profit'].iloc[-1] > financials['Gross Profit'].iloc[-2],
-            info.get('assetTurnover', 0) > info.get('assetTurnover', 0)  # Placeholder for actual asset turnover values
-        ]
-
-        score += sum(1 for criterion in profitability_criteria if criterion)
-        score += sum(1 for criterion in leverage_criteria if criterion)
-        score += sum(1 for criterion in efficiency_criteria if criterion)
-
-        quality_rating = ''
-        if score >= 8:
-            quality_rating = 'Superb'
-        elif score >= 6:
-            quality_rating = 'High'
-        elif score >= 4:
-            quality_rating = 'Medium'
-        elif score >= 2:
-            quality_rating = 'Okay'
+            if len(snapshots) == 1:
+                cell.update(snapshots[0])
+            else:
+                cell.compare(snapshots)
+        except Exception:
+            traceback.print_exc()
+            cell.show_message('No data')
+        canvas.draw_idle()  # Redraw once Tk is idle
+
+    def show_message(canvas, cell, message):
+        cell.show_message(message)
+        canvas.draw_idle()
+
+    def update_sidebar(snapshot):
+        for update in (update_dividend_info, update_balance_info, update_margins_growth_info, update_value_info, update_quality_info):
+            try:
+                with tracing.span(update.__name__, 'sidebar', snapshot.symbol):
+                    update(snapshot)
+            except Exception:
+                traceback.print_exc()
+        startup.mark('sidebar_loaded')
+        check_loaded()
+        schedule_debug_panel()
+
+    # Cells are fetched and drawn in the order the user can see them. Cells
+    # below the fold wait until they are scrolled into view, or until every
+    # visible cell has finished, whichever comes first.
+    pending_cells = {}  # position -> snapshots, waiting to be scrolled into view
+    loading_visible = set()  # visible cells still loading
+    drawn_cells = set()  # cells showing the current symbol
+    arrived = {}  # position -> (snapshots, ok) for data that came in before the cell was built
+    scroll_poll = [None]  # after id of the next scroll check, None when no cell is waiting
+
+    def cell_visible(position):
+        frame = chart_frames[position[0]][position[1]][0]
+        if root.winfo_height() <= 1:
+            return position[0] == 0  # Not laid out yet, assume the first row shows
+        top = frame.winfo_rooty() - root.winfo_rooty()
+        return top < root.winfo_height() and top + frame.winfo_height() > 0
+
+    def finish_cell(position, snapshots, ok):
+        frame, placeholder, canvas, cell = chart_frames[position[0]][position[1]]
+        if cell is None:
+            arrived[position] = (snapshots, ok)  # Drawn by build_cells
+            return
+        if position == LIVE_POSITION and live_series[0] is not None:
+            pass  # Showing intraday prices, see show_live
+        elif ok:
+            draw_chart(canvas, cell, snapshots)
+        else:
+            show_message(canvas, cell, 'No data')
+        drawn_cells.add(position)
+        check_loaded()
+        schedule_debug_panel()
+
+    def load_cell(position, snapshots):
+        from charts import CHART_LAYOUT
+        make_cell, datasets = CHART_LAYOUT[position]
+
+        # One task per ticker, so the tickers of a comparison load side by
+        # side. The cell draws once all of them are in, without any that failed.
+        waiting = [len(snapshots)]
+        loaded = set()
+
+        def finished(snapshot, ok):
+            if ok:
+                loaded.add(snapshot.symbol)
+            waiting[0] -= 1
+            if waiting[0] == 0:
+                ready = [snapshot for snapshot in snapshots if snapshot.symbol in loaded]
+                finish_cell(position, ready, bool(ready))
+                cell_finished(position)
+
+        for snapshot in snapshots:
+            workers.submit(lambda snapshot=snapshot: snapshot.load(*datasets),
+                           lambda _, snapshot=snapshot: finished(snapshot, True),
+                           lambda error, snapshot=snapshot: finished(snapshot, False))
+
+    def cell_finished(position):
+        loading_visible.discard(position)
+        if not loading_visible:
+            startup.mark('visible_loaded')
+            # Everything on screen is drawn, fill in the rest in the background
+            for position, snapshots in list(pending_cells.items()):
+                del pending_cells[position]
+                load_cell(position, snapshots)
+
+    def load_scrolled_cells():
+        # Checks every 150 ms while cells are waiting, update_charts starts it again
+        scroll_poll[0] = None
+        for position, snapshots in list(pending_cells.items()):
+            if cell_visible(position):
+                del pending_cells[position]
+                loading_visible.add(position)
+                load_cell(position, snapshots)
+        watch_scrolling()
+
+    def watch_scrolling():
+        if pending_cells and scroll_poll[0] is None:
+            scroll_poll[0] = root.after(150, load_scrolled_cells)
+
+    def check_loaded():
+        # Reported once, for the default symbol
+        if startup.marked('sidebar_loaded') and len(drawn_cells) == len(CHART_POSITIONS) and not startup.marked('fully_loaded'):
+            startup.mark('fully_loaded')
+            startup.write_report()
+
+    def update_charts():
+        from charts import MAX_COMPARE
+        from sidebar import SIDEBAR_DATASETS
+        from snapshot import TickerSnapshot
+        import watchlist_store
+
+        symbols = entered_symbols(stock_symbol_var.get(), MAX_COMPARE)
+        if not symbols:
+            return
+
+        # Drop anything still loading for the previous symbol
+        workers.new_generation()
+        pending_cells.clear()
+        loading_visible.clear()
+        drawn_cells.clear()
+        arrived.clear()
+        shown[0] = None
+
+        # Stop warming other tickers, this update gets the rate limit to itself
+        get_prefetcher().cancel()
+        snapshots = [get_prefetcher().take(symbol) or TickerSnapshot(symbol) for symbol in symbols]
+        shown[0] = snapshots
+        tracing.begin_update(','.join(symbols))
+        workers.submit(lambda: [watchlist_store.viewed(symbol) for symbol in reversed(symbols)], lambda _: None)
+        schedule_prefetch()
+
+        # The sidebar shows the first ticker when comparing
+        snapshot = snapshots[0]
+        workers.submit(lambda: snapshot.load(*SIDEBAR_DATASETS), lambda _: update_sidebar(snapshot))
+
+        # Fetch on the worker pool, each cell draws as soon as its data arrives
+        for position in CHART_POSITIONS:
+            frame, placeholder, canvas, cell = chart_frames[position[0]][position[1]]
+            if cell is not None:
+                show_message(canvas, cell, 'Loading...')
+            if cell_visible(position):
+                loading_visible.add(position)
+            else:
+                pending_cells[position] = snapshots
+
+        for position in list(loading_visible):
+            load_cell(position, snapshots)
+        if not loading_visible:
+            cell_finished(None)
+        watch_scrolling()
+        if live_series[0] is not None:
+            start_live(symbols[0])
+
+    ## Prefetch
+    # Watchlist and recently viewed tickers load in the background once an
+    # update has finished, so switching to one of them is instant
+    pending_prefetch = [None]
+
+    def get_prefetcher():
+        if not prefetcher:
+            from prefetch import Prefetcher
+            prefetcher.append(Prefetcher(dashboard_datasets()))
+        return prefetcher[0]
+
+    def schedule_prefetch():
+        if pending_prefetch[0] is not None:
+            root.after_cancel(pending_prefetch[0])
+        pending_prefetch[0] = root.after(PREFETCH_IDLE_MS, start_prefetch)
+
+    def start_prefetch():
+        pending_prefetch[0] = None
+        if workers.pending:
+            schedule_prefetch()  # Still loading the current ticker
+            return
+        get_prefetcher().start(exclude=entered_symbols(stock_symbol_var.get()))
+
+    ## Watchlist
+    # Built the first time it is opened and hidden when closed, so it opens
+    # instantly after that. It shares the worker threads, cache and request
+    # layer with the dashboard, clicking a ticker shows it here.
+    watchlist_window = []  # Function that shows the watchlist again
+
+    def open_watchlist():
+        if watchlist_window:
+            watchlist_window[0]()
+            return
+        from watchlist import open_watchlist
+        watchlist_window.append(open_watchlist(root, workers.share(), on_select=show_symbol))
+
+    def show_symbol(ticker):
+        stock_symbol_var.set(ticker)
+        update_charts()
+        root.lift()
+
+    ## Price history
+    # A window of its own, built and hidden like the watchlist, showing the
+    # first ticker entered
+    price_history_window = []  # Function that shows a ticker's price history
+
+    def open_price_history():
+        symbols = entered_symbols(stock_symbol_var.get(), 1)
+        if not price_history_window:
+            from price_history import open_price_history
+            price_history_window.append(open_price_history(root, workers.share()))
+        price_history_window[0](symbols[0] if symbols else '')
+
+    ## Live mode
+    # The Year-to-Date cell shows the first ticker's minute bars, polled on a
+    # worker of its own so that chart updates do not drop the polls
+    live_var = tk.BooleanVar(value=False)
+    live_series = [None]
+    pending_live = [None]
+    live_workers = []  # Pool and feed, created the first time live mode is on
+    shown = [None]  # Snapshots of the last update
+
+    def toggle_live():
+        symbols = entered_symbols(stock_symbol_var.get())
+        if live_var.get() and symbols:
+            start_live(symbols[0])
+            return
+        live_var.set(False)
+        stop_live()
+        frame, placeholder, canvas, cell = chart_frames[LIVE_POSITION[0]][LIVE_POSITION[1]]
+        if cell is not None:
+            cell.set_live(False)
+            show_message(canvas, cell, 'Loading...')
+        if shown[0]:
+            load_cell(LIVE_POSITION, shown[0])  # Daily prices again
+
+    def start_live(symbol):
+        from live import LiveSeries, feed_from_env
+        stop_live()
+        if not live_workers:
+            live_workers.extend([UiWorkerPool(root, max_workers=1), feed_from_env()])
+        live_series[0] = LiveSeries(symbol, live_workers[1])
+
+        frame, placeholder, canvas, cell = chart_frames[LIVE_POSITION[0]][LIVE_POSITION[1]]
+        if cell is not None:
+            cell.set_live(True)
+            show_message(canvas, cell, 'Loading...')
+        poll_live()
+
+    def stop_live():
+        if pending_live[0] is not None:
+            root.after_cancel(pending_live[0])
+            pending_live[0] = None
+        live_series[0] = None
+        if live_workers:
+            live_workers[0].new_generation()  # Drop a poll still running
+
+    def poll_live():
+        from live import POLL_SECONDS
+        pending_live[0] = root.after(int(POLL_SECONDS * 1000), poll_live)
+        if live_workers[0].pending:
+            return  # The last poll has not come back yet
+        series = live_series[0]
+        live_workers[0].submit(series.fetch, lambda bars: show_live(series, bars))
+
+    def show_live(series, bars):
+        frame, placeholder, canvas, cell = chart_frames[LIVE_POSITION[0]][LIVE_POSITION[1]]
+        if series is not live_series[0] or cell is None:
+            return
+        if series.append(bars) or len(series.buffer) == 0:
+            cell.update_live(series.symbol, *series.view())
+            canvas.draw_idle()
+
+    ## Startup
+    # The window paints with empty frames first. The heavy imports follow, the
+    # default symbol's data is requested straight away and the figures are
+    # built one per event loop turn, visible ones first, while it downloads.
+    def first_paint():
+        root.update_idletasks()  # Tk draws on idle, flush it before taking the time
+        startup.mark('first_paint')
+        root.after(1, load_dashboard)
+
+    def load_dashboard():
+        import_dashboard_modules()
+        startup.mark('modules')
+        update_charts()
+
+        order = sorted(CHART_POSITIONS, key=lambda position: not cell_visible(position))
+        root.after(1, build_cells, order)
+
+    def build_cells(order):
+        position = order[0]
+        build_cell(position)
+        frame, placeholder, canvas, cell = chart_frames[position[0]][position[1]]
+        if position in arrived:
+            finish_cell(position, *arrived.pop(position))
         else:
-            quality_rating = 'Low'
+            show_message(canvas, cell, 'Loading...')
+
+        if order[1:]:
+            root.after(1, build_cells, order[1:])
+        else:
+            startup.mark('charts_built')
+
+    def update_dividend_info(snapshot):
+        from sidebar import dividend_info
+        for var, text in zip((dividend_yield, payout_ratio, ex_div_date, payout_date), dividend_info(snapshot)):
+            var.set(text)
 
-        piotroski.set(f"Piotroski Score: {score}")
-        quality.set(f"Quality Rating: {quality_rating}")
+    def update_balance_info(snapshot):
+        from sidebar import balance_info
+        for var, text in zip((cash_var, debt_var, net_var), balance_info(snapshot)):
+            var.set(text)
+
+    def update_margins_growth_info(snapshot):
+        from sidebar import margins_growth_info
+        for var, text in zip((profit_margin, operating_margin, quarterly_earnings_var, quarterly_revenue_var), margins_growth_info(snapshot)):
+            var.set(text)
+
+    def update_value_info(snapshot):
+        from sidebar import value_info
+        for var, text in zip((market_cap, pe, price_to_sales, ev_to_ebitda, price_to_book, free_cash_flow_yield), value_info(snapshot)):
+            var.set(text)
+
+    def update_quality_info(snapshot):
+        from sidebar import quality_info
+        for var, text in zip((piotroski, quality), quality_info(snapshot)):
+            var.set(text)
     
     def create_styled_frame(parent):
         frame = ctk.CTkFrame(parent, fg_color="#131313")
@@ -451,7 +466,7 @@ def display_charts_with_sidebar(default_symbol='AAPL'):
     ticker_lookup_frame = create_styled_frame(sidebar_frame)
     ticker_lookup_frame.pack(pady=2.5, fill='x')
     
-    input_label = ctk.CTkLabel(ticker_lookup_frame, text="Enter Ticker Symbol:")
+    input_label = ctk.CTkLabel(ticker_lookup_frame, text="Enter Ticker Symbol (several to compare):")
     input_label.pack(padx=5.5, anchor='nw')
     
     stock_input = ctk.CTkEntry(ticker_lookup_frame, textvariable=stock_symbol_var)
@@ -463,6 +478,11 @@ def display_charts_with_sidebar(default_symbol='AAPL'):
     watchlist_button = ctk.CTkButton(ticker_lookup_frame, text="Go to Watchlist", command=open_watchlist)
     watchlist_button.pack(pady=5, padx=5.5, anchor='nw')
 
+    price_history_button = ctk.CTkButton(ticker_lookup_frame, text="Price History", command=open_price_history)
+    price_history_button.pack(pady=5, padx=5.5, anchor='nw')
+
+    ctk.CTkSwitch(ticker_lookup_frame, text="Live price", variable=live_var, command=toggle_live).pack(pady=5, padx=5.5, anchor='nw')
+
     # Margins & Growth Section
     margins_growth_frame = create_styled_frame(sidebar_frame)
     margins_growth_frame.pack(pady=2.5, fill='x')
@@ -536,17 +556,57 @@ def display_charts_with_sidebar(default_symbol='AAPL'):
     ctk.CTkLabel(quality_frame, textvariable=piotroski,padx=2.5,fg_color="transparent").pack(anchor='nw')
     ctk.CTkLabel(quality_frame, textvariable=quality,padx=5,fg_color="transparent").pack(anchor='nw')
 
-    # Initial update of all information
-    update_dividend_info(default_symbol)
-    update_balance_info(default_symbol)
-    update_margins_growth_info(default_symbol)
-    update_value_info(default_symbol)
-    update_quality_info(default_symbol)
-
-    # Initial update of all charts
-    update_charts()  # Call this to populate the charts on startup
+    # Debug Section, the timing breakdown of the last update
+    debug_frame = create_styled_frame(sidebar_frame)
+    debug_frame.pack(pady=2.5, fill='x')
+
+    ctk.CTkLabel(debug_frame, text="Debug", font=('Helvetica', 12, 'bold'),padx=5,fg_color="transparent").pack(anchor='nw')
+    trace_var = tk.BooleanVar(value=tracing.enabled())
+    ctk.CTkSwitch(debug_frame, text="Trace timings", variable=trace_var, command=lambda: toggle_tracing()).pack(padx=5, anchor='nw')
+    debug_text = tk.StringVar()
+    ctk.CTkLabel(debug_frame, textvariable=debug_text, font=('Courier', 10), justify='left', padx=5, fg_color="transparent").pack(anchor='nw')
+    ctk.CTkButton(debug_frame, text="Export Trace", command=lambda: export_trace()).pack(pady=5, padx=5.5, anchor='nw')
+
+    pending_debug = [None]
+
+    def toggle_tracing():
+        tracing.enable(trace_var.get())
+        debug_text.set("Press Update Charts to time an update" if trace_var.get() else "")
+
+    def schedule_debug_panel():
+        # Coalesce the many cell callbacks into one refresh
+        if tracing.enabled() and pending_debug[0] is None:
+            pending_debug[0] = root.after(250, refresh_debug_panel)
+
+    def refresh_debug_panel():
+        pending_debug[0] = None
+        summary = tracing.summary()
+        lines = [f"Update: {summary['wall_ms']:.0f} ms"]
+        lines += [f"{category:<8}{total:>8.0f} ms" for category, total in tracing.category_totals().items()]
+        lines.append("Slowest:")
+        for name, stage in list(summary['stages'].items())[:5]:
+            lines.append(f" {name[:22]:<22}{stage['total_ms']:>7.0f} ms x{stage['calls']}")
+
+        from providers import get_provider
+        requests = get_provider().stats()
+        lines.append(f"Requests {requests.get('requests', 0)}, merged {requests.get('merged', 0)}, "
+                     f"retried {requests.get('retries', 0)}, throttled {requests.get('throttled', 0)}")
+        prefetched = get_prefetcher().stats()
+        lines.append(f"Prefetched {prefetched['symbols']} tickers, {prefetched['bytes'] / 2**20:.1f} MB, used {prefetched['hits']}")
+        debug_text.set("\n".join(lines))
+
+    def export_trace():
+        from cache import CACHE_DIR
+        path = os.path.join(CACHE_DIR, f"trace-{'-'.join(entered_symbols(stock_symbol_var.get()))}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        tracing.export_chrome(path, since='update')
+        debug_text.set(f"Trace saved to\n{path}")
+
+    # Charts and sidebar information load in the background after the window shows
+    startup.mark('window')
+    root.after(1, first_paint)
 
     root.mainloop()
 
-os.system("cls")
-display_charts_with_sidebar()
\ No newline at end of file
+if __name__ == '__main__':
+    os.system("cls")
+    display_charts_with_sidebar()
\ No newline at end of file
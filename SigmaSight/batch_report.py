@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from charts import CHART_LAYOUT
+from cli import json_number, read_universe, require_data
+from providers import share_rate_limit
+from sidebar import SIDEBAR_DATASETS, sidebar_text
+from snapshot import TickerSnapshot
+
+# Renders the twelve dashboard charts and the sidebar metrics for many symbols
+# without Tk. Symbols fan out over a process pool, every process reads and
+# fills the same on-disk cache and price store, so data fetched once is reused
+# by later runs and by the GUI.
+
+def render_dashboard(snapshot):
+    figure = Figure(figsize=(24, 10.5), facecolor='black')
+    FigureCanvasAgg(figure)
+    figure.suptitle(snapshot.symbol, color='white', fontsize=20, x=0.01, ha='left')
+
+    # Sidebar text in the first column, the 3x4 chart grid beside it
+    panels = figure.subfigures(3, 5, width_ratios=[1.2, 2, 2, 2, 2])
+    for (i, j), (make_cell, datasets) in CHART_LAYOUT.items():
+        panel = panels[i][j + 1]
+        panel.set_facecolor('black')
+        cell = make_cell(panel)
+        try:
+            cell.update(snapshot)
+        except Exception:
+            cell.show_message('No data')
+
+    sidebar = figure.add_axes([0.005, 0.02, 0.14, 0.9])
+    sidebar.set_axis_off()
+    text = sidebar_text(snapshot)
+    lines = []
+    for title, section in text.items():
+        lines += [title.upper()] + section + ['']
+    sidebar.text(0, 1, '\n'.join(lines), color='white', fontsize=10, va='top', ha='left', family='monospace')
+    return figure, text
+
+def metrics_summary(snapshot, sidebar):
+    valuation = snapshot.valuation
+    fiscal = snapshot.metrics.drop(columns=['price_date'])
+    return {
+        'symbol': snapshot.symbol,
+        'sidebar': sidebar,
+        'valuation': {key: json_number(value) for key, value in valuation.drop('price_date').items()},
+        'price_date': str(valuation.get('price_date')),
+        'fiscal_years': {
+            str(period.date()): {key: json_number(value) for key, value in row.items()}
+            for period, row in fiscal.iterrows()
+        },
+    }
+
+def render_symbol(symbol, out_dir, formats):
+    # Runs inside a worker process
+    started = time.perf_counter()
+    try:
+        snapshot = TickerSnapshot(symbol)
+        snapshot.load('history', 'dividends', 'metrics', *SIDEBAR_DATASETS)
+        fiscal = snapshot.metrics.drop(columns=['price_date'])
+        require_data(symbol, [*snapshot.valuation.drop('price_date'), *fiscal.to_numpy().ravel()])
+        figure, sidebar = render_dashboard(snapshot)
+
+        for extension in formats:
+            figure.savefig(os.path.join(out_dir, f'{symbol}.{extension}'), facecolor='black')
+        with open(os.path.join(out_dir, f'{symbol}.json'), 'w') as f:
+            json.dump(metrics_summary(snapshot, sidebar), f, indent=2)
+        return {'symbol': symbol, 'ok': True, 'seconds': round(time.perf_counter() - started, 3)}
+    except Exception:
+        return {'symbol': symbol, 'ok': False, 'seconds': round(time.perf_counter() - started, 3), 'error': traceback.format_exc()}
+
+def run(symbols, out_dir, formats, workers):
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=share_rate_limit, initargs=(workers,)) as executor:
+        futures = [executor.submit(render_symbol, symbol, out_dir, formats) for symbol in symbols]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            status = 'ok' if result['ok'] else 'FAILED'
+            print(f"[{len(results)}/{len(symbols)}] {result['symbol']:<8} {status:<6} {result['seconds']:.2f}s", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        'symbols': len(symbols),
+        'succeeded': sum(result['ok'] for result in results),
+        'failed': [result for result in results if not result['ok']],
+        'workers': workers,
+        'seconds': round(elapsed, 3),
+        'symbols_per_second': round(len(symbols) / elapsed, 3) if elapsed else None,
+    }
+    with open(os.path.join(out_dir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+## Command line
+def main():
+    parser = argparse.ArgumentParser(description='Render SigmaSight dashboards for many symbols without a window')
+    parser.add_argument('symbols', nargs='*', help='Tickers to render')
+    parser.add_argument('--universe', help='File with one ticker per line, # starts a comment')
+    parser.add_argument('--out', default='reports', help='Output directory')
+    parser.add_argument('--formats', default='png', help='Comma separated image formats, e.g. png,pdf')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    args = parser.parse_args()
+
+    symbols = [symbol.upper() for symbol in args.symbols]
+    if args.universe:
+        symbols += read_universe(args.universe)
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        parser.error('give some symbols or a --universe file')
+
+    summary = run(symbols, args.out, args.formats.split(','), args.workers)
+    print(f"Rendered {summary['succeeded']}/{summary['symbols']} symbols in {summary['seconds']}s "
+          f"({summary['symbols_per_second']} symbols/s on {summary['workers']} workers)")
+    return 0 if not summary['failed'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,399 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Keep benchmark data out of the real cache, this has to happen before the
+# cache and price store work out where they live
+os.environ.setdefault('SIGMASIGHT_HOME', tempfile.mkdtemp(prefix='sigmasight-bench-'))
+
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+import pandas as pd
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import cache
+import price_store
+import tracing
+import watchlist
+
+from charts import CHART_LAYOUT, MAX_COMPARE
+from price_history import PriceHistoryChart, base_series
+from providers import DataProvider, ReplayProvider, get_provider, record_fixtures, set_provider
+from quotes import fetch_quotes, sync_dips
+from sidebar import SIDEBAR_DATASETS
+from snapshot import TickerSnapshot
+
+# Benchmarks for the dashboard update, watchlist refresh and dip finder scan,
+# run against recorded fixtures so results do not depend on the network.
+DEFAULT_SIZES = [1, 50, 500]
+SCENARIOS = ['dashboard', 'comparison', 'watchlist_refresh', 'dip_finder', 'price_history']
+
+# Views of the price history timed by the price_history scenario, in days
+# back from the last bar, None for the whole history
+PRICE_HISTORY_SPANS = {'1 month': 30, '1 year': 365, '10 years': 3650, 'full': None}
+
+## Synthetic fixtures
+# Deterministic data shaped like yfinance output, used when no recorded
+# fixtures are given
+class SyntheticProvider(DataProvider):
+    name = 'synthetic'
+
+    def _random(self, symbol):
+        return np.random.default_rng(zlib.crc32(symbol.encode()))
+
+    def _periods(self):
+        return pd.to_datetime([f'{year}-09-30' for year in range(2023, 2019, -1)])
+
+    def _statement(self, symbol, rows, salt):
+        rng = self._random(symbol + salt)
+        values = rng.uniform(1e9, 1e11, size=(len(rows), 4))
+        return pd.DataFrame(values, index=rows, columns=self._periods())
+
+    def info(self, symbol):
+        rng = self._random(symbol)
+        price = float(rng.uniform(10, 500))
+        return {
+            'shortName': f'{symbol} Synthetic Inc.',
+            'currentPrice': price,
+            'previousClose': price * float(rng.uniform(0.95, 1.05)),
+            'twoHundredDayAverage': price * float(rng.uniform(0.8, 1.2)),
+            'dividendYield': float(rng.uniform(0, 0.05)),
+            'payoutRatio': float(rng.uniform(0, 0.8)),
+            'exDividendDate': 1704067200,
+            'profitMargins': float(rng.uniform(-0.1, 0.4)),
+            'operatingMargins': float(rng.uniform(-0.1, 0.4)),
+            'marketCap': int(price * 1e9),
+            'trailingPE': float(rng.uniform(5, 60)),
+            'priceToSalesTrailing12Months': float(rng.uniform(0.5, 20)),
+            'enterpriseToEbitda': float(rng.uniform(3, 40)),
+            'priceToBook': float(rng.uniform(0.5, 30)),
+            'freeCashflow': int(rng.uniform(1e8, 1e10)),
+            'returnOnAssets': float(rng.uniform(-0.05, 0.3)),
+            'operatingCashflow': int(rng.uniform(1e8, 1e10)),
+            'currentRatio': float(rng.uniform(0.5, 3)),
+            'sharesOutstanding': int(1e9),
+        }
+
+    def calendar(self, symbol):
+        return {'Dividend Date': pd.Timestamp('2024-02-15').date()}
+
+    def financials(self, symbol):
+        return self._statement(symbol, ['Total Revenue', 'Gross Profit', 'EBITDA', 'Net Income'], 'financials')
+
+    def balance_sheet(self, symbol):
+        rows = ['Ordinary Shares Number', 'Total Debt', 'Cash And Cash Equivalents', 'Total Assets',
+                'Total Liabilities Net Minority Interest', 'Current Assets', 'Current Liabilities']
+        return self._statement(symbol, rows, 'balance_sheet')
+
+    def cashflow(self, symbol):
+        return self._statement(symbol, ['Free Cash Flow', 'Operating Cash Flow'], 'cashflow')
+
+    def dividends(self, symbol):
+        dates = pd.date_range('2012-02-15', '2024-01-01', freq='QS-FEB')
+        return pd.Series(self._random(symbol).uniform(0.1, 1.0, len(dates)), index=dates, name='Dividends')
+
+    def history(self, symbol, start=None, end=None, interval='1d'):
+        dates = pd.bdate_range('2002-01-01', '2024-06-28')
+        rng = self._random(symbol)
+        close = 20 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(dates))))
+        if interval == '1wk':
+            # Weekly bars go back to 1985, walking backwards from the first daily close
+            earlier = pd.bdate_range('1985-01-01', dates[0], inclusive='left')
+            steps = self._random(symbol + 'weekly').normal(0.0003, 0.02, len(earlier))
+            close = np.concatenate([(close[0] * np.exp(-np.cumsum(steps)))[::-1], close])
+            dates = earlier.append(dates)
+        data = pd.DataFrame({
+            'Open': close * 0.995, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+            'Volume': rng.integers(1e5, 1e7, len(dates)).astype(float),
+        }, index=dates)
+        if interval == '1wk':
+            data = data.resample('W-MON', label='left', closed='left').agg(
+                {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'})
+        if start is not None:
+            data = data[data.index >= pd.Timestamp(start)]
+        if end is not None:
+            data = data[data.index < pd.Timestamp(end)]
+        return data
+
+def synthesize_fixtures(fixture_dir, count):
+    symbols = [f'SYN{i:04d}' for i in range(count)]
+    missing = [symbol for symbol in symbols if not os.path.isdir(os.path.join(fixture_dir, symbol))]
+    record_fixtures(missing, fixture_dir, SyntheticProvider())
+    return symbols
+
+## Instrumentation
+# Counts calls per dataset and maps aliased symbols ("AAPL#3") back to the
+# recorded fixture, so a few recordings can stand in for a large universe
+class CountingProvider(DataProvider):
+    def __init__(self, inner):
+        self.inner = inner
+        self.name = inner.name
+        self.calls = Counter()
+
+    def _call(self, dataset, symbol, *args, **kwargs):
+        self.calls[dataset] += 1
+        return getattr(self.inner, dataset)(symbol.split('#')[0], *args, **kwargs)
+
+    def info(self, symbol):
+        return self._call('info', symbol)
+
+    def calendar(self, symbol):
+        return self._call('calendar', symbol)
+
+    def financials(self, symbol):
+        return self._call('financials', symbol)
+
+    def balance_sheet(self, symbol):
+        return self._call('balance_sheet', symbol)
+
+    def cashflow(self, symbol):
+        return self._call('cashflow', symbol)
+
+    def dividends(self, symbol):
+        return self._call('dividends', symbol)
+
+    def history(self, symbol, start=None, end=None, interval='1d'):
+        return self._call('history', symbol, start=start, end=end, interval=interval)
+
+def universe(recorded, size):
+    if size <= len(recorded):
+        return recorded[:size]
+    return [f'{recorded[i % len(recorded)]}#{i}' for i in range(size)]
+
+def summarise(samples):
+    values = np.array(samples) * 1000
+    return {
+        'count': len(values),
+        'mean_ms': round(float(values.mean()), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'max_ms': round(float(values.max()), 3),
+    }
+
+## Scenarios
+def dashboard_cells():
+    cells = {}
+    for position, (make_cell, datasets) in CHART_LAYOUT.items():
+        canvas = FigureCanvasAgg(Figure(figsize=(4.5, 3.5), facecolor='black'))
+        cell = make_cell(canvas.figure)
+        tracing.trace_draws(canvas, cell.title, lambda cell=cell: cell.symbol)
+        cells[position] = (canvas, cell)
+    return cells
+
+def bench_dashboard(symbols, render_times):
+    # Same work as update_charts: fetch every cell on a pool, draw each chart
+    # on the main thread as its data arrives, then load the sidebar datasets
+    cells = dashboard_cells()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for symbol in symbols:
+            snapshot = TickerSnapshot(symbol)
+            futures = {executor.submit(snapshot.load, *datasets): position for position, (make_cell, datasets) in CHART_LAYOUT.items()}
+            sidebar = executor.submit(snapshot.load, *SIDEBAR_DATASETS)
+
+            for future in as_completed(futures):
+                canvas, cell = cells[futures[future]]
+
+                started = time.perf_counter()
+                try:
+                    future.result()
+                    cell.update(snapshot)
+                except Exception:
+                    cell.show_message('No data')
+                canvas.draw()
+                render_times[cell.title].append(time.perf_counter() - started)
+
+            sidebar.result()
+
+def bench_comparison(symbols, render_times):
+    # Same work as update_charts with several tickers entered: MAX_COMPARE
+    # tickers at a time, each cell loads them side by side and draws them together
+    cells = dashboard_cells()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for start in range(0, len(symbols), MAX_COMPARE):
+            snapshots = [TickerSnapshot(symbol) for symbol in symbols[start:start + MAX_COMPARE]]
+            loads = {
+                position: [executor.submit(snapshot.load, *datasets) for snapshot in snapshots]
+                for position, (make_cell, datasets) in CHART_LAYOUT.items()
+            }
+            sidebar = executor.submit(snapshots[0].load, *SIDEBAR_DATASETS)
+
+            for position, futures in loads.items():
+                canvas, cell = cells[position]
+                ready = [snapshot for snapshot, future in zip(snapshots, futures) if future.exception() is None]
+
+                started = time.perf_counter()
+                try:
+                    if len(ready) == 1:
+                        cell.update(ready[0])
+                    else:
+                        cell.compare(ready)
+                except Exception:
+                    cell.show_message('No data')
+                canvas.draw()
+                render_times[cell.title].append(time.perf_counter() - started)
+
+            sidebar.result()
+
+def bench_watchlist_refresh(symbols, render_times):
+    watchlist.watchlist_rows(fetch_quotes(symbols))
+
+def bench_dip_finder(symbols, render_times):
+    watchlist.calculate_dip_data(sync_dips(fetch_quotes(symbols)))
+
+def bench_price_history(symbols, render_times):
+    # Same work as opening the price history and zooming out: each ticker's
+    # history is loaded once, then every span ending at the last bar is
+    # resampled and drawn. Draw times should not grow with the span.
+    canvas = FigureCanvasAgg(Figure(figsize=(12, 6.5), facecolor='black'))
+    chart = PriceHistoryChart(canvas.figure, lambda symbol, interval: None)
+    tracing.trace_draws(canvas, 'Price History', lambda: chart.symbol)
+    for symbol in symbols:
+        chart.show(symbol, *base_series(symbol))
+        x = chart.base[0]
+        if not len(x):
+            continue
+        for label, days in PRICE_HISTORY_SPANS.items():
+            started = time.perf_counter()
+            chart.ax.set_xlim(x[0] if days is None else x[-1] - days, x[-1])
+            chart.resample()
+            canvas.draw()
+            render_times[f'Price History {label}'].append(time.perf_counter() - started)
+
+BENCHMARKS = {
+    'dashboard': bench_dashboard,
+    'comparison': bench_comparison,
+    'watchlist_refresh': bench_watchlist_refresh,
+    'dip_finder': bench_dip_finder,
+    'price_history': bench_price_history,
+}
+
+def run_case(scenario, symbols, provider, warm, measure_memory):
+    if not warm:
+        cache.invalidate()
+        price_store.invalidate()
+
+    provider.calls.clear()
+    cache.counters.clear()
+    get_provider().counters.clear()
+    render_times = defaultdict(list)
+    if measure_memory:
+        tracemalloc.start()
+
+    started = time.perf_counter()
+    BENCHMARKS[scenario](symbols, render_times)
+    wall = time.perf_counter() - started
+
+    peak = None
+    if measure_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    result = {
+        'scenario': scenario,
+        'tickers': len(symbols),
+        'cache': 'warm' if warm else 'cold',
+        'wall_s': round(wall, 4),
+        'tickers_per_s': round(len(symbols) / wall, 3) if wall else None,
+        'provider_calls': sum(provider.calls.values()),
+        'provider_calls_by_dataset': dict(provider.calls),
+        'cache_hits': cache.counters['hits'],
+        'cache_misses': cache.counters['misses'],
+        'requests': get_provider().stats(),
+        'peak_memory_mb': round(peak / 2**20, 2) if peak is not None else None,
+    }
+    if render_times:
+        result['render'] = {name: summarise(samples) for name, samples in sorted(render_times.items())}
+    return result
+
+def compare(results, baseline, tolerance):
+    # Returns the cases whose wall time grew by more than tolerance
+    previous = {(case['scenario'], case['tickers'], case['cache']): case for case in baseline['results']}
+    regressions = []
+    for case in results:
+        before = previous.get((case['scenario'], case['tickers'], case['cache']))
+        if before and before['wall_s'] and case['wall_s'] > before['wall_s'] * (1 + tolerance):
+            regressions.append({'scenario': case['scenario'], 'tickers': case['tickers'], 'cache': case['cache'],
+                                'baseline_s': before['wall_s'], 'current_s': case['wall_s']})
+    return regressions
+
+## Command line
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SigmaSight against recorded data')
+    parser.add_argument('--fixtures', help='Recorded fixture directory, synthetic fixtures are generated when omitted')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='Comma separated ticker counts')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f'Comma separated subset of {", ".join(SCENARIOS)}')
+    parser.add_argument('--latency', type=float, default=0.0, help='Artificial latency per provider call, in seconds')
+    parser.add_argument('--no-memory', action='store_true', help='Skip peak memory tracking, which slows the run down')
+    parser.add_argument('--out', help='Write results as JSON to this file instead of stdout')
+    parser.add_argument('--baseline', help='Earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed wall time regression against the baseline')
+    parser.add_argument('--trace', help='Record timing spans and write them to this file as a Chrome trace')
+    args = parser.parse_args()
+    tracing.enable(bool(args.trace))
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    scenarios = args.scenarios.split(',')
+
+    fixture_dir = args.fixtures
+    if fixture_dir is None:
+        fixture_dir = os.path.join(os.environ['SIGMASIGHT_HOME'], 'fixtures')
+        recorded = synthesize_fixtures(fixture_dir, max(sizes))
+    else:
+        recorded = ReplayProvider(fixture_dir).symbols()
+
+    provider = CountingProvider(ReplayProvider(fixture_dir, latency=args.latency))
+    set_provider(provider)
+
+    results = []
+    for scenario in scenarios:
+        for size in sizes:
+            symbols = universe(recorded, size)
+            for warm in (False, True):
+                case = run_case(scenario, symbols, provider, warm, not args.no_memory)
+                print(f"{scenario:<18} {size:>5} tickers  {case['cache']:<4}  {case['wall_s']:>9.3f}s  "
+                      f"{case['provider_calls']:>6} calls", file=sys.stderr)
+                results.append(case)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'fixtures': fixture_dir,
+        'latency_s': args.latency,
+        'results': results,
+    }
+
+    if args.trace:
+        tracing.export_chrome(args.trace)
+        report['trace'] = args.trace
+        report['stages'] = tracing.summary(since=None)['stages']
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        report['regressions'] = regressions
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+import argparse
+import contextlib
+import os
+import pickle
+import sqlite3
+import time
+
+from collections import Counter
+
+# Cache location, override with the SIGMASIGHT_HOME environment variable
+CACHE_DIR = os.environ.get('SIGMASIGHT_HOME', os.path.join(os.path.expanduser('~'), '.sigmasight'))
+CACHE_FILE = os.path.join(CACHE_DIR, 'cache.sqlite')
+
+# Largest the cache may grow before the least recently used entries are dropped
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+# How long each dataset stays fresh, in seconds
+DATASET_TTLS = {
+    'info': 5 * 60,
+    'calendar': 24 * 60 * 60,
+    'dividends': 24 * 60 * 60,
+    'financials': 7 * 24 * 60 * 60,
+    'balance_sheet': 7 * 24 * 60 * 60,
+    'cashflow': 7 * 24 * 60 * 60,
+    'history_1wk': 24 * 60 * 60,
+    'history_early': 24 * 60 * 60,
+    'history_1h': 60 * 60,
+    'history_5m': 5 * 60,
+}
+DEFAULT_TTL = 60 * 60
+
+_schema_ready = False
+
+# Hits and misses in get_or_fetch since the process started
+counters = Counter()
+
+@contextlib.contextmanager
+def connect():
+    global _schema_ready
+    if not _schema_ready:
+        create_schema()
+        _schema_ready = True
+
+    conn = sqlite3.connect(CACHE_FILE, timeout=30)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def create_schema():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(CACHE_FILE, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS entries (
+            symbol TEXT NOT NULL,
+            dataset TEXT NOT NULL,
+            payload BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            fetched_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            PRIMARY KEY (symbol, dataset)
+        )''')
+    conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)')
+    conn.commit()
+    conn.close()
+
+def get(symbol, dataset):
+    # Returns (True, value) for a fresh entry, (False, None) otherwise
+    symbol = symbol.upper()
+    ttl = DATASET_TTLS.get(dataset, DEFAULT_TTL)
+    now = time.time()
+    with connect() as conn:
+        row = conn.execute('SELECT payload, fetched_at FROM entries WHERE symbol = ? AND dataset = ?', (symbol, dataset)).fetchone()
+        if row is None or now - row[1] > ttl:
+            return False, None
+        conn.execute('UPDATE entries SET accessed_at = ? WHERE symbol = ? AND dataset = ?', (now, symbol, dataset))
+    return True, pickle.loads(row[0])
+
+def put(symbol, dataset, value):
+    symbol = symbol.upper()
+    payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    now = time.time()
+    with connect() as conn:
+        conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)', (symbol, dataset, payload, len(payload), now, now))
+        evict(conn)
+
+def get_or_fetch(symbol, dataset, fetch):
+    found, value = get(symbol, dataset)
+    if found:
+        counters['hits'] += 1
+        return value
+    counters['misses'] += 1
+    value = fetch()
+    put(symbol, dataset, value)
+    return value
+
+def evict(conn, max_bytes=None):
+    # Drop least recently used entries until the cache fits in max_bytes
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+    if total <= max_bytes:
+        return 0
+
+    removed = 0
+    for symbol, dataset, size in conn.execute('SELECT symbol, dataset, size FROM entries ORDER BY accessed_at').fetchall():
+        if total <= max_bytes:
+            break
+        conn.execute('DELETE FROM entries WHERE symbol = ? AND dataset = ?', (symbol, dataset))
+        total -= size
+        removed += 1
+    return removed
+
+def invalidate(symbol=None, dataset=None):
+    # Remove entries for a symbol, a dataset, both, or everything when neither is given
+    query = 'DELETE FROM entries WHERE 1 = 1'
+    params = []
+    if symbol:
+        query += ' AND symbol = ?'
+        params.append(symbol.upper())
+    if dataset:
+        query += ' AND dataset = ?'
+        params.append(dataset)
+    with connect() as conn:
+        return conn.execute(query, params).rowcount
+
+def stats():
+    with connect() as conn:
+        count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+    return {'entries': count, 'bytes': total, 'max_bytes': MAX_CACHE_BYTES, 'path': CACHE_FILE, **counters}
+
+## Command line
+def main():
+    parser = argparse.ArgumentParser(description='Manage the SigmaSight data cache')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    invalidate_parser = commands.add_parser('invalidate', help='Remove cached entries')
+    invalidate_parser.add_argument('symbol', nargs='?', help='Only remove entries for this ticker')
+    invalidate_parser.add_argument('--dataset', choices=sorted(DATASET_TTLS) + ['history'], help='Only remove this dataset')
+
+    commands.add_parser('stats', help='Show cache size and location')
+
+    args = parser.parse_args()
+    if args.command == 'invalidate':
+        # Price history lives in its own incremental store
+        if args.dataset in (None, 'history'):
+            import price_store
+            price_store.invalidate(args.symbol)
+        print(f"Removed {invalidate(args.symbol, args.dataset)} cached entries")
+    else:
+        for key, value in stats().items():
+            print(f"{key}: {value}")
+
+if __name__ == '__main__':
+    main()
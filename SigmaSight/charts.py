@@ -0,0 +1,406 @@
+from datetime import datetime
+
+import matplotlib.dates as mdates
+import matplotlib.ticker as mticker
+import numpy as np
+import pandas as pd
+
+import tracing
+
+from matplotlib.patches import Rectangle
+
+## Graph Formatting
+def format_num(value, tick_number):
+    # Format the number based on its size
+    if value >= 1e12:
+        return f'{value * 1e-12:.0f}T'
+    elif value >= 1e9:
+        return f'{value * 1e-9:.0f}B'  # Billions
+    elif value >= 1e6:
+        return f'{value * 1e-6:.0f}M'  # Millions
+    elif value >= 1e3:
+        return f'{value * 1e-3:.0f}K'  # Thousands
+    else:
+        return f'{value}'  # Less than thousand
+
+def format_metric(value, spec):
+    # Sidebar values, missing or non-finite numbers show as N/A
+    if value is None or pd.isna(value):
+        return 'N/A'
+    return format(value, spec)
+    
+def set_colours(ax):
+    ax.spines['bottom'].set_color('white')
+    ax.spines['top'].set_color('black')
+    ax.spines['left'].set_color('black')
+    ax.spines['right'].set_color('black')
+    
+    ax.xaxis.label.set_color('white')
+    ax.yaxis.label.set_color('white')
+    
+    ax.set_facecolor('black') 
+    
+    ax.tick_params(axis='x', colors='white')  # Set tick label color
+    ax.tick_params(axis='y', colors='white')  # Set y-tick color
+    ax.tick_params(bottom=True, left=False)
+    
+    ax.set_axisbelow(True)
+    
+    ax.yaxis.grid(True, color='#333333')
+    ax.xaxis.grid(False)
+
+## Chart Data
+# Each function returns the x positions and one array of values per series
+def ytd_price(snapshot):
+    stock_data = snapshot.history
+    stock_data = stock_data[stock_data.index >= f'{datetime.today().year}-01-01']
+    return mdates.date2num(stock_data.index), [stock_data['Close'].values]
+
+def fiscal_years(snapshot, *columns):
+    # One value per fiscal year since 2002 for each metrics column
+    metrics = snapshot.metrics[list(columns)].dropna(how='all')
+    metrics = metrics[metrics.index.year >= 2002]
+    return metrics.index.year.values, [metrics[column].values for column in columns]
+
+def revenue(snapshot):
+    return fiscal_years(snapshot, 'revenue')
+
+def ebitda(snapshot):
+    return fiscal_years(snapshot, 'ebitda')
+
+def free_cash_flow(snapshot):
+    return fiscal_years(snapshot, 'fcf')
+
+def net_income(snapshot):
+    return fiscal_years(snapshot, 'net_income')
+
+def eps(snapshot):
+    return fiscal_years(snapshot, 'eps')
+
+def cash_debt(snapshot):
+    return fiscal_years(snapshot, 'cash', 'debt')
+
+def dividend_rate(snapshot):
+    dividend_rate = snapshot.dividends.resample('YE').sum()  # Sum of dividends per year
+    dividend_rate = dividend_rate[dividend_rate.index.year >= 2000]
+    return dividend_rate.index.year.values, [dividend_rate.values]
+
+def shares_outstanding(snapshot):
+    return fiscal_years(snapshot, 'shares')
+
+def market_cap(snapshot):
+    # Close on each fiscal period end times shares outstanding, see metrics.py
+    return fiscal_years(snapshot, 'market_cap')
+
+def enterprise_value(snapshot):
+    # Market cap plus debt minus cash on each fiscal period end
+    return fiscal_years(snapshot, 'ev')
+
+def pe_ratio(snapshot):
+    # Close on each fiscal period end over that period's EPS
+    return fiscal_years(snapshot, 'pe')
+
+def aligned(results):
+    # {symbol: (x, series)} -> shared x and each symbol's first series on it,
+    # NaN where a symbol has no value
+    table = pd.DataFrame({
+        symbol: _first_series(x, series) for symbol, (x, series) in results.items()
+    }).sort_index()
+    return table.index.values, [table[symbol].values for symbol in table.columns]
+
+def _first_series(x, series):
+    values = pd.Series(np.asarray(series[0], dtype=float), index=np.asarray(x))
+    return values[~values.index.duplicated(keep='last')]
+
+## Downsampling
+def lttb(x, y, threshold):
+    # Largest Triangle Three Buckets (Steinarsson, 2013): threshold points that
+    # keep the shape of the line. The first and last points are always kept,
+    # every bucket in between keeps the point forming the largest triangle
+    # with the point kept before it and the average of the next bucket.
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return x, y
+
+    # threshold - 2 buckets over the points between the first and the last
+    buckets = threshold - 2
+    edges = 1 + np.arange(buckets + 1) * (count - 2) // buckets
+    sums_x = np.concatenate([[0.0], np.cumsum(x, dtype=float)])
+    sums_y = np.concatenate([[0.0], np.cumsum(y, dtype=float)])
+    sizes = np.diff(edges)
+    next_x = np.append(((sums_x[edges[1:]] - sums_x[edges[:-1]]) / sizes)[1:], x[-1])
+    next_y = np.append(((sums_y[edges[1:]] - sums_y[edges[:-1]]) / sizes)[1:], y[-1])
+
+    keep = np.empty(threshold, dtype=np.intp)
+    keep[0], keep[-1] = 0, count - 1
+    kept = 0
+    for bucket in range(buckets):
+        low, high = edges[bucket], edges[bucket + 1]
+        kept_x, kept_y = x[kept], y[kept]
+        area = np.abs((kept_x - next_x[bucket]) * (y[low:high] - kept_y) - (kept_x - x[low:high]) * (next_y[bucket] - kept_y))
+        kept = low + int(area.argmax())
+        keep[bucket + 1] = kept
+    return x[keep], y[keep]
+
+## Chart Cells
+# A cell builds its axes, styling and artists once. Updates only move bar
+# heights and line data, rescale the limits and leave drawing to the caller
+# (canvas.draw_idle in the GUI).
+
+# Ticker colours in comparison mode, in the order the tickers were entered
+COMPARE_COLOURS = ['#3b86ff', '#ffa500', '#00d346', '#e31c1c', '#bf7fff', '#ff66cc']
+MAX_COMPARE = len(COMPARE_COLOURS)
+
+class ChartCell:
+    def __init__(self, figure, data, title, title_size=None, title_x=-0.1258, y_formatter=True):
+        self.figure = figure
+        self.data = data
+        self.title = title
+        self.symbol = None  # Symbol currently shown, for tracing
+
+        self.ax = figure.add_subplot(111)
+        title_options = {'fontsize': title_size} if title_size else {}
+        if title_x is not None:
+            title_options['x'] = title_x
+        self.title_text = self.ax.set_title(title, color='white', loc='left', **title_options)
+        self.ax.tick_params(axis='x', labelsize=6)
+        self.ax.tick_params(axis='y', labelsize=6)
+        if y_formatter:
+            self.ax.yaxis.set_major_formatter(mticker.FuncFormatter(format_num))
+        set_colours(self.ax)
+
+        self.message = self.ax.text(0.5, 0.5, '', color='white', ha='center', va='center', transform=self.ax.transAxes)
+
+    @property
+    def comparable(self):
+        return True
+
+    def show_message(self, message):
+        self.message.set_text(message)
+        self.hide_data()
+
+    def update(self, snapshot):
+        self.symbol = snapshot.symbol
+        with tracing.span(self.title, 'compute', snapshot.symbol):
+            x, series = self.data(snapshot)
+        if len(x) == 0:
+            self.show_message('No data')
+            return
+        with tracing.span(self.title, 'artists', snapshot.symbol):
+            self.message.set_text('')
+            self.set_data(np.asarray(x), [np.asarray(values, dtype=float) for values in series])
+            self.ax.relim(visible_only=True)
+            self.ax.autoscale_view()
+
+    def compare(self, snapshots):
+        # Several tickers in one chart, one series per ticker
+        self.symbol = ','.join(snapshot.symbol for snapshot in snapshots)
+        if not self.comparable:
+            self.show_message('One ticker only')
+            return
+        with tracing.span(self.title, 'compute', self.symbol):
+            x, series = self.compare_data({snapshot.symbol: self.data(snapshot) for snapshot in snapshots})
+        if len(x) == 0:
+            self.show_message('No data')
+            return
+        with tracing.span(self.title, 'artists', self.symbol):
+            self.message.set_text('')
+            self.set_comparison(np.asarray(x), series, [snapshot.symbol for snapshot in snapshots])
+            self.ax.relim(visible_only=True)
+            self.ax.autoscale_view()
+
+    def compare_data(self, results):
+        return aligned(results)
+
+    def set_data(self, x, series):
+        raise NotImplementedError
+
+    def set_comparison(self, x, series, labels):
+        raise NotImplementedError
+
+    def hide_data(self):
+        raise NotImplementedError
+
+    def _legend(self, colours, labels, **options):
+        if labels:
+            handles = [Rectangle((0, 0), 1, 1, color=colour) for colour in colours]
+            self.ax.legend(handles, labels, **options)
+        elif self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
+
+class BarCell(ChartCell):
+    def __init__(self, figure, data, title, colours, labels=None, width=0.95, offsets=(0,), tick_step=1, **options):
+        super().__init__(figure, data, title, **options)
+        self.colours = colours
+        self.width = width
+        self.offsets = offsets
+        self.tick_step = tick_step
+        self.labels = labels
+        self.bars = []  # Rectangles per series, reused across updates
+        self.comparing = False
+        self._legend(colours, labels)
+
+    @property
+    def comparable(self):
+        # Charts of one value per period, not Cash & Debt
+        return len(self.colours) == 1
+
+    def _bar(self, series, index):
+        while len(self.bars) <= series:
+            self.bars.append([])
+        bars = self.bars[series]
+        while len(bars) <= index:
+            bar = self.ax.add_patch(Rectangle((0, 0), self.width, 0, color=self.colours[0]))
+            bar.sticky_edges.y.append(0)  # Keep bars on the axis like ax.bar does
+            bars.append(bar)
+        return bars[index]
+
+    def _set_bars(self, x, series, colours, offsets, width):
+        for series_index, (values, colour, offset) in enumerate(zip(series, colours, offsets)):
+            for index, (position, value) in enumerate(zip(x, values)):
+                bar = self._bar(series_index, index)
+                bar.set_x(position + offset - width / 2)
+                bar.set_width(width)
+                bar.set_color(colour)
+                bar.set_height(0 if np.isnan(value) else value)
+                bar.set_visible(not np.isnan(value))
+
+            # Hide bars left over from a symbol with more periods
+            for bar in self.bars[series_index][len(x):]:
+                bar.set_visible(False)
+
+        # And series left over from a comparison of more tickers
+        for bars in self.bars[len(series):]:
+            for bar in bars:
+                bar.set_visible(False)
+
+        ticks = x[::self.tick_step]
+        self.ax.set_xticks(ticks, [str(tick) for tick in ticks])
+
+    def set_data(self, x, series):
+        self._set_bars(x, series, self.colours, self.offsets, self.width)
+        if self.comparing:
+            self.comparing = False
+            self._legend(self.colours, self.labels)
+
+    def set_comparison(self, x, series, labels):
+        # Grouped bars, one per ticker side by side within each period
+        width = self.width / len(series)
+        offsets = [(index - (len(series) - 1) / 2) * width for index in range(len(series))]
+        colours = COMPARE_COLOURS[:len(series)]
+        self._set_bars(x, series, colours, offsets, width)
+        self.comparing = True
+        self._legend(colours, labels, fontsize=6)
+
+    def hide_data(self):
+        for bars in self.bars:
+            for bar in bars:
+                bar.set_visible(False)
+
+class LineCell(ChartCell):
+    def __init__(self, figure, data, title, colour, label, **options):
+        super().__init__(figure, data, title, **options)
+        self.colour = colour
+        self.label = label
+        self.line, = self.ax.plot([], [], color=colour, label=label)
+        self.lines = [self.line]  # One per ticker when comparing, reused across updates
+        self.comparing = False
+
+        # Month numbers along the x-axis
+        self.ax.xaxis.set_major_locator(mdates.MonthLocator())
+        self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%m'))
+        self.ax.set_xlabel('Month', fontsize=8, color='white')
+        self.ax.legend()
+
+    def _line(self, index):
+        while len(self.lines) <= index:
+            self.lines.append(self.ax.plot([], [])[0])
+        return self.lines[index]
+
+    def set_data(self, x, series):
+        self.line.set_data(x, series[0])
+        self.line.set_visible(True)
+        self._single()
+
+    def _single(self):
+        # Back to one line after a comparison
+        if self.comparing:
+            self.comparing = False
+            self.line.set_color(self.colour)
+            self.line.set_label(self.label)
+            for line in self.lines[1:]:
+                line.set_visible(False)
+            self.ax.set_ylabel('')
+            self.ax.legend(handles=[self.line])
+
+    def set_live(self, on):
+        # Live mode shows intraday prices with hours and minutes along the x-axis
+        if on:
+            self.ax.xaxis.set_major_locator(mdates.AutoDateLocator(maxticks=6))
+            self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+            self.ax.set_xlabel('Time', fontsize=8, color='white')
+        else:
+            self.ax.xaxis.set_major_locator(mdates.MonthLocator())
+            self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%m'))
+            self.ax.set_xlabel('Month', fontsize=8, color='white')
+            self.ax.set_autoscale_on(True)  # update_live fixed the limits
+        self.title_text.set_text('Intraday Price' if on else self.title)
+        self.line.set_label('Live Price' if on else self.label)
+        self.ax.legend(handles=[self.line])
+
+    def update_live(self, symbol, x, prices):
+        # Moves the line and sets the limits straight from the data, cheaper
+        # than relim for a redraw every poll
+        self.symbol = symbol
+        self._single()
+        if len(x) == 0:
+            self.show_message('No data')
+            return
+        self.message.set_text('')
+        self.line.set_data(x, prices)
+        self.line.set_visible(True)
+
+        low, high = np.nanmin(prices), np.nanmax(prices)
+        margin = (high - low) * 0.05 or abs(high) * 0.01 or 1
+        self.ax.set_xlim(x[0], x[-1] if x[-1] > x[0] else x[0] + 1 / 1440)
+        self.ax.set_ylim(low - margin, high + margin)
+
+    def compare_data(self, results):
+        # Prices rebased to 100 at each ticker's first close in the range, so
+        # tickers at very different prices share one scale
+        x, series = aligned(results)
+        return x, [values / values[~np.isnan(values)][0] * 100 if (~np.isnan(values)).any() else values for values in series]
+
+    def set_comparison(self, x, series, labels):
+        for index, (values, label) in enumerate(zip(series, labels)):
+            line = self._line(index)
+            present = ~np.isnan(values)
+            line.set_data(x[present], values[present])
+            line.set_color(COMPARE_COLOURS[index % MAX_COMPARE])
+            line.set_label(label)
+            line.set_visible(True)
+        for line in self.lines[len(series):]:
+            line.set_visible(False)
+        self.comparing = True
+        self.ax.set_ylabel('Rebased to 100', fontsize=8, color='white')
+        self.ax.legend(handles=self.lines[:len(series)], fontsize=6)
+
+    def hide_data(self):
+        for line in self.lines:
+            line.set_visible(False)
+
+# Position in the 3x4 grid -> (cell factory, snapshot datasets it reads)
+CHART_LAYOUT = {
+    (0, 0): (lambda figure: LineCell(figure, ytd_price, 'Year-to-Date Price', 'blue', 'YTD Price', title_x=None), ['history']),
+    (0, 1): (lambda figure: BarCell(figure, revenue, 'Revenue', ['#3b86ff'], title_size=18), ['metrics']),
+    (0, 2): (lambda figure: BarCell(figure, ebitda, 'EBITDA', ['#00b5d9']), ['metrics']),
+    (0, 3): (lambda figure: BarCell(figure, free_cash_flow, 'Free Cash Flow', ['#03045e']), ['metrics']),
+    (1, 0): (lambda figure: BarCell(figure, net_income, 'Net Income', ['#004d00']), ['metrics']),
+    (1, 1): (lambda figure: BarCell(figure, eps, 'Earnings Per Share (EPS)', ['#009933']), ['metrics']),
+    (1, 2): (lambda figure: BarCell(figure, cash_debt, 'Cash & Debt', ['#00d346', '#e31c1c'], labels=['Cash', 'Debt'], width=0.475, offsets=(-0.2, 0.2)), ['metrics']),
+    (1, 3): (lambda figure: BarCell(figure, dividend_rate, 'Dividend Rate ($)', ['#66cc99'], tick_step=5, y_formatter=False), ['dividends']),
+    (2, 0): (lambda figure: BarCell(figure, shares_outstanding, 'Shares Outstanding (Billion)', ['#FFD700']), ['metrics']),
+    (2, 1): (lambda figure: BarCell(figure, market_cap, 'Market Capitalization', ['#FFA500']), ['metrics']),
+    (2, 2): (lambda figure: BarCell(figure, enterprise_value, 'Enterprise Value', ['#bf9b30']), ['metrics']),
+    (2, 3): (lambda figure: BarCell(figure, pe_ratio, 'Price/Earnings Ratio (P/E)', ['#ffcf40']), ['metrics']),
+}
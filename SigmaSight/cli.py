@@ -0,0 +1,23 @@
+import numpy as np
+
+# Helpers shared by the command line tools (batch_report.py, screener.py,
+# dips.py). Kept free of matplotlib and Tk so importing it has no side effects.
+
+def read_universe(path):
+    # One ticker per line, # starts a comment
+    with open(path, 'r') as f:
+        return [line.split('#')[0].strip().upper() for line in f if line.split('#')[0].strip()]
+
+def json_number(value):
+    # A float for JSON output, None for missing, NaN and infinite values
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if value != value or value in (np.inf, -np.inf) else value
+
+def require_data(symbol, values):
+    # Unknown or delisted tickers load without error but have no numbers,
+    # fail them rather than report a row of blanks
+    if all(json_number(value) is None for value in values):
+        raise LookupError(f'No data for {symbol}')
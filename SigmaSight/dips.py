@@ -0,0 +1,134 @@
+import argparse
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import price_store
+
+from cli import read_universe
+
+# Distance of each ticker's price from its moving averages, computed from the
+# local price store for a whole universe at once. Closes are stacked into one
+# dates x tickers array so every average is a handful of NumPy operations on
+# the full universe rather than a loop over tickers.
+WINDOWS = (50, 100, 200)
+KINDS = ('ema', 'sma')
+
+# An EMA forgets its starting value slowly, load this many windows of history
+# so the seed has no visible effect on the last value
+WARMUP = 3
+
+MAX_WORKERS = 16
+
+def close_matrix(symbols, rows):
+    # Returns (dates, array) with the array shaped dates x symbols. Gaps inside
+    # a ticker's history carry the last close forward, dates before its first
+    # bar stay NaN.
+    closes = price_store.load_closes(symbols, rows).ffill()
+    closes = closes.iloc[-rows:]
+    return closes.index, closes.to_numpy(dtype=float)
+
+def ema(closes, window):
+    # Exponential moving average down the rows of a dates x tickers array.
+    # Each ticker starts from its first close, like pandas ewm(adjust=False).
+    alpha = 2 / (window + 1)
+    result = np.empty_like(closes)
+    state = np.full(closes.shape[1], np.nan)
+    for row in range(len(closes)):
+        value = closes[row]
+        state = np.where(np.isnan(state), value, state + alpha * (value - state))
+        result[row] = state
+    return result
+
+def sma(closes, window):
+    # Simple moving average down the rows, NaN until a ticker has window closes
+    valid = ~np.isnan(closes)
+    totals = np.cumsum(np.where(valid, closes, 0.0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+    totals = np.vstack([np.zeros((1, closes.shape[1])), totals])
+    counts = np.vstack([np.zeros((1, closes.shape[1]), dtype=counts.dtype), counts])
+
+    result = np.full(closes.shape, np.nan)
+    if len(closes) >= window:
+        window_totals = totals[window:] - totals[:-window]
+        window_counts = counts[window:] - counts[:-window]
+        result[window - 1:] = np.where(window_counts == window, window_totals / window, np.nan)
+    return result
+
+AVERAGES = {'ema': ema, 'sma': sma}
+
+def sync(symbols, max_workers=MAX_WORKERS):
+    # Bring the stored closes up to date, skipped per symbol when synced recently
+    def sync_symbol(symbol):
+        try:
+            price_store.sync(symbol)
+        except Exception:
+            pass  # Scan whatever is stored
+
+    if symbols:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(symbols))) as executor:
+            list(executor.map(sync_symbol, symbols))
+
+def dip_table(symbols, windows=WINDOWS, kinds=KINDS, prices=None, update=True):
+    # One row per symbol with the latest price, every requested average
+    # (ema_200, sma_50, ...) and the percentage distance from it
+    # (dip_ema_200, ...). prices optionally replaces the last stored close,
+    # e.g. with live quotes.
+    symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+    table = pd.DataFrame(index=pd.Index(symbols, name='ticker'))
+    if not symbols:
+        return table
+
+    if update:
+        sync(symbols)
+
+    dates, closes = close_matrix(symbols, WARMUP * max(windows))
+    latest = closes[-1] if len(closes) else np.full(len(symbols), np.nan)
+    if prices is not None:
+        live = pd.Series(prices, dtype=float).reindex(symbols).to_numpy()
+        latest = np.where(np.isnan(live), latest, live)
+
+    table['price'] = latest
+    table['price_date'] = dates[-1] if len(dates) else pd.NaT
+    for kind in kinds:
+        for window in windows:
+            average = AVERAGES[kind](closes, window)[-1] if len(closes) else np.full(len(symbols), np.nan)
+            table[f'{kind}_{window}'] = average
+            with np.errstate(divide='ignore', invalid='ignore'):
+                table[f'dip_{kind}_{window}'] = (latest - average) / average * 100
+    return table.replace([np.inf, -np.inf], np.nan)
+
+## Command line
+def main():
+    parser = argparse.ArgumentParser(description='Rank tickers by distance from their moving average')
+    parser.add_argument('symbols', nargs='*', help='Tickers to scan')
+    parser.add_argument('--universe', help='File with one ticker per line, # starts a comment')
+    parser.add_argument('--window', type=int, default=200, help='Moving average window in trading days')
+    parser.add_argument('--kind', choices=KINDS, default='ema', help='Exponential or simple average')
+    parser.add_argument('--top', type=int, default=20, help='How many of the deepest dips to print')
+    parser.add_argument('--no-sync', action='store_true', help='Only use prices already in the local store')
+    args = parser.parse_args()
+
+    symbols = [symbol.upper() for symbol in args.symbols]
+    if args.universe:
+        symbols += read_universe(args.universe)
+    if not symbols:
+        parser.error('give some symbols or a --universe file')
+
+    if not args.no_sync:
+        sync(symbols)
+    started = time.perf_counter()
+    table = dip_table(symbols, windows=(args.window,), kinds=(args.kind,), update=False)
+    elapsed = time.perf_counter() - started
+
+    column = f'dip_{args.kind}_{args.window}'
+    ranked = table.dropna(subset=[column]).sort_values(column)
+    print(ranked[['price', f'{args.kind}_{args.window}', column]].head(args.top).round(2).to_string())
+    print(f"Scanned {len(symbols)} tickers in {elapsed:.3f}s", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import os
+import zlib
+
+import matplotlib.dates as mdates
+import numpy as np
+import pandas as pd
+
+from providers import get_provider
+
+# Intraday prices for live mode. Each symbol keeps its latest minute closes in
+# a fixed size ring buffer, so watching a symbol all day uses constant memory
+# and a poll only appends the bars that are new. Bars come from the provider
+# (1 minute bars, yfinance keeps the last 7 days), or from a simulated random
+# walk when SIGMASIGHT_LIVE_FEED=simulated, for trying live mode offline.
+CAPACITY = 2 * 390  # Two regular sessions of minute bars
+POLL_SECONDS = float(os.environ.get('SIGMASIGHT_LIVE_POLL', '15'))
+BACKFILL_DAYS = 5
+
+class RingBuffer:
+    # Fixed number of rows, the oldest overwritten once full. Every row is
+    # written twice, at i and i + capacity, so the rows in order are always
+    # one contiguous slice and reading them copies nothing.
+    def __init__(self, capacity, columns):
+        self.capacity = capacity
+        self.data = np.full((2 * capacity, columns), np.nan)
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, row):
+        end = (self.start + self.size) % self.capacity
+        self.data[end] = row
+        self.data[end + self.capacity] = row
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def extend(self, rows):
+        for row in rows[-self.capacity:]:
+            self.append(row)
+
+    def replace_last(self, row):
+        end = (self.start + self.size - 1) % self.capacity
+        self.data[end] = row
+        self.data[end + self.capacity] = row
+
+    def view(self):
+        # Oldest first, a view into the buffer that the next append changes
+        return self.data[self.start:self.start + self.size]
+
+class LiveSeries:
+    # fetch runs on a worker thread, append and view on the Tk thread
+    def __init__(self, symbol, feed, capacity=CAPACITY):
+        self.symbol = symbol
+        self.feed = feed
+        self.buffer = RingBuffer(capacity, 2)  # matplotlib date, close
+        self.last_time = None
+
+    def fetch(self):
+        return self.feed.bars(self.symbol, self.last_time)
+
+    def append(self, bars):
+        # Adds bars after the last one, and replaces the last one when the
+        # feed sends it again (a minute bar still forming). Returns the
+        # number of bars taken.
+        if self.last_time is not None:
+            bars = bars[bars.index >= self.last_time]
+        if bars.empty:
+            return 0
+        rows = np.column_stack([mdates.date2num(bars.index), bars['Close'].to_numpy(dtype=float)])
+        if self.last_time is not None and bars.index[0] == self.last_time:
+            self.buffer.replace_last(rows[0])
+            rows = rows[1:]
+        self.buffer.extend(rows)
+        self.last_time = bars.index[-1]
+        return len(bars)
+
+    def view(self):
+        data = self.buffer.view()
+        return data[:, 0], data[:, 1]
+
+## Feeds
+class ProviderFeed:
+    def __init__(self, provider=None):
+        self.provider = provider or get_provider()
+
+    def bars(self, symbol, since):
+        start = since if since is not None else pd.Timestamp.now().normalize() - pd.Timedelta(days=BACKFILL_DAYS)
+        return self.provider.history(symbol, start=start, interval='1m')
+
+class SimulatedFeed:
+    # A random walk with one new minute bar per poll, on a clock of its own so
+    # tests do not wait. The first poll backfills a session.
+    def __init__(self, backfill=390, volatility=0.0008):
+        self.backfill = backfill
+        self.volatility = volatility
+        self.walks = {}  # symbol -> (rng, time of the last bar, last close)
+
+    def bars(self, symbol, since):
+        if symbol not in self.walks:
+            rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+            start = pd.Timestamp.now().floor('min') - pd.Timedelta(minutes=self.backfill)
+            self.walks[symbol] = (rng, start, float(rng.uniform(20, 500)))
+            count = self.backfill
+        else:
+            count = 1
+
+        rng, last_time, last_close = self.walks[symbol]
+        times = last_time + pd.to_timedelta(np.arange(1, count + 1), unit='min')
+        closes = last_close * np.exp(np.cumsum(rng.normal(0, self.volatility, count)))
+        self.walks[symbol] = (rng, times[-1], float(closes[-1]))
+        return pd.DataFrame({'Close': closes}, index=times)
+
+def feed_from_env():
+    if os.environ.get('SIGMASIGHT_LIVE_FEED') == 'simulated':
+        return SimulatedFeed()
+    return ProviderFeed()
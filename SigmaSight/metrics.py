@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# Fundamentals per fiscal period with the closing price on each period end
+# joined in, and every valuation ratio derived from them in one vectorized pass.
+# Statement frames come in yfinance layout (line items x period ends).
+
+# Output column -> (statement, line item)
+STATEMENT_ITEMS = {
+    'revenue': ('financials', 'Total Revenue'),
+    'gross_profit': ('financials', 'Gross Profit'),
+    'ebitda': ('financials', 'EBITDA'),
+    'net_income': ('financials', 'Net Income'),
+    'shares': ('balance_sheet', 'Ordinary Shares Number'),
+    'cash': ('balance_sheet', 'Cash And Cash Equivalents'),
+    'debt': ('balance_sheet', 'Total Debt'),
+    'equity': ('balance_sheet', 'Stockholders Equity'),
+    'fcf': ('cashflow', 'Free Cash Flow'),
+}
+
+# A period end with no trading day this close before it gets no price
+PRICE_TOLERANCE = pd.Timedelta(days=7)
+
+def _item(statement, line_item):
+    if line_item in statement.index:
+        return statement.loc[line_item]
+    return pd.Series(np.nan, index=statement.columns)
+
+def statement_table(financials, balance_sheet, cashflow, items=STATEMENT_ITEMS):
+    # A period x column table of the line items in items (column -> (statement,
+    # line item)), oldest period first. Missing line items are NaN.
+    statements = {'financials': financials, 'balance_sheet': balance_sheet, 'cashflow': cashflow}
+    table = pd.DataFrame({
+        column: pd.to_numeric(_item(statements[statement], line_item), errors='coerce')
+        for column, (statement, line_item) in items.items()
+    })
+    table.index = pd.DatetimeIndex(table.index, name='period').normalize().astype('datetime64[ns]')
+    return table.sort_index().dropna(how='all')
+
+def add_ratios(table):
+    table['eps'] = table['net_income'] / table['shares']
+    table['market_cap'] = table['close'] * table['shares']
+    table['ev'] = table['market_cap'] + table['debt'].fillna(0) - table['cash'].fillna(0)
+    table['pe'] = table['close'] / table['eps']
+    table['price_to_sales'] = table['market_cap'] / table['revenue']
+    table['price_to_book'] = table['market_cap'] / table['equity']
+    table['ev_to_ebitda'] = table['ev'] / table['ebitda']
+    table['fcf_yield'] = table['fcf'] / table['market_cap']
+    return table.replace([np.inf, -np.inf], np.nan)
+
+def fiscal_metrics(financials, balance_sheet, cashflow, history):
+    table = statement_table(financials, balance_sheet, cashflow)
+
+    # As-of join: the last close on or before each fiscal period end
+    closes = history['Close'].dropna()
+    closes = pd.DataFrame({'close': closes.values, 'price_date': closes.index.astype('datetime64[ns]')})
+    table = pd.merge_asof(
+        table.reset_index(), closes,
+        left_on='period', right_on='price_date',
+        direction='backward', tolerance=PRICE_TOLERANCE,
+    ).set_index('period')
+
+    return add_ratios(table)
+
+def current_metrics(metrics, history):
+    # The latest reported fundamentals valued at the most recent close
+    closes = history['Close'].dropna()
+    if metrics.empty or closes.empty:
+        return pd.Series(np.nan, index=metrics.columns, dtype=object)
+
+    latest = metrics.ffill().iloc[[-1]].copy()
+    latest['close'] = closes.iloc[-1]
+    latest['price_date'] = closes.index[-1]
+    return add_ratios(latest).iloc[0]
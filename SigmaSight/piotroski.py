@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from metrics import statement_table
+
+# Piotroski F-score from annual statements. Each fiscal year is compared with
+# the one before it on nine pass/fail tests, the score is the number passed.
+# Works on one ticker's items (indexed by period) or on a panel of many
+# tickers stacked on a (symbol, period) index, in the same vectorized pass.
+
+# Column -> (statement, line item), statements in yfinance layout
+FSCORE_ITEMS = {
+    'net_income': ('financials', 'Net Income'),
+    'revenue': ('financials', 'Total Revenue'),
+    'gross_profit': ('financials', 'Gross Profit'),
+    'total_assets': ('balance_sheet', 'Total Assets'),
+    'long_term_debt': ('balance_sheet', 'Long Term Debt'),
+    'total_debt': ('balance_sheet', 'Total Debt'),
+    'current_assets': ('balance_sheet', 'Current Assets'),
+    'current_liabilities': ('balance_sheet', 'Current Liabilities'),
+    'shares': ('balance_sheet', 'Ordinary Shares Number'),
+    'operating_cash_flow': ('cashflow', 'Operating Cash Flow'),
+}
+
+# The nine tests, in the order of Piotroski (2000)
+CRITERIA = [
+    'positive_roa',           # Net income over opening assets above zero
+    'positive_cfo',           # Operating cash flow above zero
+    'improving_roa',          # Return on assets up on last year
+    'cfo_above_net_income',   # Earnings backed by cash (low accruals)
+    'lower_leverage',         # Long term debt over average assets down
+    'higher_current_ratio',   # Current ratio up
+    'no_dilution',            # Share count not up
+    'higher_gross_margin',    # Gross margin up
+    'higher_asset_turnover',  # Revenue over opening assets up
+]
+
+def statement_items(financials, balance_sheet, cashflow):
+    # One ticker's items as a period x column table, oldest period first
+    return statement_table(financials, balance_sheet, cashflow, FSCORE_ITEMS)
+
+def statement_panel(statements):
+    # {symbol: (financials, balance_sheet, cashflow)} -> items stacked on (symbol, period)
+    frames = {symbol: statement_items(*frames) for symbol, frames in statements.items()}
+    if not frames:
+        return pd.DataFrame(columns=list(FSCORE_ITEMS), index=pd.MultiIndex.from_arrays([[], []], names=['symbol', 'period']))
+    return pd.concat(frames, names=['symbol', 'period'])
+
+def _previous(items):
+    # The year before each row, within the same ticker on a panel
+    if isinstance(items.index, pd.MultiIndex):
+        return items.groupby(level='symbol').shift(1)
+    return items.shift(1)
+
+def criteria(items):
+    # Pass/fail for every test on every period. A test whose inputs are
+    # missing, including each ticker's first year, fails.
+    items = items.sort_index()
+    previous = _previous(items)
+    opening_assets = previous['total_assets']
+    previous_opening_assets = _previous(previous)['total_assets']
+
+    # Long term debt when reported, total debt otherwise
+    debt = items['long_term_debt'].fillna(items['total_debt'])
+    previous_debt = previous['long_term_debt'].fillna(previous['total_debt'])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roa = items['net_income'] / opening_assets
+        previous_roa = previous['net_income'] / previous_opening_assets
+        leverage = debt / ((items['total_assets'] + opening_assets) / 2)
+        previous_leverage = previous_debt / ((previous['total_assets'] + previous_opening_assets) / 2)
+        current_ratio = items['current_assets'] / items['current_liabilities']
+        previous_current_ratio = previous['current_assets'] / previous['current_liabilities']
+        gross_margin = items['gross_profit'] / items['revenue']
+        previous_gross_margin = previous['gross_profit'] / previous['revenue']
+        turnover = items['revenue'] / opening_assets
+        previous_turnover = previous['revenue'] / previous_opening_assets
+
+    return pd.DataFrame({
+        'positive_roa': roa > 0,
+        'positive_cfo': items['operating_cash_flow'] > 0,
+        'improving_roa': roa > previous_roa,
+        'cfo_above_net_income': items['operating_cash_flow'] > items['net_income'],
+        'lower_leverage': leverage < previous_leverage,
+        'higher_current_ratio': current_ratio > previous_current_ratio,
+        'no_dilution': items['shares'] <= previous['shares'],
+        'higher_gross_margin': gross_margin > previous_gross_margin,
+        'higher_asset_turnover': turnover > previous_turnover,
+    }, index=items.index)[CRITERIA]
+
+def fscore(items):
+    # Criteria plus the score for every period
+    table = criteria(items)
+    table['score'] = table[CRITERIA].sum(axis=1)
+    return table
+
+def latest(scores):
+    # The most recent period per ticker, or the last row for a single ticker
+    if isinstance(scores.index, pd.MultiIndex):
+        return scores.groupby(level='symbol').tail(1).droplevel('period')
+    return scores.iloc[-1]
+
+def score(financials, balance_sheet, cashflow):
+    # The latest F-score for one ticker
+    scores = fscore(statement_items(financials, balance_sheet, cashflow))
+    return int(latest(scores)['score']) if not scores.empty else 0
+
+def rating(score):
+    if score >= 8:
+        return 'Superb'
+    elif score >= 6:
+        return 'High'
+    elif score >= 4:
+        return 'Medium'
+    elif score >= 2:
+        return 'Okay'
+    return 'Low'
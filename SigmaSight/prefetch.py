@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+
+from collections import OrderedDict
+
+import cache
+import tracing
+import watchlist_store
+
+from snapshot import TickerSnapshot
+
+# Warms the tickers the user is likely to open next while the dashboard is
+# idle: the most recently viewed first, then everything on the watchlists.
+# Tickers load one at a time on a background thread through the same provider
+# as the dashboard, so prefetching shares its rate limit, and a pass stops
+# between datasets as soon as the user starts an update. A fetch still in
+# flight when that happens is merged with the dashboard's request for it.
+#
+# Loaded snapshots are kept in memory up to a byte budget, oldest dropped
+# first, so switching to one of them skips the fetch, the cache read and the
+# metrics computation. SIGMASIGHT_PREFETCH_MB sets the budget, 0 turns
+# prefetching off.
+PREFETCH_BUDGET_BYTES = int(float(os.environ.get('SIGMASIGHT_PREFETCH_MB', '64')) * 2**20)
+MAX_SYMBOLS = 20
+
+# A prefetched snapshot goes stale like the quotes in the cache do
+MAX_AGE = cache.DATASET_TTLS['info']
+
+class Prefetcher:
+    def __init__(self, datasets, budget_bytes=PREFETCH_BUDGET_BYTES, max_symbols=MAX_SYMBOLS):
+        self.datasets = list(datasets)
+        self.budget_bytes = budget_bytes
+        self.max_symbols = max_symbols
+        self.snapshots = OrderedDict()  # symbol -> (snapshot, bytes, loaded at)
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.hits = 0
+
+    def candidates(self, exclude=()):
+        exclude = {symbol.upper() for symbol in exclude}
+        symbols = watchlist_store.recent()
+        for name in watchlist_store.list_names():
+            symbols += watchlist_store.symbols(name)
+        return [symbol for symbol in dict.fromkeys(symbols) if symbol not in exclude][:self.max_symbols]
+
+    def start(self, exclude=()):
+        # Begins a new pass in the background, cancelling any pass still running
+        self.cancel()
+        if self.budget_bytes <= 0:
+            return None
+        self.stopped = threading.Event()
+        thread = threading.Thread(target=self._run, args=(self.stopped, exclude), name='sigmasight-prefetch', daemon=True)
+        thread.start()
+        return thread
+
+    def cancel(self):
+        self.stopped.set()
+
+    def take(self, symbol):
+        # The prefetched snapshot for symbol, or None
+        with self.lock:
+            entry = self.snapshots.get(symbol.upper())
+            if entry is None or time.time() - entry[2] > MAX_AGE:
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'symbols': len(self.snapshots),
+                'bytes': sum(size for _, size, _ in self.snapshots.values()),
+                'budget_bytes': self.budget_bytes,
+                'hits': self.hits,
+            }
+
+    def _fresh(self, symbol):
+        with self.lock:
+            entry = self.snapshots.get(symbol)
+            return entry is not None and time.time() - entry[2] <= MAX_AGE
+
+    def _run(self, stopped, exclude):
+        for symbol in self.candidates(exclude):
+            if stopped.is_set():
+                return
+            if self._fresh(symbol):
+                continue
+            snapshot = TickerSnapshot(symbol)
+            try:
+                with tracing.span('prefetch', 'prefetch', symbol):
+                    for dataset in self.datasets:
+                        if stopped.is_set():
+                            return
+                        snapshot.load(dataset)
+            except Exception:
+                continue  # Left for the dashboard to report if the user opens it
+            self._keep(symbol, snapshot)
+
+    def _keep(self, symbol, snapshot):
+        size = snapshot.size()
+        if size > self.budget_bytes:
+            return
+        with self.lock:
+            self.snapshots.pop(symbol, None)
+            self.snapshots[symbol] = (snapshot, size, time.time())
+            total = sum(entry[1] for entry in self.snapshots.values())
+            while total > self.budget_bytes:
+                _, (_, dropped, _) = self.snapshots.popitem(last=False)
+                total -= dropped
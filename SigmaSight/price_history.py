@@ -0,0 +1,261 @@
+import time
+import tkinter
+
+import matplotlib.dates as mdates
+import numpy as np
+import pandas as pd
+
+import cache
+import price_store
+import tracing
+
+from charts import lttb, set_colours
+from providers import get_provider
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+
+# Long range price chart with pan and zoom. Only the visible range (and one
+# view width either side, so panning has something to show) is drawn, reduced
+# with LTTB to about a point per pixel, so a draw costs the same for a month or
+# for forty years. The whole range comes from the stored daily bars, extended
+# back with weekly bars to the first trade. Finer bars are fetched when the
+# view needs them: daily bars from before the stored history once the view
+# reaches back past it, and intraday bars when zoomed in on recent days.
+
+# (interval, widest view in days that uses it, days back the provider keeps)
+# finest first. yfinance keeps 60 days of 5 minute and 730 of hourly bars.
+INTRADAY_LEVELS = [
+    ('5m', 5, 59),
+    ('1h', 90, 729),
+]
+
+# Level name of the daily bars from before price_store.HISTORY_START
+EARLY_DAILY = '1d'
+
+# Where the EARLY_DAILY request starts when the weekly bars are not cached,
+# yfinance has nothing older
+EARLY_DAILY_START = '1900-01-01'
+
+# Milliseconds without a zoom or pan before the visible range is resampled
+RESAMPLE_DELAY_MS = 100
+
+# Showing the same ticker again reloads it once the stored bars may be out of date
+RELOAD_SECONDS = price_store.SYNC_INTERVAL
+
+def _closes(data):
+    closes = data['Close'].dropna()
+    return mdates.date2num(closes.index), closes.to_numpy(dtype=float)
+
+def base_series(symbol, provider=None):
+    # Daily closes since price_store.HISTORY_START, with weekly closes before
+    # them, and the x where the daily bars start (-inf without any). Weekly
+    # bars that cannot be fetched only shorten the history.
+    provider = provider or get_provider()
+    x, y = _closes(price_store.get_history(symbol, provider=provider))
+    daily_start = x[0] if len(x) else -np.inf
+    try:
+        weekly = cache.get_or_fetch(symbol, 'history_1wk', lambda: provider.history(symbol, interval='1wk'))
+    except Exception:
+        return x, y, daily_start
+
+    weekly_x, weekly_y = _closes(weekly)
+    earlier = weekly_x < daily_start
+    return np.concatenate([weekly_x[earlier], x]), np.concatenate([weekly_y[earlier], y]), daily_start
+
+def level_series(symbol, interval, provider=None):
+    # Daily bars from before the stored history (EARLY_DAILY), or the
+    # intraday bars the provider still keeps for an INTRADAY_LEVELS interval
+    provider = provider or get_provider()
+    if interval == EARLY_DAILY:
+        # From the first weekly bar, only the years the stored history lacks
+        found, weekly = cache.get(symbol, 'history_1wk')
+        start = weekly.index[0].strftime('%Y-%m-%d') if found and len(weekly) else EARLY_DAILY_START
+        fetch = lambda: provider.history(symbol, start=start, end=price_store.HISTORY_START)
+        return _closes(cache.get_or_fetch(symbol, 'history_early', fetch))
+
+    kept = next(kept for name, _, kept in INTRADAY_LEVELS if name == interval)
+    start = pd.Timestamp.now().normalize() - pd.Timedelta(days=kept)
+    return _closes(cache.get_or_fetch(symbol, f'history_{interval}', lambda: provider.history(symbol, start=start, interval=interval)))
+
+class PriceHistoryChart:
+    # request_level(symbol, interval) is called, once per level and symbol,
+    # when the view needs bars finer than the ones loaded (see level_series).
+    # The caller fetches them and passes them to add_level.
+    def __init__(self, figure, request_level):
+        self.figure = figure
+        self.request_level = request_level
+        self.ax = figure.add_subplot(111)
+        set_colours(self.ax)
+        self.line, = self.ax.plot([], [], color='#3b86ff', linewidth=1)
+
+        locator = mdates.AutoDateLocator()
+        self.ax.xaxis.set_major_locator(locator)
+        self.ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+
+        self.symbol = None
+        self.base = (np.array([]), np.array([]))
+        self.daily_start = -np.inf
+        self.levels = {}  # interval -> (x, y)
+        self.requested = set()
+        self.drawn = 0
+
+    def show(self, symbol, x, y, daily_start=-np.inf):
+        # A new symbol starts on its whole history, reloading the same one
+        # keeps the view
+        reload = symbol == self.symbol
+        self.symbol = symbol
+        self.base = (x, y)
+        self.daily_start = daily_start
+        self.levels = {}
+        self.requested = set()
+        self.ax.set_title(f'{symbol} Price History', color='white', fontsize=12)
+        if len(x) and not reload:
+            self.ax.set_xlim(x[0], x[-1])
+        self.resample()
+
+    def add_level(self, symbol, interval, x, y):
+        if symbol == self.symbol and len(x):
+            self.levels[interval] = (x, y)
+            self.resample()
+
+    def wanted_level(self, low, high):
+        # The finest intraday level for the view, None when daily bars do
+        today = mdates.date2num(pd.Timestamp.now().normalize())
+        for interval, widest, kept in INTRADAY_LEVELS:
+            if high - low <= widest and high >= today - kept:
+                return interval
+        return None
+
+    def request(self, interval):
+        if interval not in self.levels and interval not in self.requested:
+            self.requested.add(interval)
+            self.request_level(self.symbol, interval)
+
+    def series(self, low, high):
+        x, y = self.base
+
+        # Only weekly bars are loaded before the daily ones start, once the
+        # view reaches back there the daily bars are fetched and take over
+        if low < self.daily_start:
+            self.request(EARLY_DAILY)
+        if EARLY_DAILY in self.levels:
+            early_x, early_y = self.levels[EARLY_DAILY]
+            before, after = np.searchsorted(x, early_x[0]), np.searchsorted(x, self.daily_start)
+            x, y = np.concatenate([x[:before], early_x, x[after:]]), np.concatenate([y[:before], early_y, y[after:]])
+
+        interval = self.wanted_level(low, high)
+        if interval is not None:
+            self.request(interval)
+
+        # Until the wanted level arrives the finest loaded one stands in,
+        # spliced onto the daily bars where its history ends
+        loaded = [name for name, _, _ in INTRADAY_LEVELS if name in self.levels]
+        if interval is None or not loaded:
+            return x, y
+        level_x, level_y = self.levels[interval if interval in self.levels else loaded[0]]
+        before = np.searchsorted(x, level_x[0])
+        return np.concatenate([x[:before], level_x]), np.concatenate([y[:before], level_y])
+
+    def resample(self):
+        # Visible range plus one view width either side, LTTB down to the
+        # axes width in pixels
+        with tracing.span('Price History', 'compute', self.symbol):
+            low, high = self.ax.get_xlim()
+            x, y = self.series(low, high)
+            margin = high - low
+            first = max(np.searchsorted(x, low - margin) - 1, 0)
+            last = min(np.searchsorted(x, high + margin) + 1, len(x))
+            pixels = max(int(self.ax.get_window_extent().width), 1)
+            x, y = lttb(x[first:last], y[first:last], 3 * pixels)
+            self.line.set_data(x, y)
+            self.drawn = len(x)
+
+            visible = y[(x >= low) & (x <= high)]
+            if len(visible):
+                bottom, top = visible.min(), visible.max()
+                pad = (top - bottom) * 0.05 or abs(top) * 0.05 or 1
+                self.ax.set_ylim(bottom - pad, top + pad)
+
+def open_price_history(master, workers):
+    # Builds the price history as a window of the main application, on its
+    # event loop and worker threads (workers, see UiWorkerPool.share). Closing
+    # only hides it, the returned function shows it for a symbol.
+    root = tkinter.Toplevel(master)
+    root.title('SigmaSight - Price History')
+    root.configure(background="#23222b")
+    root.geometry('1200x700')
+
+    figure = Figure(figsize=(12, 6.5), facecolor='black')
+    canvas = FigureCanvasTkAgg(figure, master=root)
+    pending_resample = [None]
+    loaded_at = [0.0]  # time.monotonic() of the last load of chart.symbol
+
+    def request_level(symbol, interval):
+        def loaded(series):
+            chart.add_level(symbol, interval, *series)
+            canvas.draw_idle()
+
+        workers.submit(lambda: level_series(symbol, interval), loaded)
+
+    chart = PriceHistoryChart(figure, request_level)
+    tracing.trace_draws(canvas, 'Price History', lambda: chart.symbol)
+
+    toolbar = NavigationToolbar2Tk(canvas, root, pack_toolbar=False)
+    toolbar.update()
+    toolbar.pack(side='bottom', fill='x')
+    canvas.get_tk_widget().pack(fill='both', expand=True)
+
+    def resample():
+        pending_resample[0] = None
+        chart.resample()
+        canvas.draw_idle()
+
+    def schedule_resample(ax=None):
+        # Pan and zoom change the limits many times a second, resample once
+        # they settle
+        if pending_resample[0] is not None:
+            root.after_cancel(pending_resample[0])
+        pending_resample[0] = root.after(RESAMPLE_DELAY_MS, resample)
+
+    def zoom(event):
+        # Scroll wheel zooms around the pointer
+        if event.inaxes is not chart.ax or event.xdata is None:
+            return
+        scale = 0.8 if event.button == 'up' else 1.25
+        low, high = chart.ax.get_xlim()
+        chart.ax.set_xlim(event.xdata - (event.xdata - low) * scale, event.xdata + (high - event.xdata) * scale)
+        canvas.draw_idle()
+
+    chart.ax.callbacks.connect('xlim_changed', schedule_resample)
+    canvas.mpl_connect('scroll_event', zoom)
+    canvas.mpl_connect('resize_event', lambda event: schedule_resample())
+
+    def set_title(text):
+        chart.ax.set_title(text, color='white', fontsize=12)
+        canvas.draw_idle()
+
+    def close():
+        # Levels still being fetched are dropped, ask again when shown
+        workers.new_generation()
+        chart.requested = set(chart.levels)
+        root.withdraw()
+
+    def show(symbol):
+        symbol = symbol.strip().upper()
+        root.deiconify()
+        root.lift()
+        if not symbol or (symbol == chart.symbol and time.monotonic() - loaded_at[0] < RELOAD_SECONDS):
+            return
+        workers.new_generation()
+        set_title(f'Loading {symbol}...')
+
+        def loaded(series):
+            loaded_at[0] = time.monotonic()
+            chart.show(symbol, *series)
+            canvas.draw_idle()
+
+        workers.submit(lambda: base_series(symbol), loaded, lambda error: set_title(f'No price history for {symbol}'))
+
+    root.protocol("WM_DELETE_WINDOW", close)
+    return show
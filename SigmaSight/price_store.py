@@ -0,0 +1,355 @@
+import contextlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from cache import CACHE_DIR
+from providers import PRICE_COLUMNS, get_provider
+
+# Daily OHLCV bars per symbol. The first request downloads the full history,
+# later ones only ask for the bars after the last stored date.
+#
+# Bars are stored column by column in one memory-mapped file per symbol: an
+# int64 date column followed by the price and volume columns, each with room
+# for CAPACITY rows. The file in use and how many rows are valid are kept in
+# SQLite. Reads return read-only views into the mapping, so the dashboard and
+# the watchlist share one copy of every file through the page cache, and memory
+# stays flat however many symbols are tracked. Close tables for whole universes
+# read the files instead, as a mapping holds a file descriptor. New bars are
+# written after the valid rows before the row count is committed, a full
+# re-download goes to a new file, so rows a reader can see never change
+# (except the last bar of a partial day, which is refreshed in place).
+PRICE_FILE = os.path.join(CACHE_DIR, 'prices.sqlite')
+PRICE_DIR = os.path.join(CACHE_DIR, 'prices')
+HISTORY_START = '2002-01-01'
+COLUMNS = PRICE_COLUMNS
+
+# Storage type per column, float32 is plenty for the intraday range but
+# closes feed valuations and averages and volumes pass 2**24
+COLUMN_TYPES = {
+    'Open': np.float32,
+    'High': np.float32,
+    'Low': np.float32,
+    'Close': np.float64,
+    'Volume': np.float64,
+}
+DATE_TYPE = np.int64  # Nanoseconds since the epoch, as a DatetimeIndex stores them
+
+# Spare rows in a new file, about a year of trading days
+GROWTH_ROWS = 256
+
+# Files kept mapped in this process, least recently used unmapped first.
+# Every mapping holds a file descriptor, so at most a quarter of the process
+# limit is used for them (see _mapping_limit).
+MAX_MAPPED = 1024
+
+# Skip the network entirely if the symbol was synced this recently, in seconds
+SYNC_INTERVAL = 15 * 60
+
+# Relative difference on the last complete stored bar that means the history was re-adjusted
+# (split or dividend) and has to be downloaded again
+ADJUSTMENT_TOLERANCE = 1e-4
+
+_schema_ready = False
+_mapped = OrderedDict()  # file name -> read-only uint8 memmap
+_mapped_lock = threading.Lock()
+_symbol_locks = {}
+
+@contextlib.contextmanager
+def connect():
+    global _schema_ready
+    if not _schema_ready:
+        create_schema()
+        _schema_ready = True
+
+    conn = sqlite3.connect(PRICE_FILE, timeout=30)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def create_schema():
+    os.makedirs(PRICE_DIR, exist_ok=True)
+    conn = sqlite3.connect(PRICE_FILE, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS series (
+            symbol TEXT PRIMARY KEY,
+            file TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            capacity INTEGER NOT NULL,
+            synced_at REAL NOT NULL
+        )''')
+    conn.commit()
+    _import_bars_table(conn)
+    conn.close()
+
+def _has_table(conn, name):
+    return conn.execute('SELECT COUNT(*) FROM sqlite_master WHERE name = ?', (name,)).fetchone()[0] > 0
+
+def _import_bars_table(conn):
+    # Earlier versions kept every bar as a row in SQLite, move them to files.
+    # Every process opening the store gets here, so the tables are looked at
+    # again once the write lock is held and only the first one imports.
+    if not _has_table(conn, 'bars'):
+        return
+    conn.execute('BEGIN IMMEDIATE')
+    written = []
+    try:
+        if not _has_table(conn, 'bars'):
+            conn.rollback()
+            return
+        synced = dict(conn.execute('SELECT symbol, synced_at FROM synced').fetchall()) if _has_table(conn, 'synced') else {}
+        for symbol, in conn.execute('SELECT DISTINCT symbol FROM bars').fetchall():
+            rows = conn.execute('SELECT date, open, high, low, close, volume FROM bars WHERE symbol = ? ORDER BY date', (symbol,)).fetchall()
+            data = pd.DataFrame(rows, columns=['Date'] + COLUMNS)
+            data.index = pd.to_datetime(data.pop('Date'))
+            file, capacity = write_file(symbol, data)
+            written.append(file)
+            conn.execute('INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?)', (symbol, file, len(data), capacity, synced.get(symbol, 0.0)))
+        conn.execute('DROP TABLE IF EXISTS bars')
+        conn.execute('DROP TABLE IF EXISTS synced')
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        for file in written:
+            _remove(file)
+        raise
+    conn.execute('VACUUM')
+
+## Files
+def _layout(capacity):
+    # Byte offset of every column in a file with room for capacity rows
+    offsets = {'Date': 0}
+    position = capacity * np.dtype(DATE_TYPE).itemsize
+    for column in COLUMNS:
+        offsets[column] = position
+        position += capacity * np.dtype(COLUMN_TYPES[column]).itemsize
+    return offsets, position
+
+def _path(file):
+    return os.path.join(PRICE_DIR, file)
+
+def _symbol_lock(symbol):
+    with _mapped_lock:
+        return _symbol_locks.setdefault(symbol, threading.Lock())
+
+def write_file(symbol, data, capacity=None):
+    # Writes bars to a new file and returns (file name, capacity)
+    capacity = max(capacity or 0, len(data) + GROWTH_ROWS)
+    offsets, size = _layout(capacity)
+    file = f"{re.sub(r'[^A-Za-z0-9._-]', '_', symbol)}-{uuid.uuid4().hex[:8]}.bin"
+    with open(_path(file), 'wb') as f:
+        f.truncate(size)
+        _write_rows(f, offsets, 0, data)
+    return file, capacity
+
+def _write_rows(f, offsets, first, data):
+    dates = np.asarray(data.index.values.astype('datetime64[ns]').view(DATE_TYPE), dtype=DATE_TYPE)
+    f.seek(offsets['Date'] + first * np.dtype(DATE_TYPE).itemsize)
+    f.write(dates.tobytes())
+    for column in COLUMNS:
+        values = data[column].to_numpy(dtype=COLUMN_TYPES[column], na_value=np.nan)
+        f.seek(offsets[column] + first * values.itemsize)
+        f.write(values.tobytes())
+
+def _remove(file):
+    with _mapped_lock:
+        _mapped.pop(file, None)
+    try:
+        os.remove(_path(file))
+    except OSError:
+        pass  # Still mapped somewhere on Windows, left for the next invalidate
+
+def _mapping_limit():
+    try:
+        import resource
+        limit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+    except (ImportError, OSError, ValueError):
+        return MAX_MAPPED  # Windows maps files without descriptors
+    if limit == resource.RLIM_INFINITY:
+        return MAX_MAPPED
+    return max(16, min(MAX_MAPPED, limit // 4))
+
+_max_mapped = _mapping_limit()
+
+def _mapping(file):
+    with _mapped_lock:
+        mapping = _mapped.get(file)
+        if mapping is None:
+            mapping = np.memmap(_path(file), dtype=np.uint8, mode='r')
+            _mapped[file] = mapping
+            if len(_mapped) > _max_mapped:
+                _mapped.popitem(last=False)  # Unmapped once the last view is gone
+        else:
+            _mapped.move_to_end(file)
+        return mapping
+
+def columns(file, rows, capacity):
+    # Zero-copy views of the valid rows: (int64 dates, {column: values})
+    mapping = _mapping(file)
+    offsets, _ = _layout(capacity)
+
+    def view(offset, dtype):
+        return mapping[offset:offset + rows * np.dtype(dtype).itemsize].view(dtype)
+
+    return view(offsets['Date'], DATE_TYPE), {column: view(offsets[column], COLUMN_TYPES[column]) for column in COLUMNS}
+
+def _read(file, offset, dtype, count):
+    # A copy of count values from offset, for reads that should not keep the
+    # file mapped (and its descriptor open)
+    with open(_path(file), 'rb') as f:
+        f.seek(offset)
+        return np.fromfile(f, dtype=dtype, count=count)
+
+def _series(conn, symbol):
+    return conn.execute('SELECT file, rows, capacity, synced_at FROM series WHERE symbol = ?', (symbol,)).fetchone()
+
+## Sync
+def download(symbol, start, provider=None):
+    return (provider or get_provider()).history(symbol, start=start)
+
+def stored_bar(stored, back=1):
+    # (date, close) of the back-th newest stored bar, or None
+    if stored is None or stored[1] < back:
+        return None
+    dates, values = columns(*stored[:3])
+    return pd.Timestamp(dates[-back]).strftime('%Y-%m-%d'), float(values['Close'][-back])
+
+def sync(symbol, force=False, provider=None):
+    # Bring the stored bars up to date and return how many rows were written
+    symbol = symbol.upper()
+    with _symbol_lock(symbol):
+        with connect() as conn:
+            stored = _series(conn, symbol)
+        if stored and not force and time.time() - stored[3] < SYNC_INTERVAL:
+            return 0
+        last = stored_bar(stored)
+
+        replace = last is None
+        if last is None:
+            new_bars = download(symbol, HISTORY_START, provider)
+        else:
+            # The newest stored bar may be a partial day, it is downloaded
+            # again and overwritten in place. The one before it is complete, a
+            # different close there means the history was re-adjusted.
+            check_date, check_close = stored_bar(stored, 2) or last
+            new_bars = download(symbol, check_date, provider)
+            overlap = new_bars[new_bars.index.strftime('%Y-%m-%d') == check_date]
+            if not overlap.empty and abs(overlap['Close'].iloc[0] - check_close) > ADJUSTMENT_TOLERANCE * abs(check_close):
+                new_bars = download(symbol, HISTORY_START, provider)
+                replace = True
+        new_bars = new_bars[~new_bars.index.duplicated(keep='last')].sort_index()
+
+        if replace:
+            file, capacity = write_file(symbol, new_bars)
+            rows = len(new_bars)
+        else:
+            file, rows, capacity = _append(symbol, stored, new_bars, last[0])
+
+        with connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?)', (symbol, file, rows, capacity, time.time()))
+        if stored and stored[0] != file:
+            _remove(stored[0])
+    return len(new_bars)
+
+def _append(symbol, stored, new_bars, last_date):
+    # Writes bars from the last stored date on after the valid rows, into a
+    # bigger file when they do not fit. Returns (file, rows, capacity).
+    file, rows, capacity, _ = stored
+    new_bars = new_bars[new_bars.index >= pd.Timestamp(last_date)]
+    if new_bars.empty:
+        return file, rows, capacity
+    first = rows - 1 if new_bars.index[0] == pd.Timestamp(last_date) else rows
+    if first + len(new_bars) > capacity:
+        kept = load_stored(stored).iloc[:first]
+        data = pd.concat([kept, new_bars[COLUMNS]])
+        new_file, new_capacity = write_file(symbol, data, capacity * 2)
+        return new_file, len(data), new_capacity
+
+    offsets, _ = _layout(capacity)
+    with open(_path(file), 'r+b') as f:
+        _write_rows(f, offsets, first, new_bars)
+    return file, first + len(new_bars), capacity
+
+## Reads
+def load_stored(stored, start=None, end=None):
+    if stored is None:
+        return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+    dates, values = columns(*stored[:3])
+    first = np.searchsorted(dates, pd.Timestamp(str(start)[:10]).value) if start else 0
+    last = np.searchsorted(dates, (pd.Timestamp(str(end)[:10]) + pd.Timedelta(days=1)).value) if end else len(dates)
+    index = pd.DatetimeIndex(dates[first:last].view('datetime64[ns]'), name='Date', copy=False)
+    return pd.DataFrame({column: values[column][first:last] for column in COLUMNS}, index=index, copy=False)
+
+def load(symbol, start=None, end=None):
+    # Read-only, the columns are views into the mapped file
+    with connect() as conn:
+        stored = _series(conn, symbol.upper())
+    return load_stored(stored, start, end)
+
+def load_closes(symbols, rows=None):
+    # Closing prices for many symbols as a wide table (dates x symbols). rows
+    # keeps only about that many trading days before the newest stored bar.
+    # Universes run into thousands of symbols, so the dates and closes are
+    # read from each file rather than mapped, and no descriptors stay open.
+    symbols = [symbol.upper() for symbol in symbols]
+    with connect() as conn:
+        stored = {}
+        for chunk in range(0, len(symbols), 500):  # SQLite caps the number of parameters
+            batch = symbols[chunk:chunk + 500]
+            marks = ', '.join('?' * len(batch))
+            for symbol, *series in conn.execute(f'SELECT symbol, file, rows, capacity FROM series WHERE symbol IN ({marks})', batch):
+                stored[symbol] = series
+
+    stored = {symbol: series for symbol, series in stored.items() if series[1]}
+    if not stored:
+        return pd.DataFrame(index=pd.DatetimeIndex([]), columns=symbols, dtype=float)
+    dates = {symbol: _read(file, _layout(capacity)[0]['Date'], DATE_TYPE, count) for symbol, (file, count, capacity) in stored.items()}
+
+    start = None
+    if rows:
+        # Calendar days covering that many trading days, with room for holidays
+        newest = max(symbol_dates[-1] for symbol_dates in dates.values())
+        start = newest - (int(rows * 365 / 250) + 10) * 86400 * 10**9
+    slices = {}
+    for symbol, (file, count, capacity) in stored.items():
+        first = np.searchsorted(dates[symbol], start) if start is not None else 0
+        offset = _layout(capacity)[0]['Close'] + first * np.dtype(COLUMN_TYPES['Close']).itemsize
+        slices[symbol] = (dates[symbol][first:], _read(file, offset, COLUMN_TYPES['Close'], count - first))
+
+    index = np.unique(np.concatenate([dates for dates, _ in slices.values()]))
+    closes = np.full((len(index), len(symbols)), np.nan)
+    for column, symbol in enumerate(symbols):
+        if symbol in slices:
+            dates, values = slices[symbol]
+            closes[np.searchsorted(index, dates), column] = values
+    return pd.DataFrame(closes, index=pd.DatetimeIndex(index.view('datetime64[ns]')), columns=symbols)
+
+def get_history(symbol, start=None, end=None, provider=None):
+    sync(symbol, provider=provider)
+    return load(symbol, start, end)
+
+def invalidate(symbol=None):
+    with connect() as conn:
+        if symbol:
+            files = conn.execute('SELECT file FROM series WHERE symbol = ?', (symbol.upper(),)).fetchall()
+            conn.execute('DELETE FROM series WHERE symbol = ?', (symbol.upper(),))
+        else:
+            files = conn.execute('SELECT file FROM series').fetchall()
+            conn.execute('DELETE FROM series')
+    for file, in files:
+        _remove(file)
+    if symbol is None:
+        # Files left behind by an earlier invalidate while they were mapped
+        for file in os.listdir(PRICE_DIR):
+            _remove(file)
@@ -0,0 +1,316 @@
+import argparse
+import json
+import os
+import random
+import time
+
+from datetime import date
+
+import pandas as pd
+
+import tracing
+
+# Every fetch in SigmaSight goes through a DataProvider. The yfinance backend is
+# used by default, the replay backend serves recorded fixtures from disk so the
+# dashboard and watchlist can be profiled and tested without a network.
+DATASETS = ['info', 'calendar', 'financials', 'balance_sheet', 'cashflow', 'dividends', 'history']
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+class DataProvider:
+    name = 'base'
+
+    def info(self, symbol):
+        raise NotImplementedError
+
+    def calendar(self, symbol):
+        raise NotImplementedError
+
+    def financials(self, symbol):
+        raise NotImplementedError
+
+    def balance_sheet(self, symbol):
+        raise NotImplementedError
+
+    def cashflow(self, symbol):
+        raise NotImplementedError
+
+    def dividends(self, symbol):
+        raise NotImplementedError
+
+    def history(self, symbol, start=None, end=None, interval='1d'):
+        # OHLCV bars with a timezone naive DatetimeIndex
+        raise NotImplementedError
+
+    def fetch(self, symbol, dataset):
+        return getattr(self, dataset)(symbol)
+
+## yfinance
+class YFinanceProvider(DataProvider):
+    name = 'yfinance'
+
+    def __init__(self):
+        import yfinance as yf
+        self.yf = yf
+
+    def ticker(self, symbol):
+        return self.yf.Ticker(symbol)
+
+    def info(self, symbol):
+        return self.ticker(symbol).info
+
+    def calendar(self, symbol):
+        return self.ticker(symbol).calendar
+
+    def financials(self, symbol):
+        return self.ticker(symbol).financials
+
+    def balance_sheet(self, symbol):
+        return self.ticker(symbol).balance_sheet
+
+    def cashflow(self, symbol):
+        return self.ticker(symbol).cashflow
+
+    def dividends(self, symbol):
+        return self.ticker(symbol).dividends
+
+    def history(self, symbol, start=None, end=None, interval='1d'):
+        # Ticker.history rather than yf.download, which shares state between
+        # concurrent calls and is not safe to use from the worker pool
+        if start is None and end is None:
+            data = self.ticker(symbol).history(period='max', interval=interval, auto_adjust=True)
+        else:
+            data = self.ticker(symbol).history(start=start, end=end, interval=interval, auto_adjust=True)
+        if data.empty:
+            return pd.DataFrame(columns=PRICE_COLUMNS, index=pd.DatetimeIndex([]))
+        data.index = data.index.tz_localize(None)
+        return data[PRICE_COLUMNS].dropna(subset=['Close'])
+
+## Recorded fixtures
+# Layout of a fixture directory, one folder per symbol:
+#   <dir>/AAPL/info.json, calendar.json
+#   <dir>/AAPL/financials.csv, balance_sheet.csv, cashflow.csv  (line items x period ends)
+#   <dir>/AAPL/dividends.csv, history.csv                        (indexed by date)
+#   <dir>/AAPL/history_1wk.csv                                   (weekly bars, for the price history)
+# Any table may be a .parquet file instead of .csv.
+class ReplayProvider(DataProvider):
+    name = 'replay'
+
+    def __init__(self, fixture_dir, latency=0.0, jitter=0.0, failure_rate=0.0):
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.random = random.Random(0)
+
+    def symbols(self):
+        return sorted(name for name in os.listdir(self.fixture_dir) if os.path.isdir(os.path.join(self.fixture_dir, name)))
+
+    def _wait(self):
+        # Artificial network latency so benchmarks see realistic overlap, and
+        # failures to exercise the retry path
+        delay = self.latency + self.random.uniform(0, self.jitter) if self.jitter else self.latency
+        if delay > 0:
+            time.sleep(delay)
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            raise ConnectionError('replayed upstream failure')
+
+    def _path(self, symbol, name):
+        return os.path.join(self.fixture_dir, symbol.upper(), name)
+
+    def _read_json(self, symbol, dataset):
+        self._wait()
+        path = self._path(symbol, f'{dataset}.json')
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _read_table(self, symbol, dataset):
+        self._wait()
+        parquet = self._path(symbol, f'{dataset}.parquet')
+        csv = self._path(symbol, f'{dataset}.csv')
+        if os.path.exists(parquet):
+            return pd.read_parquet(parquet)
+        if os.path.exists(csv):
+            return pd.read_csv(csv, index_col=0)
+        return pd.DataFrame()
+
+    def _read_statement(self, symbol, dataset):
+        statement = self._read_table(symbol, dataset)
+        statement.columns = pd.to_datetime(statement.columns)
+        return statement
+
+    def info(self, symbol):
+        return self._read_json(symbol, 'info')
+
+    def calendar(self, symbol):
+        return {key: _parse_dates(value) for key, value in self._read_json(symbol, 'calendar').items()}
+
+    def financials(self, symbol):
+        return self._read_statement(symbol, 'financials')
+
+    def balance_sheet(self, symbol):
+        return self._read_statement(symbol, 'balance_sheet')
+
+    def cashflow(self, symbol):
+        return self._read_statement(symbol, 'cashflow')
+
+    def dividends(self, symbol):
+        dividends = self._read_table(symbol, 'dividends')
+        if dividends.empty:
+            return pd.Series(dtype=float, index=pd.DatetimeIndex([]), name='Dividends')
+        dividends.index = pd.to_datetime(dividends.index)
+        return dividends.iloc[:, 0].rename('Dividends')
+
+    def history(self, symbol, start=None, end=None, interval='1d'):
+        dataset = 'history' if interval == '1d' else f'history_{interval}'
+        data = self._read_table(symbol, dataset)
+        if data.empty:
+            return pd.DataFrame(columns=PRICE_COLUMNS, index=pd.DatetimeIndex([]))
+        data.index = pd.to_datetime(data.index)
+        if start is not None:
+            data = data[data.index >= pd.Timestamp(start)]
+        if end is not None:
+            data = data[data.index < pd.Timestamp(end)]
+        return data[PRICE_COLUMNS]
+
+def _parse_dates(value):
+    if isinstance(value, list):
+        return [_parse_dates(item) for item in value]
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+def record_fixtures(symbols, fixture_dir, provider=None):
+    # Save everything the app reads for each symbol so it can be replayed offline
+    provider = provider or YFinanceProvider()
+    for symbol in symbols:
+        folder = os.path.join(fixture_dir, symbol.upper())
+        os.makedirs(folder, exist_ok=True)
+
+        for dataset in ('info', 'calendar'):
+            with open(os.path.join(folder, f'{dataset}.json'), 'w') as f:
+                json.dump(provider.fetch(symbol, dataset) or {}, f, default=str)
+
+        for dataset in ('financials', 'balance_sheet', 'cashflow'):
+            provider.fetch(symbol, dataset).to_csv(os.path.join(folder, f'{dataset}.csv'))
+
+        dividends = provider.dividends(symbol)
+        if dividends.index.tz is not None:
+            dividends.index = dividends.index.tz_localize(None)
+        dividends.to_csv(os.path.join(folder, 'dividends.csv'))
+
+        provider.history(symbol).to_csv(os.path.join(folder, 'history.csv'))
+        provider.history(symbol, interval='1wk').to_csv(os.path.join(folder, 'history_1wk.csv'))
+
+## Tracing
+# Wraps the active provider so every upstream call shows up as a fetch span
+class TracedProvider(DataProvider):
+    def __init__(self, inner):
+        self.inner = inner
+        self.name = inner.name
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def _call(self, dataset, symbol, *args, **kwargs):
+        with tracing.span(dataset, 'fetch', symbol, provider=self.name) as span:
+            return span.record(getattr(self.inner, dataset)(symbol, *args, **kwargs))
+
+    def info(self, symbol):
+        return self._call('info', symbol)
+
+    def calendar(self, symbol):
+        return self._call('calendar', symbol)
+
+    def financials(self, symbol):
+        return self._call('financials', symbol)
+
+    def balance_sheet(self, symbol):
+        return self._call('balance_sheet', symbol)
+
+    def cashflow(self, symbol):
+        return self._call('cashflow', symbol)
+
+    def dividends(self, symbol):
+        return self._call('dividends', symbol)
+
+    def history(self, symbol, start=None, end=None, interval='1d'):
+        return self._call('history', symbol, start=start, end=end, interval=interval)
+
+## Active provider
+_provider = None
+
+# Upstream calls per second and burst size for yfinance, recorded fixtures are
+# not rate limited unless SIGMASIGHT_RATE_LIMIT is set
+YFINANCE_RATE_LIMIT = 5.0
+YFINANCE_RATE_BURST = 10
+
+def provider_from_env():
+    # SIGMASIGHT_PROVIDER is "yfinance" (default) or "replay:<fixture dir>",
+    # SIGMASIGHT_REPLAY_LATENCY adds a delay in seconds to every replayed call
+    # and SIGMASIGHT_REPLAY_FAILURES makes that fraction of them fail
+    setting = os.environ.get('SIGMASIGHT_PROVIDER', 'yfinance')
+    if setting.startswith('replay:'):
+        latency = float(os.environ.get('SIGMASIGHT_REPLAY_LATENCY', '0'))
+        failure_rate = float(os.environ.get('SIGMASIGHT_REPLAY_FAILURES', '0'))
+        return ReplayProvider(setting[len('replay:'):], latency=latency, failure_rate=failure_rate)
+    return YFinanceProvider()
+
+def wrap_provider(provider):
+    # Request coalescing, rate limiting and retries in front of the traced
+    # upstream calls, see request_layer.py. SIGMASIGHT_RATE_LIMIT (calls per
+    # second, 0 for none), SIGMASIGHT_RATE_BURST and SIGMASIGHT_RETRIES
+    # override the defaults.
+    from request_layer import RequestLayer
+
+    rate, burst = rate_limit(provider)
+    retries = int(os.environ.get('SIGMASIGHT_RETRIES', '3'))
+    return RequestLayer(TracedProvider(provider), rate=rate, burst=burst, retries=retries)
+
+def rate_limit(provider):
+    # (calls per second or None for no limit, burst size) for the provider
+    limited = isinstance(provider, YFinanceProvider)
+    rate = float(os.environ.get('SIGMASIGHT_RATE_LIMIT', YFINANCE_RATE_LIMIT if limited else 0)) or None
+    burst = int(os.environ.get('SIGMASIGHT_RATE_BURST', YFINANCE_RATE_BURST))
+    return rate, burst
+
+def share_rate_limit(workers):
+    # Initializer for worker processes (ProcessPoolExecutor(initializer=...,
+    # initargs=(workers,))). Every process builds its own request layer, so
+    # each takes an even share of the rate limit and burst and together they
+    # stay within them.
+    global _provider
+    rate, burst = rate_limit(provider_from_env())
+    if rate:
+        os.environ['SIGMASIGHT_RATE_LIMIT'] = str(rate / workers)
+        os.environ['SIGMASIGHT_RATE_BURST'] = str(max(1, burst // workers))
+    _provider = None  # One copied from the parent by fork would keep the full limit
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        _provider = wrap_provider(provider_from_env())
+    return _provider
+
+def set_provider(provider):
+    global _provider
+    _provider = wrap_provider(provider)
+
+## Command line
+def main():
+    parser = argparse.ArgumentParser(description='Record data provider fixtures for offline replay')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record', help='Record fixtures from yfinance')
+    record_parser.add_argument('symbols', nargs='+', help='Tickers to record')
+    record_parser.add_argument('--out', default='fixtures', help='Fixture directory')
+    args = parser.parse_args()
+    record_fixtures(args.symbols, args.out)
+    print(f"Recorded {len(args.symbols)} symbols to {args.out}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import cache
+import dips
+import watchlist_store
+
+from providers import get_provider
+
+# One quote table for the whole watchlist, fetched in a single concurrent pass
+# and read by both the list rows and the dip finder.
+QUOTE_COLUMNS = ['short_name', 'exchange', 'price', 'previous_close', 'average', 'change_percent', 'dip_percent']
+MAX_WORKERS = 16
+
+# The average the dip finder measures against, computed from stored closes
+DIP_KIND = 'ema'
+DIP_WINDOW = 200
+
+# Columns filled in from the stored closes, see sync_dips
+DIP_COLUMNS = ['average', 'dip_percent']
+
+def get_info(ticker, refresh=False):
+    # refresh skips the cached copy, for the watchlist's scheduled refresh
+    if refresh:
+        info = get_provider().info(ticker)
+        cache.put(ticker, 'info', info)
+        return info
+    return cache.get_or_fetch(ticker, 'info', lambda: get_provider().info(ticker))
+
+def _number(info, key):
+    try:
+        return float(info.get(key))
+    except (TypeError, ValueError):
+        return np.nan
+
+def _percent(value, base):
+    return (value - base) / base * 100 if base else np.nan
+
+def quote_row(info):
+    price = _number(info, 'currentPrice')
+    previous_close = _number(info, 'previousClose')
+    return {
+        'short_name': info.get('shortName', 'N/A'),
+        'exchange': info.get('exchange'),
+        'price': price,
+        'previous_close': previous_close,
+        'average': np.nan,
+        'change_percent': round(_percent(price, previous_close), 2),
+        'dip_percent': np.nan,
+    }
+
+def fetch_quotes(tickers, max_workers=MAX_WORKERS, refresh=False):
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return pd.DataFrame(columns=QUOTE_COLUMNS)
+
+    def fetch(ticker):
+        try:
+            return quote_row(get_info(ticker, refresh) or {})
+        except Exception:
+            return quote_row({})
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tickers))) as executor:
+        rows = list(executor.map(fetch, tickers))
+    quotes = pd.DataFrame(rows, index=pd.Index(tickers, name='ticker'), columns=QUOTE_COLUMNS)
+    _add_dips(quotes)
+    return quotes
+
+def _add_dips(quotes):
+    # Dips for every ticker in one pass over the stored closes, measured from
+    # the live price. Only what is already stored is read, see sync_dips.
+    tickers = list(quotes.index)
+    table = dips.dip_table(tickers, windows=(DIP_WINDOW,), kinds=(DIP_KIND,), prices=quotes['price'].rename(str.upper), update=False)
+    table = table.reindex([ticker.upper() for ticker in tickers])
+    quotes['average'] = table[f'{DIP_KIND}_{DIP_WINDOW}'].to_numpy()
+    quotes['dip_percent'] = table[f'dip_{DIP_KIND}_{DIP_WINDOW}'].to_numpy()
+
+def sync_dips(quotes):
+    # Brings the stored closes of the quoted tickers up to date and measures
+    # the dips again, returning a copy. The first sync of a ticker downloads
+    # its whole history, so the watchlist runs this after the quotes are shown
+    # and merges only DIP_COLUMNS.
+    quotes = quotes.copy()
+    dips.sync([ticker.upper() for ticker in quotes.index])
+    _add_dips(quotes)
+    return quotes
+
+def stored_quotes(tickers):
+    # The last quotes kept in the watchlist store, so the list can be drawn
+    # before anything is fetched. Dips are left empty until the first fetch.
+    stored = watchlist_store.metadata(tickers)
+    quotes = pd.DataFrame(index=stored.index, columns=QUOTE_COLUMNS)
+    quotes['short_name'] = stored['short_name'].fillna('N/A')
+    quotes['exchange'] = stored['exchange']
+    quotes['price'] = stored['price']
+    quotes['previous_close'] = stored['previous_close']
+    quotes['average'] = np.nan
+    quotes['change_percent'] = [round(_percent(price, previous_close), 2) for price, previous_close in zip(stored['price'], stored['previous_close'])]
+    quotes['dip_percent'] = np.nan
+    return quotes
+
+def merge_quotes(quotes, fresh, tickers=None, columns=None):
+    # Write fetched rows into the table in place, limited to tickers and
+    # columns if given
+    for ticker, row in fresh.iterrows():
+        if tickers is None or ticker in tickers:
+            if columns is None:
+                quotes.loc[ticker] = row
+            else:
+                quotes.loc[ticker, columns] = row[columns]
+    return quotes
@@ -0,0 +1,138 @@
+import random
+import threading
+import time
+
+from collections import Counter
+from concurrent.futures import Future
+
+import tracing
+
+from providers import DataProvider
+
+# Sits between the app and the upstream provider. Concurrent requests for the
+# same (dataset, symbol, arguments) share one upstream call, upstream calls
+# are spaced out by a token bucket, and failed calls are retried with
+# exponential backoff and full jitter. Counters show how much each part did.
+
+# Errors that retrying cannot fix
+PERMANENT_ERRORS = (NotImplementedError, KeyError, ValueError, TypeError)
+
+class TokenBucket:
+    # rate tokens per second, up to capacity saved up for bursts
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # Takes one token, returns the seconds spent waiting for it
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+class RequestLayer(DataProvider):
+    def __init__(self, inner, rate=None, burst=None, retries=3, backoff=0.5, max_backoff=8.0,
+                 clock=time.monotonic, sleep=time.sleep, rng=None):
+        self.inner = inner
+        self.name = inner.name
+        self.bucket = TokenBucket(rate, burst or max(1, rate), clock, sleep) if rate else None
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.counters = Counter()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def stats(self):
+        # requests: asked for, merged: served by another caller's upstream
+        # call, upstream: calls made, throttled: calls that waited for a
+        # token, retries and failures: failed attempts and given up requests
+        with self.lock:
+            return dict(self.counters)
+
+    def _count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def _request(self, dataset, symbol, *args, **kwargs):
+        key = (dataset, symbol.upper(), args, tuple(sorted(kwargs.items())))
+        with self.lock:
+            self.counters['requests'] += 1
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+            else:
+                self.counters['merged'] += 1
+
+        # Everyone but the first caller waits for the first caller's result
+        if not owner:
+            return future.result()
+        try:
+            future.set_result(self._call(dataset, symbol, *args, **kwargs))
+        except Exception as error:
+            future.set_exception(error)
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+        return future.result()
+
+    def _call(self, dataset, symbol, *args, **kwargs):
+        for attempt in range(self.retries + 1):
+            if self.bucket is not None:
+                with tracing.span('throttle', 'wait', symbol):
+                    waited = self.bucket.acquire()
+                if waited:
+                    self._count('throttled')
+                    self._count('throttle_wait_s', waited)
+            try:
+                self._count('upstream')
+                return getattr(self.inner, dataset)(symbol, *args, **kwargs)
+            except PERMANENT_ERRORS:
+                self._count('failures')
+                raise
+            except Exception:
+                if attempt == self.retries:
+                    self._count('failures')
+                    raise
+                self._count('retries')
+                self.sleep(self.rng.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+    def info(self, symbol):
+        return self._request('info', symbol)
+
+    def calendar(self, symbol):
+        return self._request('calendar', symbol)
+
+    def financials(self, symbol):
+        return self._request('financials', symbol)
+
+    def balance_sheet(self, symbol):
+        return self._request('balance_sheet', symbol)
+
+    def cashflow(self, symbol):
+        return self._request('cashflow', symbol)
+
+    def dividends(self, symbol):
+        return self._request('dividends', symbol)
+
+    def history(self, symbol, start=None, end=None, interval='1d'):
+        return self._request('history', symbol, start=start, end=end, interval=interval)
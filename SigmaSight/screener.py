@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from cli import json_number, read_universe, require_data
+from providers import share_rate_limit
+from sidebar import quality_score
+from snapshot import TickerSnapshot
+
+# Screens a universe of tickers on the sidebar's valuation, margin and quality
+# metrics. Symbols are fetched and scored on a process pool with a bounded
+# number in flight, every finished symbol is appended to a checkpoint file so
+# an interrupted run picks up where it stopped.
+SCREEN_COLUMNS = [
+    'name', 'sector', 'price', 'market_cap', 'pe', 'price_to_sales', 'ev_to_ebitda', 'price_to_book',
+    'fcf_yield', 'profit_margin', 'operating_margin', 'gross_margin', 'revenue_growth', 'piotroski',
+]
+
+NUMERIC_COLUMNS = [column for column in SCREEN_COLUMNS if column not in ('name', 'sector')]
+
+# Symbols queued per worker, keeps memory flat on very large universes
+QUEUE_PER_WORKER = 2
+
+def screen_metrics(snapshot):
+    info = snapshot.info
+    metrics = snapshot.metrics
+    valuation = snapshot.valuation
+    latest = metrics.ffill().iloc[-1] if not metrics.empty else pd.Series(dtype=float)
+    revenue = metrics['revenue'].dropna() if not metrics.empty else pd.Series(dtype=float)
+
+    try:
+        piotroski = quality_score(snapshot)
+    except Exception:
+        piotroski = None
+
+    return {
+        'name': info.get('shortName'),
+        'sector': info.get('sector'),
+        'price': json_number(valuation.get('close')),
+        'market_cap': json_number(valuation.get('market_cap')),
+        'pe': json_number(valuation.get('pe')),
+        'price_to_sales': json_number(valuation.get('price_to_sales')),
+        'ev_to_ebitda': json_number(valuation.get('ev_to_ebitda')),
+        'price_to_book': json_number(valuation.get('price_to_book')),
+        'fcf_yield': json_number(valuation.get('fcf_yield')),
+        'profit_margin': json_number(info.get('profitMargins')),
+        'operating_margin': json_number(info.get('operatingMargins')),
+        'gross_margin': json_number(latest.get('gross_profit', np.nan) / latest.get('revenue', np.nan)) if not latest.empty else None,
+        'revenue_growth': json_number(revenue.iloc[-1] / revenue.iloc[-2] - 1) if len(revenue) > 1 else None,
+        'piotroski': piotroski,
+    }
+
+def screen_symbol(symbol):
+    # Runs inside a worker process
+    started = time.perf_counter()
+    try:
+        snapshot = TickerSnapshot(symbol)
+        snapshot.load('info', 'financials', 'balance_sheet', 'metrics', 'valuation')
+        metrics = screen_metrics(snapshot)
+        # The Piotroski score is 0 rather than missing without statements
+        require_data(symbol, [metrics[column] for column in NUMERIC_COLUMNS if column != 'piotroski'])
+        return {'symbol': symbol, 'ok': True, 'seconds': round(time.perf_counter() - started, 3), 'metrics': metrics}
+    except Exception:
+        return {'symbol': symbol, 'ok': False, 'seconds': round(time.perf_counter() - started, 3), 'error': traceback.format_exc()}
+
+## Checkpoint
+def read_checkpoint(path):
+    # Finished symbols -> their result. Failures are left out so a resumed run
+    # tries them again, a half written last line is ignored.
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if result.get('ok'):
+                results[result['symbol']] = result
+    return results
+
+def run(symbols, checkpoint, workers, resume=True):
+    done = read_checkpoint(checkpoint) if resume else {}
+    if not resume and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    todo = [symbol for symbol in symbols if symbol not in done]
+    print(f"{len(done)} symbols already screened, {len(todo)} to go", file=sys.stderr)
+
+    failed = []
+    if todo:
+        queue = iter(todo)
+        with ProcessPoolExecutor(max_workers=workers, initializer=share_rate_limit, initargs=(workers,)) as executor, open(checkpoint, 'a') as out:
+            pending = set()
+
+            def fill():
+                for symbol in queue:
+                    pending.add(executor.submit(screen_symbol, symbol))
+                    if len(pending) >= workers * QUEUE_PER_WORKER:
+                        break
+
+            fill()
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    out.write(json.dumps(result) + '\n')
+                    out.flush()
+                    if result['ok']:
+                        done[result['symbol']] = result
+                    else:
+                        failed.append(result)
+                    count = len(done) + len(failed)
+                    status = 'ok' if result['ok'] else 'FAILED'
+                    print(f"[{count}/{len(symbols)}] {result['symbol']:<8} {status:<6} {result['seconds']:.2f}s", file=sys.stderr)
+                fill()
+
+    table = screen_table([done[symbol] for symbol in symbols if symbol in done])
+    return table, failed
+
+def screen_table(results):
+    rows = {result['symbol']: result['metrics'] for result in results}
+    table = pd.DataFrame.from_dict(rows, orient='index', columns=SCREEN_COLUMNS)
+    table.index.name = 'symbol'
+    table[NUMERIC_COLUMNS] = table[NUMERIC_COLUMNS].apply(pd.to_numeric, errors='coerce')
+    return table
+
+def rank(table, sort_by='pe', ascending=True, filters=()):
+    # filters are pandas query expressions, e.g. "pe < 20" or "piotroski >= 7"
+    for expression in filters:
+        table = table.query(expression)
+    table = table.sort_values(sort_by, ascending=ascending, na_position='last')
+    table.insert(0, 'rank', range(1, len(table) + 1))
+    return table
+
+## Command line
+def main():
+    parser = argparse.ArgumentParser(description='Screen many tickers on valuation, margin and quality metrics')
+    parser.add_argument('symbols', nargs='*', help='Tickers to screen')
+    parser.add_argument('--universe', help='File with one ticker per line, # starts a comment')
+    parser.add_argument('--checkpoint', default='screen.checkpoint.jsonl', help='Progress file, reused to resume an interrupted run')
+    parser.add_argument('--fresh', action='store_true', help='Ignore the checkpoint and screen every symbol again')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    parser.add_argument('--sort', default='pe', choices=[column for column in SCREEN_COLUMNS if column not in ('name', 'sector')], help='Column to rank by')
+    parser.add_argument('--descending', action='store_true', help='Rank the largest values first')
+    parser.add_argument('--filter', action='append', default=[], help='Query expression, e.g. "pe < 20", may be repeated')
+    parser.add_argument('--top', type=int, default=25, help='How many rows to print')
+    parser.add_argument('--out', help='Write the full ranked table to this CSV file')
+    args = parser.parse_args()
+
+    symbols = [symbol.upper() for symbol in args.symbols]
+    if args.universe:
+        symbols += read_universe(args.universe)
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        parser.error('give some symbols or a --universe file')
+
+    started = time.perf_counter()
+    table, failed = run(symbols, args.checkpoint, args.workers, resume=not args.fresh)
+    ranked = rank(table, args.sort, not args.descending, args.filter)
+
+    if args.out:
+        ranked.to_csv(args.out)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(ranked.head(args.top).round(3).to_string())
+    print(f"Screened {len(table)}/{len(symbols)} symbols in {time.perf_counter() - started:.1f}s, "
+          f"{len(ranked)} pass the filters, {len(failed)} failed", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
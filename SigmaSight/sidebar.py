@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import piotroski
+
+from charts import format_metric
+
+# Sidebar sections as plain text lines, shared by the dashboard and batch reports
+
+def dividend_info(snapshot):
+    info = snapshot.info
+    calendar = snapshot.calendar
+    try:
+        return [
+            f"Dividend Yield: {info.get('dividendYield', 'N/A')}",
+            f"Payout Ratio: {round(float(info.get('payoutRatio', 'N/A')) * 100, 2)}%",
+            f"Ex-Div Date: {datetime.fromtimestamp(info.get('exDividendDate', 'N/A')).strftime('%d/%m/%Y')}",
+            f"Payout Date: {calendar.get('Dividend Date', 'N/A').strftime('%d/%m/%Y')}",
+        ]
+    except Exception as e:
+        return ["N/A", "N/A", "N/A", "N/A"]
+
+def balance_info(snapshot):
+    balance_sheet = snapshot.balance_sheet.T
+    cash = balance_sheet['Cash And Cash Equivalents'].dropna().iloc[-1] if not balance_sheet.empty else 0
+    debt = balance_sheet['Total Debt'].dropna().iloc[-1] if not balance_sheet.empty else 0
+    net = cash - debt
+
+    return [
+        f"Cash: ${cash:,.2f}",
+        f"Debt: ${debt:,.2f}",
+        f"Net: ${net:,.2f}",
+    ]
+
+def margins_growth_info(snapshot):
+    info = snapshot.info
+    financials = snapshot.financials.T
+
+    profit_margin_value = info.get('profitMargins', 0)
+    operating_margin_value = info.get('operatingMargins', 0)
+
+    quarterly_earnings = financials['Gross Profit'].iloc[-1] if not financials.empty else 0
+    quarterly_revenue = financials['Total Revenue'].iloc[-1] if not financials.empty else 0
+
+    return [
+        f"Profit Margin: {profit_margin_value:.2%}" if profit_margin_value else "Profit Margin: N/A",
+        f"Operating Margin: {operating_margin_value:.2%}" if operating_margin_value else "Operating Margin: N/A",
+        f"Quart. Earnings: ${quarterly_earnings:,.2f}" if quarterly_earnings else "Quart. Earnings: N/A",
+        f"Quart. Revenue: ${quarterly_revenue:,.2f}" if quarterly_revenue else "Quart. Revenue: N/A",
+    ]
+
+def value_info(snapshot):
+    # Latest fiscal year fundamentals at the most recent close, see metrics.py
+    valuation = snapshot.valuation
+
+    return [
+        f"Market Cap: ${format_metric(valuation['market_cap'], ',.0f')}",
+        f"P/E: {format_metric(valuation['pe'], '.2f')}",
+        f"Price to Sales: {format_metric(valuation['price_to_sales'], '.2f')}",
+        f"EV/EBITDA: {format_metric(valuation['ev_to_ebitda'], '.2f')}",
+        f"Price to Book: {format_metric(valuation['price_to_book'], '.2f')}",
+        f"Free Cash Flow Yield: {format_metric(valuation['fcf_yield'], '.2%')}",
+    ]
+
+def quality_score(snapshot):
+    # Full nine point Piotroski score from the annual statements, see piotroski.py
+    return piotroski.score(snapshot.financials, snapshot.balance_sheet, snapshot.cashflow)
+
+def quality_info(snapshot):
+    score = quality_score(snapshot)
+
+    return [
+        f"Piotroski Score: {score}",
+        f"Quality Rating: {piotroski.rating(score)}",
+    ]
+
+# Section title -> function returning its lines, in sidebar order
+SIDEBAR_SECTIONS = {
+    'Margins & Growth': margins_growth_info,
+    'Balance': balance_info,
+    'Dividend': dividend_info,
+    'Value': value_info,
+    'Quality': quality_info,
+}
+
+# Datasets read by the sidebar sections
+SIDEBAR_DATASETS = ['info', 'calendar', 'financials', 'balance_sheet', 'cashflow', 'valuation']
+
+def sidebar_text(snapshot):
+    text = {}
+    for title, section in SIDEBAR_SECTIONS.items():
+        try:
+            text[title] = section(snapshot)
+        except Exception:
+            text[title] = ['N/A']
+    return text
@@ -0,0 +1,87 @@
+import threading
+
+import cache
+import price_store
+import tracing
+
+from metrics import current_metrics, fiscal_metrics
+
+from providers import get_provider
+
+# Everything the dashboard needs for one symbol. Each dataset is read from the
+# on-disk cache, or fetched, the first time something asks for it and reused
+# for the rest of the update. Worker threads asking for the same dataset at
+# the same time wait for one fetch instead of starting their own.
+class TickerSnapshot:
+    def __init__(self, symbol, provider=None):
+        self.symbol = symbol
+        self.provider = provider or get_provider()
+        self._data = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, dataset):
+        with self._locks_guard:
+            return self._locks.setdefault(dataset, threading.Lock())
+
+    def _load(self, dataset, fetch):
+        if dataset not in self._data:
+            with self._lock(dataset):
+                if dataset not in self._data:
+                    with tracing.span(dataset, 'load', self.symbol) as span:
+                        self._data[dataset] = span.record(fetch())
+        return self._data[dataset]
+
+    def _load_cached(self, dataset):
+        fetch = lambda: self.provider.fetch(self.symbol, dataset)
+        return self._load(dataset, lambda: cache.get_or_fetch(self.symbol, dataset, fetch))
+
+    def size(self):
+        # Bytes held for the datasets loaded so far, roughly
+        return sum(tracing.payload_size(value) or 0 for value in list(self._data.values()))
+
+    def load(self, *datasets):
+        # Make sure the given datasets are in memory, used by the worker pool
+        for dataset in datasets:
+            getattr(self, dataset)
+        return self
+
+    @property
+    def info(self):
+        return self._load_cached('info')
+
+    @property
+    def calendar(self):
+        return self._load_cached('calendar')
+
+    @property
+    def financials(self):
+        return self._load_cached('financials')
+
+    @property
+    def balance_sheet(self):
+        return self._load_cached('balance_sheet')
+
+    @property
+    def cashflow(self):
+        return self._load_cached('cashflow')
+
+    @property
+    def dividends(self):
+        return self._load_cached('dividends')
+
+    @property
+    def history(self):
+        # Daily bars since 2002 from the incremental price store, every price
+        # based chart slices its range from this
+        return self._load('history', lambda: price_store.get_history(self.symbol, provider=self.provider))
+
+    @property
+    def metrics(self):
+        # Fundamentals and valuation ratios per fiscal period, see metrics.py
+        return self._load('metrics', lambda: fiscal_metrics(self.financials, self.balance_sheet, self.cashflow, self.history))
+
+    @property
+    def valuation(self):
+        # Latest fundamentals valued at the most recent close
+        return self._load('valuation', lambda: current_metrics(self.metrics, self.history))
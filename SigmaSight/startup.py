@@ -0,0 +1,43 @@
+import json
+import os
+import sys
+import time
+
+# Cold start timings for the dashboard. Importing this module starts the clock,
+# so SigmaSight.py imports it before anything else. Set
+# SIGMASIGHT_STARTUP_REPORT to a file path to append one JSON line per launch,
+# or to "-" to only print the summary.
+_started = time.perf_counter()
+_marks = {}
+
+def mark(name):
+    # First time only, later calls for the same step are ignored
+    if name not in _marks:
+        _marks[name] = time.perf_counter() - _started
+    return _marks[name]
+
+def marked(name):
+    return name in _marks
+
+def elapsed():
+    return time.perf_counter() - _started
+
+def report():
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'marks_s': {name: round(seconds, 4) for name, seconds in _marks.items()},
+    }
+
+def write_report():
+    target = os.environ.get('SIGMASIGHT_STARTUP_REPORT')
+    if not target:
+        return None
+
+    result = report()
+    summary = ', '.join(f"{name} {seconds:.3f}s" for name, seconds in result['marks_s'].items())
+    print(f"Startup: {summary}", file=sys.stderr)
+    if target != '-':
+        with open(target, 'a') as f:
+            f.write(json.dumps(result) + '\n')
+    return result
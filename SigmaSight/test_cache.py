@@ -0,0 +1,69 @@
+import pickle
+
+import pytest
+
+import cache
+
+# The on-disk cache in a temporary directory, with a fake clock so entries go
+# stale and get used in a known order.
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(cache, 'CACHE_FILE', str(tmp_path / 'cache.sqlite'))
+    monkeypatch.setattr(cache, '_schema_ready', False)
+    monkeypatch.setattr(cache, 'counters', cache.Counter())
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, 'time', clock)
+    return clock
+
+def test_entries_are_fresh_until_their_dataset_ttl(clock):
+    cache.put('aapl', 'info', {'price': 1})
+    clock.now += cache.DATASET_TTLS['info']
+    assert cache.get('AAPL', 'info') == (True, {'price': 1})
+    clock.now += 1
+    assert cache.get('AAPL', 'info') == (False, None)
+
+def test_datasets_without_a_ttl_use_the_default(clock):
+    cache.put('AAPL', 'something', 1)
+    clock.now += cache.DEFAULT_TTL + 1
+    assert cache.get('AAPL', 'something') == (False, None)
+
+def test_get_or_fetch_only_fetches_on_a_miss(clock):
+    fetches = []
+    fetch = lambda: fetches.append(1) or len(fetches)
+    assert cache.get_or_fetch('AAPL', 'info', fetch) == 1
+    assert cache.get_or_fetch('AAPL', 'info', fetch) == 1
+    clock.now += cache.DATASET_TTLS['info'] + 1
+    assert cache.get_or_fetch('AAPL', 'info', fetch) == 2
+    assert cache.counters == {'hits': 1, 'misses': 2}
+
+def test_least_recently_used_entries_are_evicted_first(clock, monkeypatch):
+    size = len(pickle.dumps('x' * 100, protocol=pickle.HIGHEST_PROTOCOL))
+    monkeypatch.setattr(cache, 'MAX_CACHE_BYTES', 3 * size)
+    for symbol in ['A', 'B', 'C']:
+        clock.now += 1
+        cache.put(symbol, 'info', 'x' * 100)
+    clock.now += 1
+    cache.get('A', 'info')  # B is now the least recently used
+
+    clock.now += 1
+    cache.put('D', 'info', 'x' * 100)
+    assert [cache.get(symbol, 'info')[0] for symbol in 'ABCD'] == [True, False, True, True]
+    assert cache.stats()['bytes'] == 3 * size
+
+def test_invalidate_by_symbol_and_dataset(clock):
+    for symbol in ['A', 'B']:
+        for dataset in ['info', 'calendar']:
+            cache.put(symbol, dataset, 1)
+    assert cache.invalidate('a', 'info') == 1
+    assert cache.invalidate(dataset='calendar') == 2
+    assert cache.invalidate() == 1
+    assert cache.stats()['entries'] == 0
@@ -0,0 +1,48 @@
+import numpy as np
+
+from charts import lttb
+
+# LTTB against a plain loop over the buckets as the paper writes it, on small
+# series where the kept points can be checked by eye.
+
+def reference_lttb(x, y, threshold):
+    buckets = threshold - 2
+    edges = [1 + bucket * (len(x) - 2) // buckets for bucket in range(buckets + 1)]
+    keep = [0]
+    for bucket in range(buckets):
+        low, high = edges[bucket], edges[bucket + 1]
+        if bucket + 1 < buckets:
+            next_x, next_y = np.mean(x[high:edges[bucket + 2]]), np.mean(y[high:edges[bucket + 2]])
+        else:
+            next_x, next_y = x[-1], y[-1]
+        a = keep[-1]
+        areas = [abs((x[a] - next_x) * (y[i] - y[a]) - (x[a] - x[i]) * (next_y - y[a])) for i in range(low, high)]
+        keep.append(low + int(np.argmax(areas)))
+    return keep + [len(x) - 1]
+
+def test_short_series_are_returned_as_they_are():
+    x, y = np.arange(5.0), np.array([1.0, 3, 2, 5, 4])
+    for threshold in [2, 5, 10]:
+        result_x, result_y = lttb(x, y, threshold)
+        np.testing.assert_array_equal(result_x, x)
+        np.testing.assert_array_equal(result_y, y)
+
+def test_keeps_the_ends_and_the_spike():
+    x = np.arange(100.0)
+    y = np.zeros(100)
+    y[37] = 10
+    result_x, result_y = lttb(x, y, 10)
+    assert len(result_x) == 10
+    assert result_x[0] == 0 and result_x[-1] == 99
+    assert 37 in result_x and 10 in result_y
+
+def test_matches_the_reference_on_a_random_walk():
+    rng = np.random.default_rng(3)
+    x = np.sort(rng.uniform(0, 1000, 503))
+    y = np.cumsum(rng.normal(0, 1, 503))
+    for threshold in [3, 4, 17, 100, 502]:
+        keep = reference_lttb(x, y, threshold)
+        result_x, result_y = lttb(x, y, threshold)
+        np.testing.assert_array_equal(result_x, x[keep])
+        np.testing.assert_array_equal(result_y, y[keep])
+        assert np.all(np.diff(result_x) > 0)
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dips
+
+# The moving averages of dips.py on small dates x tickers arrays, checked
+# against pandas, with tickers that start late or have gaps.
+
+def closes():
+    rng = np.random.default_rng(7)
+    values = 100 + np.cumsum(rng.normal(0, 1, (40, 3)), axis=0)
+    values[:10, 1] = np.nan  # Listed later
+    values[20:23, 2] = np.nan  # Missing days
+    return values
+
+def test_ema_matches_pandas_without_adjustment():
+    # As close_matrix passes them, gaps filled forward
+    filled = pd.DataFrame(closes()).ffill().to_numpy()
+    expected = pd.DataFrame(filled).ewm(span=10, adjust=False).mean()
+    np.testing.assert_allclose(dips.ema(filled, 10), expected, equal_nan=True)
+
+def test_ema_starts_from_the_first_close():
+    result = dips.ema(closes(), 10)
+    assert np.isnan(result[:10, 1]).all()
+    assert result[10, 1] == closes()[10, 1]
+
+def test_sma_matches_a_rolling_mean():
+    values = closes()
+    expected = pd.DataFrame(values).rolling(5).mean()
+    np.testing.assert_allclose(dips.sma(values, 5), expected, equal_nan=True)
+
+def test_sma_is_missing_until_a_full_window():
+    values = closes()
+    result = dips.sma(values, 5)
+    assert np.isnan(result[:4]).all()
+    assert np.isnan(result[:14, 1]).all()
+    assert result[14, 1] == pytest.approx(values[10:15, 1].mean())
+    # Any missing close inside the window leaves it missing
+    assert np.isnan(result[20:27, 2]).all()
+
+def test_window_longer_than_the_history():
+    assert np.isnan(dips.sma(closes()[:3], 5)).all()
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from live import LiveSeries, RingBuffer
+
+# The ring buffer behind live mode, and a live series fed minute bars by hand.
+
+def rows(*values):
+    return np.array([[value, -value] for value in values], dtype=float)
+
+def test_ring_buffer_keeps_the_newest_rows_in_order():
+    buffer = RingBuffer(3, 2)
+    buffer.extend(rows(1, 2))
+    np.testing.assert_array_equal(buffer.view(), rows(1, 2))
+    for value in [3, 4, 5, 6, 7]:
+        buffer.append(rows(value)[0])
+        assert len(buffer) == min(value, 3)
+        np.testing.assert_array_equal(buffer.view(), rows(*range(max(value - 2, 1), value + 1)))
+
+def test_ring_buffer_view_is_not_a_copy():
+    buffer = RingBuffer(4, 2)
+    buffer.extend(rows(1, 2, 3, 4, 5, 6))
+    view = buffer.view()
+    assert np.shares_memory(view, buffer.data)
+    np.testing.assert_array_equal(view, rows(3, 4, 5, 6))
+
+def test_ring_buffer_replaces_the_last_row_after_wrapping():
+    buffer = RingBuffer(3, 2)
+    buffer.extend(rows(1, 2, 3, 4))
+    buffer.replace_last(rows(9)[0])
+    np.testing.assert_array_equal(buffer.view(), rows(2, 3, 9))
+    buffer.append(rows(10)[0])
+    np.testing.assert_array_equal(buffer.view(), rows(3, 9, 10))
+
+def minute_bars(start, closes):
+    index = pd.date_range(start, periods=len(closes), freq='min')
+    return pd.DataFrame({'Close': closes}, index=index)
+
+def test_live_series_replaces_the_forming_bar():
+    series = LiveSeries('ABC', feed=None, capacity=5)
+    assert series.append(minute_bars('2024-06-03 09:30', [1.0, 2.0, 3.0])) == 3
+    # The 09:32 bar again with a new close, then one new bar
+    assert series.append(minute_bars('2024-06-03 09:32', [3.5, 4.0])) == 2
+    assert series.append(minute_bars('2024-06-03 09:33', [])) == 0
+    x, y = series.view()
+    np.testing.assert_array_equal(y, [1.0, 2.0, 3.5, 4.0])
+    assert np.all(np.diff(x) > 0)
+    assert series.last_time == pd.Timestamp('2024-06-03 09:33')
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from metrics import STATEMENT_ITEMS, current_metrics, fiscal_metrics
+
+# Fiscal period metrics on hand-built statements (line items x period ends,
+# newest first, as yfinance has them) and a short daily price history.
+
+PERIODS = pd.to_datetime(['2021-12-31', '2022-12-31', '2023-12-31'])
+
+ITEMS = {
+    'revenue': [100, 120, 150],
+    'gross_profit': [40, 50, 60],
+    'ebitda': [20, 25, 30],
+    'net_income': [10, 12, 15],
+    'shares': [10, 10, 12],
+    'cash': [5, 6, 7],
+    'debt': [20, 20, 10],
+    'equity': [50, 60, 70],
+    'fcf': [8, 9, 11],
+}
+
+def statements():
+    frames = {'financials': {}, 'balance_sheet': {}, 'cashflow': {}}
+    for column, values in ITEMS.items():
+        statement, line_item = STATEMENT_ITEMS[column]
+        frames[statement][line_item] = values
+    return tuple(pd.DataFrame(frame, index=PERIODS).T.iloc[:, ::-1] for frame in frames.values())
+
+def history():
+    # Business days through 2022 and 2023, nothing in late 2021 within a week
+    # of its period end, closes numbered so the joined day can be read off
+    dates = pd.bdate_range('2022-01-03', '2024-01-31')
+    return pd.DataFrame({'Close': np.arange(1, len(dates) + 1, dtype=float)}, index=dates)
+
+def test_each_period_gets_the_last_close_on_or_before_it():
+    table = fiscal_metrics(*statements(), history())
+    assert list(table.index) == list(PERIODS)
+    # 2022-12-31 is a Saturday and 2023-12-31 a Sunday, the Friday before counts
+    assert list(table['price_date'][1:]) == list(pd.to_datetime(['2022-12-30', '2023-12-29']))
+    closes = history()['Close']
+    assert table['close'].iloc[1] == closes['2022-12-30']
+    assert table['close'].iloc[2] == closes['2023-12-29']
+
+def test_periods_without_a_close_nearby_stay_unpriced():
+    table = fiscal_metrics(*statements(), history())
+    assert np.isnan(table['close'].iloc[0])
+    assert pd.isna(table['price_date'].iloc[0])
+    assert np.isnan(table['pe'].iloc[0])
+    assert table['eps'].iloc[0] == 1.0
+
+def test_ratios_use_the_joined_close():
+    table = fiscal_metrics(*statements(), history())
+    row = table.iloc[2]
+    close = history()['Close']['2023-12-29']
+    assert row['eps'] == pytest.approx(15 / 12)
+    assert row['market_cap'] == pytest.approx(close * 12)
+    assert row['ev'] == pytest.approx(close * 12 + 10 - 7)
+    assert row['pe'] == pytest.approx(close / (15 / 12))
+    assert row['ev_to_ebitda'] == pytest.approx((close * 12 + 3) / 30)
+    assert row['fcf_yield'] == pytest.approx(11 / (close * 12))
+
+def test_current_metrics_value_the_latest_period_at_the_last_close():
+    latest = current_metrics(fiscal_metrics(*statements(), history()), history())
+    assert latest['close'] == history()['Close'].iloc[-1]
+    assert latest['price_date'] == pd.Timestamp('2024-01-31')
+    assert latest['pe'] == pytest.approx(latest['close'] / (15 / 12))
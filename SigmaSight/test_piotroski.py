@@ -0,0 +1,73 @@
+import pandas as pd
+
+import piotroski
+
+from piotroski import FSCORE_ITEMS
+
+# The F-score on hand-built statements in yfinance layout (line items x period
+# ends, newest first), for one ticker and for a panel of them.
+
+PERIODS = pd.to_datetime(['2021-12-31', '2022-12-31', '2023-12-31'])
+
+# Improves on every test each year
+STEADY = {
+    'net_income': [5, 8, 12],
+    'revenue': [50, 60, 75],
+    'gross_profit': [20, 25, 33],
+    'total_assets': [100, 110, 120],
+    'long_term_debt': [40, 38, 30],
+    'current_assets': [30, 33, 40],
+    'current_liabilities': [20, 20, 20],
+    'shares': [10, 10, 10],
+    'operating_cash_flow': [7, 10, 15],
+}
+
+# Worse on every test in the last year, reporting only total debt
+SLIPPING = {
+    'net_income': [6, 4, -2],
+    'revenue': [80, 70, 60],
+    'gross_profit': [40, 30, 20],
+    'total_assets': [100, 100, 100],
+    'total_debt': [20, 30, 50],
+    'current_assets': [40, 30, 20],
+    'current_liabilities': [20, 20, 20],
+    'shares': [10, 11, 12],
+    'operating_cash_flow': [8, 3, -5],
+}
+
+def statements(items):
+    frames = {'financials': {}, 'balance_sheet': {}, 'cashflow': {}}
+    for column, values in items.items():
+        statement, line_item = FSCORE_ITEMS[column]
+        frames[statement][line_item] = values
+    return tuple(pd.DataFrame(frame, index=PERIODS).T.iloc[:, ::-1] for frame in frames.values())
+
+def test_single_ticker_scores_each_year():
+    table = piotroski.fscore(piotroski.statement_items(*statements(STEADY)))
+    assert list(table.index) == list(PERIODS)
+    # The first year has no year before it, the second no opening assets for
+    # the year before it
+    assert list(table['score']) == [2, 6, 9]
+    assert not table.loc['2022-12-31', ['improving_roa', 'lower_leverage', 'higher_asset_turnover']].any()
+
+def test_total_debt_stands_in_for_long_term_debt():
+    table = piotroski.criteria(piotroski.statement_items(*statements(SLIPPING)))
+    assert not table.loc['2023-12-31'].any()
+    assert piotroski.score(*statements(SLIPPING)) == 0
+
+def test_panel_matches_each_ticker_on_its_own():
+    panel = piotroski.fscore(piotroski.statement_panel({'AAA': statements(STEADY), 'BBB': statements(SLIPPING)}))
+    for symbol, items in [('AAA', STEADY), ('BBB', SLIPPING)]:
+        single = piotroski.fscore(piotroski.statement_items(*statements(items)))
+        pd.testing.assert_frame_equal(panel.loc[symbol], single)
+    # No year is compared with another ticker's
+    assert panel.loc[('BBB', PERIODS[0]), 'score'] == 2
+
+    latest = piotroski.latest(panel)
+    assert latest['score'].to_dict() == {'AAA': 9, 'BBB': 0}
+    assert piotroski.score(*statements(STEADY)) == 9
+
+def test_missing_statements_score_zero():
+    empty = pd.DataFrame()
+    assert piotroski.score(empty, empty, empty) == 0
+    assert piotroski.statement_panel({}).empty
@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import price_store
+
+from providers import PRICE_COLUMNS, ReplayProvider
+
+# The price store against recorded bars in a temporary fixture directory,
+# rewritten between syncs to stand in for new days, partial days and
+# re-adjusted histories.
+
+class RecordingReplay(ReplayProvider):
+    # Remembers the start date of every history download
+    def __init__(self, fixture_dir):
+        super().__init__(fixture_dir)
+        self.starts = []
+
+    def history(self, symbol, start=None, end=None, interval='1d'):
+        self.starts.append(None if start is None else str(start)[:10])
+        return super().history(symbol, start=start, end=end, interval=interval)
+
+def daily_bars(start, closes):
+    dates = pd.bdate_range(start, periods=len(closes))
+    closes = np.asarray(closes, dtype=float)
+    return pd.DataFrame({'Open': closes, 'High': closes * 1.01, 'Low': closes * 0.99, 'Close': closes,
+                         'Volume': np.full(len(closes), 1000.0)}, index=pd.DatetimeIndex(dates, name='Date'))
+
+def record(fixture_dir, symbol, bars):
+    os.makedirs(os.path.join(fixture_dir, symbol), exist_ok=True)
+    bars[PRICE_COLUMNS].to_csv(os.path.join(fixture_dir, symbol, 'history.csv'))
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_store, 'PRICE_FILE', str(tmp_path / 'prices.sqlite'))
+    monkeypatch.setattr(price_store, 'PRICE_DIR', str(tmp_path / 'prices'))
+    monkeypatch.setattr(price_store, '_schema_ready', False)
+    monkeypatch.setattr(price_store, '_mapped', price_store.OrderedDict())
+    return tmp_path
+
+@pytest.fixture
+def provider(store):
+    return RecordingReplay(str(store / 'fixtures'))
+
+def stored_file(symbol):
+    with price_store.connect() as conn:
+        return price_store._series(conn, symbol)[0]
+
+def test_first_sync_downloads_the_whole_history(provider):
+    bars = daily_bars('2024-01-01', np.linspace(10, 20, 30))
+    record(provider.fixture_dir, 'ABC', bars)
+
+    assert price_store.sync('ABC', provider=provider) == 30
+    assert provider.starts == [price_store.HISTORY_START]
+    np.testing.assert_allclose(price_store.load('ABC')['Close'], bars['Close'])
+
+def test_new_days_are_appended_in_place(provider):
+    bars = daily_bars('2024-01-01', np.linspace(10, 20, 30))
+    record(provider.fixture_dir, 'ABC', bars.iloc[:25])
+    price_store.sync('ABC', provider=provider)
+    file = stored_file('ABC')
+
+    record(provider.fixture_dir, 'ABC', bars)
+    price_store.sync('ABC', force=True, provider=provider)
+
+    # Only from the bar before the newest stored one, which is checked for re-adjustment
+    assert provider.starts[1:] == [bars.index[23].strftime('%Y-%m-%d')]
+    assert stored_file('ABC') == file
+    np.testing.assert_allclose(price_store.load('ABC')['Close'], bars['Close'])
+
+def test_partial_last_day_is_overwritten_without_a_full_download(provider):
+    bars = daily_bars('2024-01-01', np.linspace(10, 20, 30))
+    record(provider.fixture_dir, 'ABC', bars)
+    price_store.sync('ABC', provider=provider)
+
+    # The last bar was stored mid-session and closed 0.5% higher
+    bars.iloc[-1, bars.columns.get_loc('Close')] *= 1.005
+    record(provider.fixture_dir, 'ABC', bars)
+    price_store.sync('ABC', force=True, provider=provider)
+
+    assert price_store.HISTORY_START not in provider.starts[1:]
+    assert price_store.load('ABC')['Close'].iloc[-1] == pytest.approx(bars['Close'].iloc[-1])
+    assert len(price_store.load('ABC')) == 30
+
+def test_readjusted_history_is_downloaded_again(provider):
+    bars = daily_bars('2024-01-01', np.linspace(10, 20, 30))
+    record(provider.fixture_dir, 'ABC', bars)
+    price_store.sync('ABC', provider=provider)
+    file = stored_file('ABC')
+
+    # A 2:1 split halves every past close
+    split = bars.copy()
+    split[PRICE_COLUMNS[:4]] /= 2
+    record(provider.fixture_dir, 'ABC', split)
+    price_store.sync('ABC', force=True, provider=provider)
+
+    assert provider.starts[-1] == price_store.HISTORY_START
+    assert stored_file('ABC') != file
+    assert not os.path.exists(price_store._path(file))
+    np.testing.assert_allclose(price_store.load('ABC')['Close'], split['Close'])
+
+def test_bars_past_the_capacity_move_to_a_bigger_file(provider, monkeypatch):
+    monkeypatch.setattr(price_store, 'GROWTH_ROWS', 2)
+    bars = daily_bars('2024-01-01', np.linspace(10, 20, 30))
+    record(provider.fixture_dir, 'ABC', bars.iloc[:10])
+    price_store.sync('ABC', provider=provider)
+    file = stored_file('ABC')
+
+    record(provider.fixture_dir, 'ABC', bars)
+    price_store.sync('ABC', force=True, provider=provider)
+
+    with price_store.connect() as conn:
+        new_file, rows, capacity, _ = price_store._series(conn, 'ABC')
+    assert new_file != file and rows == 30 and capacity >= 30
+    assert not os.path.exists(price_store._path(file))
+    loaded = price_store.load('ABC')
+    np.testing.assert_allclose(loaded['Close'], bars['Close'])
+    np.testing.assert_array_equal(loaded.index, bars.index)
+
+def test_load_closes_aligns_symbols_on_dates(provider):
+    record(provider.fixture_dir, 'ABC', daily_bars('2024-01-01', [1, 2, 3]))
+    record(provider.fixture_dir, 'XYZ', daily_bars('2024-01-02', [5, 6, 7]))
+    for symbol in ['ABC', 'XYZ']:
+        price_store.sync(symbol, provider=provider)
+
+    closes = price_store.load_closes(['ABC', 'XYZ', 'NONE'])
+    assert list(closes.columns) == ['ABC', 'XYZ', 'NONE']
+    np.testing.assert_array_equal(closes['ABC'], [1, 2, 3, np.nan])
+    np.testing.assert_array_equal(closes['XYZ'], [np.nan, 5, 6, 7])
+    assert closes['NONE'].isna().all()
+    assert price_store.load_closes(['ABC', 'XYZ'], rows=1).index[-1] == closes.index[-1]
+
+def legacy_store(path, bars):
+    # The bars and synced tables of the versions before the column files
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE bars (symbol TEXT, date TEXT, open REAL, high REAL, low REAL, close REAL, volume REAL, PRIMARY KEY (symbol, date))')
+    conn.execute('CREATE TABLE synced (symbol TEXT PRIMARY KEY, synced_at REAL)')
+    for symbol, data in bars.items():
+        conn.executemany('INSERT INTO bars VALUES (?, ?, ?, ?, ?, ?, ?)', [
+            (symbol, date.strftime('%Y-%m-%d'), *row) for date, row in zip(data.index, data[PRICE_COLUMNS].itertuples(index=False))])
+        conn.execute('INSERT INTO synced VALUES (?, ?)', (symbol, 123.0))
+    conn.commit()
+    conn.close()
+
+def test_bars_table_is_imported_into_files(store):
+    bars = {'ABC': daily_bars('2024-01-01', [1, 2, 3]), 'XYZ': daily_bars('2024-01-01', [4, 5])}
+    legacy_store(price_store.PRICE_FILE, bars)
+
+    for symbol, data in bars.items():
+        np.testing.assert_allclose(price_store.load(symbol)['Close'], data['Close'])
+    with price_store.connect() as conn:
+        assert not price_store._has_table(conn, 'bars')
+        assert not price_store._has_table(conn, 'synced')
+        assert price_store._series(conn, 'ABC')[3] == 123.0
+
+def test_processes_opening_an_old_store_import_it_once(store):
+    bars = {f'S{i}': daily_bars('2024-01-01', np.arange(1, 50)) for i in range(20)}
+    legacy_store(price_store.PRICE_FILE, bars)
+
+    errors = []
+    def open_store():
+        try:
+            price_store.create_schema()
+        except Exception as error:
+            errors.append(error)
+    threads = [threading.Thread(target=open_store) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert errors == []
+    assert len(os.listdir(price_store.PRICE_DIR)) == len(bars)
+    np.testing.assert_allclose(price_store.load('S7')['Close'], bars['S7']['Close'])
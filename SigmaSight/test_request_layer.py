@@ -0,0 +1,135 @@
+import os
+import threading
+
+import pytest
+
+import providers
+
+from providers import DataProvider, ReplayProvider, share_rate_limit
+from request_layer import RequestLayer
+
+# RequestLayer against a fake provider, with a fake clock, sleep and random
+# number generator so throttling and backoff run without waiting.
+# Run with python -m pytest from this directory.
+
+class FakeProvider(DataProvider):
+    name = 'fake'
+
+    def __init__(self, failures=0, error=ConnectionError, release=None):
+        self.failures = failures
+        self.error = error
+        self.release = release
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def info(self, symbol):
+        with self.lock:
+            self.calls += 1
+            failing = self.calls <= self.failures
+        if self.release is not None:
+            self.release.wait(5)
+        if failing:
+            raise self.error(f'{symbol} failed')
+        return {'symbol': symbol}
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class HighestDraw:
+    # Always the top of the jitter range, so backoff delays are predictable
+    def uniform(self, low, high):
+        return high
+
+def layer(inner, clock=None, **options):
+    clock = clock or FakeClock()
+    return RequestLayer(inner, clock=clock, sleep=clock.sleep, rng=HighestDraw(), **options)
+
+def test_concurrent_requests_share_one_upstream_call():
+    release = threading.Event()
+    inner = FakeProvider(release=release)
+    requests = layer(inner)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(requests.info('aapl'))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while requests.stats().get('requests', 0) < len(threads):
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert inner.calls == 1
+    assert results == [{'symbol': 'aapl'}] * 4
+    assert requests.stats()['merged'] == 3
+
+def test_different_symbols_are_not_merged():
+    inner = FakeProvider()
+    requests = layer(inner)
+    requests.info('AAPL')
+    requests.info('MSFT')
+    assert inner.calls == 2
+    assert 'merged' not in requests.stats()
+
+def test_failures_are_retried_with_exponential_backoff():
+    clock = FakeClock()
+    requests = layer(FakeProvider(failures=3), clock, retries=3, backoff=0.5, max_backoff=1.5)
+    assert requests.info('AAPL') == {'symbol': 'AAPL'}
+    assert clock.sleeps == [0.5, 1.0, 1.5]
+    assert requests.stats()['retries'] == 3
+
+def test_gives_up_after_the_last_retry():
+    requests = layer(FakeProvider(failures=10), retries=2)
+    with pytest.raises(ConnectionError):
+        requests.info('AAPL')
+    assert requests.stats()['upstream'] == 3
+    assert requests.stats()['failures'] == 1
+
+def test_permanent_errors_are_not_retried():
+    clock = FakeClock()
+    requests = layer(FakeProvider(failures=1, error=KeyError), clock)
+    with pytest.raises(KeyError):
+        requests.info('AAPL')
+    assert clock.sleeps == []
+    assert requests.stats()['upstream'] == 1
+
+def test_token_bucket_spaces_out_calls_after_the_burst():
+    clock = FakeClock()
+    requests = layer(FakeProvider(), clock, rate=2, burst=2)
+    for symbol in ['A', 'B', 'C', 'D', 'E']:
+        requests.info(symbol)
+    # Two calls from the burst, then one every half second
+    assert clock.now == pytest.approx(1.5)
+    assert requests.stats()['throttled'] == 3
+
+def clear_rate_limit(monkeypatch):
+    # Set before deleting so monkeypatch restores what share_rate_limit writes
+    for key in ['SIGMASIGHT_RATE_LIMIT', 'SIGMASIGHT_RATE_BURST']:
+        monkeypatch.setenv(key, '')
+        monkeypatch.delenv(key)
+
+def test_worker_processes_share_the_rate_limit(monkeypatch):
+    clear_rate_limit(monkeypatch)
+    monkeypatch.setattr(providers, 'provider_from_env', lambda: providers.YFinanceProvider.__new__(providers.YFinanceProvider))
+    monkeypatch.setattr(providers, '_provider', object())
+
+    share_rate_limit(4)
+    assert float(os.environ['SIGMASIGHT_RATE_LIMIT']) == providers.YFINANCE_RATE_LIMIT / 4
+    assert int(os.environ['SIGMASIGHT_RATE_BURST']) == providers.YFINANCE_RATE_BURST // 4
+    assert providers._provider is None
+
+def test_unlimited_providers_stay_unlimited(monkeypatch, tmp_path):
+    clear_rate_limit(monkeypatch)
+    monkeypatch.setattr(providers, 'provider_from_env', lambda: ReplayProvider(str(tmp_path)))
+
+    share_rate_limit(4)
+    assert 'SIGMASIGHT_RATE_LIMIT' not in os.environ
+    assert 'SIGMASIGHT_RATE_BURST' not in os.environ
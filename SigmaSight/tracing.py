@@ -0,0 +1,188 @@
+import contextlib
+import json
+import os
+import pickle
+import threading
+import time
+
+from collections import defaultdict, deque
+
+# Timing spans around provider calls, dataset loads, chart data, sidebar
+# sections and canvas draws. Recording is off unless SIGMASIGHT_TRACE=1 or the
+# debug panel turns it on, a disabled span costs one attribute check. Spans can
+# be summarised per stage and symbol, or exported as JSON or as Chrome trace
+# events (open in chrome://tracing or https://ui.perfetto.dev).
+MAX_EVENTS = 100000
+
+_enabled = os.environ.get('SIGMASIGHT_TRACE', '0') not in ('', '0')
+_events = deque(maxlen=MAX_EVENTS)
+_origin = time.perf_counter()
+_update_started = None
+
+class Span:
+    __slots__ = ('name', 'category', 'symbol', 'start', 'duration', 'bytes', 'thread', 'args')
+
+    def __init__(self, name, category, symbol, args):
+        self.name = name
+        self.category = category
+        self.symbol = symbol
+        self.args = args
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.bytes = None
+        self.thread = threading.get_ident()
+
+    def record(self, value):
+        # Size of a fetched or computed value, kept as the span's bytes
+        self.bytes = payload_size(value)
+        return value
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'category': self.category,
+            'symbol': self.symbol,
+            'start_s': round(self.start - _origin, 6),
+            'duration_ms': round(self.duration * 1000, 3),
+            'bytes': self.bytes,
+            'thread': self.thread,
+            **({'args': self.args} if self.args else {}),
+        }
+
+class _NullSpan:
+    def record(self, value):
+        return value
+
+_NULL_SPAN = _NullSpan()
+
+def enabled():
+    return _enabled
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+@contextlib.contextmanager
+def span(name, category, symbol=None, **args):
+    if not _enabled:
+        yield _NULL_SPAN
+        return
+    current = Span(name, category, symbol, args)
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _events.append(current)
+
+def trace_draws(canvas, name, symbol=None):
+    # Times every real draw of a matplotlib canvas, including the ones
+    # draw_idle schedules. symbol is a callable returning the symbol shown.
+    draw = canvas.draw
+
+    def traced_draw(*args, **kwargs):
+        with span(name, 'render', symbol() if symbol else None):
+            return draw(*args, **kwargs)
+
+    canvas.draw = traced_draw
+    return canvas
+
+def payload_size(value):
+    if value is None:
+        return 0
+    memory_usage = getattr(value, 'memory_usage', None)
+    if memory_usage is not None:
+        try:
+            usage = memory_usage(deep=True)
+            return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+        except TypeError:
+            pass
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return None
+
+## Updates
+def begin_update(symbol):
+    # Marks the start of a dashboard update, summaries default to what
+    # happened since
+    global _update_started
+    _update_started = time.perf_counter()
+    with span('update', 'update', symbol):
+        pass
+
+def events(since=None):
+    since = _update_started if since == 'update' else since
+    snapshot = list(_events)
+    if since is None:
+        return snapshot
+    return [event for event in snapshot if event.start >= since]
+
+def clear():
+    _events.clear()
+
+def summary(since='update'):
+    # Per stage (category/name) and per symbol: calls, total and max time, bytes
+    selected = events(since)
+    stages = defaultdict(lambda: {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'bytes': 0})
+    symbols = defaultdict(lambda: defaultdict(lambda: {'calls': 0, 'total_ms': 0.0, 'bytes': 0}))
+    for event in selected:
+        if event.category == 'update':
+            continue
+        milliseconds = event.duration * 1000
+        stage = stages[f'{event.category}/{event.name}']
+        stage['calls'] += 1
+        stage['total_ms'] += milliseconds
+        stage['max_ms'] = max(stage['max_ms'], milliseconds)
+        stage['bytes'] += event.bytes or 0
+
+        per_symbol = symbols[event.symbol or '-'][event.category]
+        per_symbol['calls'] += 1
+        per_symbol['total_ms'] += milliseconds
+        per_symbol['bytes'] += event.bytes or 0
+
+    wall = (max(event.start + event.duration for event in selected) - min(event.start for event in selected)) if selected else 0.0
+    return {
+        'wall_ms': round(wall * 1000, 3),
+        'stages': {name: _rounded(stage) for name, stage in sorted(stages.items(), key=lambda item: -item[1]['total_ms'])},
+        'symbols': {symbol: {category: _rounded(totals) for category, totals in categories.items()} for symbol, categories in symbols.items()},
+    }
+
+def _rounded(totals):
+    return {key: round(value, 3) if isinstance(value, float) else value for key, value in totals.items()}
+
+def category_totals(since='update'):
+    # Total milliseconds per category, e.g. fetch, compute, render
+    totals = defaultdict(float)
+    for event in events(since):
+        if event.category != 'update':
+            totals[event.category] += event.duration * 1000
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+## Export
+def export_json(path, since=None):
+    with open(path, 'w') as f:
+        json.dump({'events': [event.as_dict() for event in events(since)], 'summary': summary(since)}, f, indent=2)
+    return path
+
+def chrome_trace(since=None):
+    # Complete ("X") events, timestamps and durations in microseconds
+    pid = os.getpid()
+    trace = []
+    for event in events(since):
+        args = {'symbol': event.symbol, 'bytes': event.bytes, **event.args}
+        trace.append({
+            'name': event.name if event.symbol is None else f'{event.name} {event.symbol}',
+            'cat': event.category,
+            'ph': 'X',
+            'ts': round((event.start - _origin) * 1e6, 1),
+            'dur': round(event.duration * 1e6, 1),
+            'pid': pid,
+            'tid': event.thread,
+            'args': {key: value for key, value in args.items() if value is not None},
+        })
+    return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+def export_chrome(path, since=None):
+    with open(path, 'w') as f:
+        json.dump(chrome_trace(since), f)
+    return path
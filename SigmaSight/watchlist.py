@@ -1,114 +1,150 @@
 import customtkinter as ctk
-import yfinance as yf
 
 import tkinter
-import json
 import os
 
+import pandas as pd
+
+import watchlist_store
+
+from quotes import DIP_COLUMNS, DIP_KIND, DIP_WINDOW, fetch_quotes, merge_quotes, stored_quotes, sync_dips
+
 from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
+from matplotlib.patches import Rectangle
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
-# Watchlist config file
-WATCHLIST_FILE = 'watchlist_config.json'
+# Seconds between quote refreshes while the watchlist is open, 0 turns it off.
+# The starting value can be set with SIGMASIGHT_WATCHLIST_REFRESH.
+REFRESH_SECONDS = int(os.environ.get('SIGMASIGHT_WATCHLIST_REFRESH', '60'))
+REFRESH_CHOICES = {'Off': 0, '15s': 15, '30s': 30, '1m': 60, '5m': 300}
+
+def add_ticker_to_watchlist(ticker, list_name, watchlist, quotes, rows, watchlist_frame, dip_chart, workers, current_list, on_select=None):
+    ticker = ticker.strip().upper()
+    if not ticker or ticker in watchlist:
+        return
 
-# Initialize the watchlist config file if it doesn't exist
-if not os.path.exists(WATCHLIST_FILE):
-    with open(WATCHLIST_FILE, 'w') as f:
-        json.dump([], f)
+    # Only the new ticker is fetched, the rest of the table is kept. The
+    # fetch runs on workers and the row is added when it arrives, its dip
+    # follows once the price history is downloaded.
+    def fetch():
+        fresh = fetch_quotes([ticker])
+        watchlist_store.save_quotes(fresh)
+        return fresh
 
-def load_watchlist():
-    with open(WATCHLIST_FILE, 'r') as f:
-        return json.load(f)
+    def showing():
+        # Another list may have been opened while it was fetching
+        return current_list() == list_name
 
-def save_watchlist(watchlist):
-    with open(WATCHLIST_FILE, 'w') as f:
-        json.dump(watchlist, f)
+    def added(fresh):
+        if pd.isna(fresh.loc[ticker, 'price']):
+            return
+        watchlist_store.add(list_name, ticker)
+        if showing() and ticker not in watchlist:
+            watchlist.append(ticker)
+            merge_quotes(quotes, fresh)
+            refresh_watchlist(watchlist_frame, list_name, watchlist, quotes, rows, dip_chart, on_select)
+            workers.submit(lambda: sync_dips(fresh), synced)
 
-def add_ticker_to_watchlist(ticker, watchlist, watchlist_frame):
-    stock = yf.Ticker(ticker)
-    info = stock.info
-    if info and ticker not in watchlist:
-        watchlist.append(ticker)
-        save_watchlist(watchlist)
-        refresh_watchlist(watchlist_frame, watchlist)
+    def synced(fresh):
+        if showing() and ticker in watchlist:
+            merge_quotes(quotes, fresh, watchlist, DIP_COLUMNS)
+            refresh_watchlist(watchlist_frame, list_name, watchlist, quotes, rows, dip_chart, on_select)
 
-def remove_ticker(watchlist, ticker, frame, watchlist_frame):
+    workers.submit(fetch, added)
+
+def remove_ticker(list_name, watchlist, ticker, quotes, rows, watchlist_frame, dip_chart, on_select=None):
+    watchlist_store.remove(list_name, ticker)
     watchlist.remove(ticker)
-    save_watchlist(watchlist)
-    frame.destroy()
-    refresh_watchlist(watchlist_frame, watchlist)
-
-def refresh_watchlist(watchlist_frame, watchlist):
-    # Clear the previous content
-    for widget in watchlist_frame.winfo_children():
-        widget.destroy()
-
-    # Retrieve data for all tickers at once
-    if watchlist:
-        tickers = ' '.join(watchlist)  # Create a space-separated string of tickers
-        stocks = yf.Tickers(tickers)  # Retrieve data for all tickers
-        info_dict = {ticker: stocks.tickers[ticker].info for ticker in watchlist}
-
-        # Display each ticker's data
-        for ticker in watchlist:
-            info = info_dict[ticker]
-            
-            company_name = info.get('shortName', 'N/A')
-            current_price = float(info.get('currentPrice', 'N/A'))
-            previousClose = float(info.get('previousClose', 'N/A'))
-            
-            price_change_percent = round(((current_price - previousClose) / previousClose) * 100, 2)
-
-            # Create a frame for each ticker with its data
-            frame = ctk.CTkFrame(watchlist_frame, fg_color="#808080", height=50)
-            frame.pack(pady=2.5, fill='x')
-
-            # Add a remove button (X) to delete ticker from watchlist
-            remove_button = ctk.CTkButton(frame, text="✖", width=35, text_color="#505050", fg_color="transparent", command=lambda t=ticker, f=frame: remove_ticker(watchlist, t, f, watchlist_frame))
-            remove_button.place(rely=0.25, relx=0.85)
-            
-            # Display ticker in bold, with company name directly below it
-            ticker_label = tkinter.Label(frame, text=ticker, font=("Arial", 10, "bold"), anchor='w', fg="#ffffff", background="#808080")
-            ticker_label.place(x=5, y=2.5)
-            
-            if len(company_name) > 15:
-                company_name = f"{company_name[:15]}... "
-                
-            company_label = tkinter.Label(frame, text=company_name, font=("Arial", 10), anchor='w', fg="#ffffff",background="#808080")
-            company_label.place(x=5, y=22.5)
-
-            # Display price and change directly to the right of the company info
-            price_label = tkinter.Label(frame, text=f"${current_price}", font=("Arial", 10, "bold"), anchor='e', fg="#ffffff",background="#808080")
-            price_label.place(x=125, y=2.5)
-
-            if price_change_percent > 0:
-                label_colour = "green"
-            else:
-                label_colour = "red"
-                
-            change_label = ctk.CTkLabel(frame, text=f"{price_change_percent}%", font=("Arial", 12), anchor='e', text_color ="#ffffff", fg_color=f"{label_colour}", corner_radius=4, height=25)
-            change_label.place(x=130, y=22.5)
-
-def calculate_dip_data(watchlist):
-    dip_data = []
-    
-    tickers = ' '.join(watchlist)  # Create a space-separated string of tickers
-    stocks = yf.Tickers(tickers)  # Retrieve data for all tickers
-    info_dict = {ticker: stocks.tickers[ticker].info for ticker in watchlist}
-
-    for ticker in watchlist:
-        info = info_dict[ticker]
-        
-        current_price = info.get('currentPrice', 'N/A')
-        ema_200 = info.get('twoHundredDayAverage', 'N/A')
-        
-        dip_percent = ((current_price - ema_200) / ema_200) * 100    
-        dip_data.append((ticker, dip_percent))
-            
-    dip_data.sort(key=lambda x: x[1])  # Sort by dip percentage (lowest to highest)
-    
-    return dip_data
+    quotes.drop(index=ticker, inplace=True, errors='ignore')
+    refresh_watchlist(watchlist_frame, list_name, watchlist, quotes, rows, dip_chart, on_select)
+
+def _display(value):
+    return 'N/A' if value != value else float(value)  # NaN -> N/A
+
+def watchlist_rows(quotes, watchlist=None):
+    # Rows in watchlist order, read from the shared quote table
+    tickers = quotes.index if watchlist is None else [ticker for ticker in watchlist if ticker in quotes.index]
+    rows = []
+    for ticker in tickers:
+        quote = quotes.loc[ticker]
+        rows.append((ticker, quote['short_name'], _display(quote['price']), _display(quote['change_percent'])))
+    return rows
+
+# One row of the watchlist. The widgets are built once, later refreshes only
+# reconfigure the labels whose text changed. Clicking the row calls on_select
+# with its ticker.
+class WatchlistRow:
+    def __init__(self, watchlist_frame, ticker, on_remove, on_select=None):
+        self.ticker = ticker
+        self.shown = {}
+
+        # Create a frame for each ticker with its data
+        self.frame = ctk.CTkFrame(watchlist_frame, fg_color="#808080", height=50)
+        self.frame.pack(pady=2.5, fill='x')
+
+        # Add a remove button (X) to delete ticker from watchlist
+        remove_button = ctk.CTkButton(self.frame, text="✖", width=35, text_color="#505050", fg_color="transparent", command=lambda: on_remove(ticker))
+        remove_button.place(rely=0.25, relx=0.85)
+
+        # Display ticker in bold, with company name directly below it
+        ticker_label = tkinter.Label(self.frame, text=ticker, font=("Arial", 10, "bold"), anchor='w', fg="#ffffff", background="#808080")
+        ticker_label.place(x=5, y=2.5)
+
+        self.company_label = tkinter.Label(self.frame, text="", font=("Arial", 10), anchor='w', fg="#ffffff",background="#808080")
+        self.company_label.place(x=5, y=22.5)
+
+        # Display price and change directly to the right of the company info
+        self.price_label = tkinter.Label(self.frame, text="", font=("Arial", 10, "bold"), anchor='e', fg="#ffffff",background="#808080")
+        self.price_label.place(x=125, y=2.5)
+
+        self.change_label = ctk.CTkLabel(self.frame, text="", font=("Arial", 12), anchor='e', text_color ="#ffffff", fg_color="red", corner_radius=4, height=25)
+        self.change_label.place(x=130, y=22.5)
+
+        if on_select is not None:
+            for widget in (self.frame, ticker_label, self.company_label, self.price_label, self.change_label):
+                widget.bind('<Button-1>', lambda event: on_select(ticker))
+                widget.configure(cursor='hand2')
+
+    def _set(self, name, label, **options):
+        if self.shown.get(name) != options:
+            label.configure(**options)
+            self.shown[name] = options
+
+    def update(self, company_name, current_price, price_change_percent):
+        if len(company_name) > 15:
+            company_name = f"{company_name[:15]}... "
+
+        if price_change_percent != 'N/A' and price_change_percent > 0:
+            label_colour = "green"
+        else:
+            label_colour = "red"
+
+        self._set('company', self.company_label, text=company_name)
+        self._set('price', self.price_label, text=f"${current_price}")
+        self._set('change', self.change_label, text=f"{price_change_percent}%", fg_color=label_colour)
+
+    def destroy(self):
+        self.frame.destroy()
+
+def refresh_watchlist(watchlist_frame, list_name, watchlist, quotes, rows, dip_chart=None, on_select=None):
+    # Bring the row widgets in line with the watchlist: rows for removed tickers
+    # are destroyed, new tickers get a row and the rest only update their labels
+    for ticker in [ticker for ticker in rows if ticker not in watchlist]:
+        rows.pop(ticker).destroy()
+
+    on_remove = lambda ticker: remove_ticker(list_name, watchlist, ticker, quotes, rows, watchlist_frame, dip_chart, on_select)
+    for ticker, company_name, current_price, price_change_percent in watchlist_rows(quotes, watchlist):
+        if ticker not in rows:
+            rows[ticker] = WatchlistRow(watchlist_frame, ticker, on_remove, on_select)
+        rows[ticker].update(company_name, current_price, price_change_percent)
+
+    if dip_chart is not None:
+        dip_chart.update(calculate_dip_data(quotes))
+
+def calculate_dip_data(quotes):
+    # Distance from the moving average, read from the shared quote table
+    dips = quotes['dip_percent'].dropna().astype(float).sort_values()  # Sort by dip percentage (lowest to highest)
+    return list(dips.items())
 
 def set_colours(ax):
     ax.spines['bottom'].set_color('white')
@@ -130,47 +166,81 @@ def set_colours(ax):
     ax.yaxis.grid(True, color='#333333')
     ax.xaxis.grid(False)
 
+# The dip finder bar chart, kept alive while the watchlist is open. Bars and
+# their labels are reused across updates instead of clearing the axes.
+class DipFinderChart:
+    def __init__(self, frame):
+        chart_frame = ctk.CTkFrame(frame, fg_color="black")
+        chart_frame.pack(fill='both', expand=True, padx=(0, 5), pady=5)
+
+        self.canvas = FigureCanvasTkAgg(Figure(figsize=(4.5, 3.5), facecolor='black'), master=chart_frame)
+        self.canvas.get_tk_widget().pack(padx= 2.5, pady = 2.5, fill='both', expand=True)
+
+        self.ax = self.canvas.figure.add_subplot(111)
+        self.ax.set_title(f"Dip Finder (Price vs {DIP_WINDOW}d {DIP_KIND.upper()})", color="white")
+        set_colours(self.ax)
+
+        self.bars = []
+        self.texts = []
+
+    def _bar(self, index):
+        while len(self.bars) <= index:
+            bar = self.ax.add_patch(Rectangle((0, 0), 0.8, 0))
+            bar.sticky_edges.y.append(0)  # Keep bars on the axis like ax.bar does
+            self.bars.append(bar)
+            self.texts.append(self.ax.text(0, 0, "", ha='center', va='bottom', color="white"))
+        return self.bars[index], self.texts[index]
+
+    def update(self, dip_data):
+        for index, (ticker, dip_percent) in enumerate(dip_data):
+            bar, text = self._bar(index)
+            bar.set_x(index - 0.4)
+            bar.set_height(dip_percent)
+            bar.set_color("#FF5733" if dip_percent < 0 else "#33FF57")
+            bar.set_visible(True)
+
+            # Label above positive bars, on the axis for negative ones
+            text.set_position((index, max(dip_percent, 0)))
+            text.set_text(f"{dip_percent:.2f}%")
+            text.set_visible(True)
+
+        # Hide bars left over from removed tickers
+        for bar, text in zip(self.bars[len(dip_data):], self.texts[len(dip_data):]):
+            bar.set_visible(False)
+            text.set_visible(False)
+
+        self.ax.set_xticks(range(len(dip_data)), [ticker for ticker, dip_percent in dip_data])
+        self.ax.relim(visible_only=True)
+        self.ax.autoscale_view()
+        self.canvas.draw_idle()
+
 def display_dip_finder_chart(dip_data, frame):
-    chart_frame = ctk.CTkFrame(frame, fg_color="black")
-    chart_frame.pack(fill='both', expand=True, padx=(0, 5), pady=5)
-    
-    canvas = FigureCanvasTkAgg(plt.Figure(figsize=(4.5, 3.5), facecolor='black'), master=chart_frame)
-    canvas.get_tk_widget().pack(padx= 2.5, pady = 2.5, fill='both', expand=True)
-    
-    ax = canvas.figure.add_subplot(111)
-    
-    # Extract ticker names and dip percentages for plotting
-    tickers = [item[0] for item in dip_data]
-    dip_percents = [item[1] for item in dip_data]
-    
-    # Plot the vertical bar chart
-    bars = ax.bar(tickers, dip_percents, color=["#FF5733" if dp < 0 else "#33FF57" for dp in dip_percents])
-    ax.set_title("Dip Finder (Price vs 200d EMA)", color="white")
-    set_colours(ax)
-    
-    for bar, dip_percent in zip(bars, dip_percents):
-        if dip_percent > 0:
-            ax.text(
-                bar.get_x() + bar.get_width() / 2,  # Center text on the bar
-                bar.get_height(),  # Position at the top of the bar
-                f"{dip_percent:.2f}%",  # Format value with two decimals and percentage sign
-                ha='center', va='bottom', color="white"  # Center align and set color
-            )
-        else:
-            ax.text(
-                bar.get_x() + bar.get_width() / 2,  # Center text on the bar
-                0,
-                f"{dip_percent:.2f}%",
-                ha='center', va='bottom', color="white"  
-            )
-        
-    canvas.draw()
-
-def open_watchlist():
-    root = tkinter.Tk()
+    dip_chart = DipFinderChart(frame)
+    dip_chart.update(dip_data)
+    return dip_chart
+
+def open_watchlist(master, workers, on_select=None):
+    # Builds the watchlist as a window of the main application, on its event
+    # loop and worker threads (workers, see UiWorkerPool.share). Closing only
+    # hides it, the returned function shows it again with its rows, quotes and
+    # dip chart as they were. on_select(ticker) is called when a row is clicked.
+    root = tkinter.Toplevel(master)
     root.title('SigmaSight - Watchlist')
-    
-    root.protocol("WM_DELETE_WINDOW", root.destroy)
+
+    def close():
+        # Stop refreshing while hidden
+        if pending_refresh[0] is not None:
+            root.after_cancel(pending_refresh[0])
+            pending_refresh[0] = None
+        workers.new_generation()
+        root.withdraw()
+
+    def show():
+        root.deiconify()
+        root.lift()
+        refresh_quotes(refresh=False)
+
+    root.protocol("WM_DELETE_WINDOW", close)
     root.state('zoomed')
     
     root.configure(background="#23222b")
@@ -186,30 +256,113 @@ def open_watchlist():
     main_frame.grid_rowconfigure(0, weight=1)
     main_frame.grid(row=0, column=1, sticky="nsew")
 
-    watchlist = load_watchlist()
+    list_var = tkinter.StringVar(value=watchlist_store.DEFAULT_LIST)
+    watchlist = watchlist_store.symbols(list_var.get())
+
+    # Names and prices from the last session draw straight away, one concurrent
+    # fetch for every ticker then fills in the list and the dip finder
+    quotes = stored_quotes(watchlist)
+    rows = {}
 
     # Section for adding tickers
     control_section = ctk.CTkFrame(sidebar_frame, fg_color="#131313")
     control_section.pack(pady=5, padx=5, fill='x')
 
+    list_menu = ctk.CTkOptionMenu(control_section, variable=list_var, values=watchlist_store.list_names(), command=lambda name: show_list(name))
+    list_menu.pack(padx=5, pady=(5, 0))
+
+    new_list_button = ctk.CTkButton(control_section, text="New List", command=lambda: new_list())
+    new_list_button.pack(padx=5, pady=(5, 0))
+
     ticker_input_var = tkinter.StringVar()
     ticker_input = ctk.CTkEntry(control_section, textvariable=ticker_input_var)
     ticker_input.pack(padx=5, pady=(5,0))
 
-    add_button = ctk.CTkButton(control_section, text="Add to Watchlist", command=lambda: add_ticker_to_watchlist(ticker_input_var.get(), watchlist, watchlist_section))
+    # Adds have generations of their own, so a refresh does not drop them
+    adding = workers.share()
+    add_button = ctk.CTkButton(control_section, text="Add to Watchlist", command=lambda: add_ticker_to_watchlist(ticker_input_var.get(), list_var.get(), watchlist, quotes, rows, watchlist_section, dip_chart, adding, list_var.get, on_select))
     add_button.pack(padx=5, pady=5)
 
-    close_button = ctk.CTkButton(control_section, text="Close Page", command=root.destroy)
+    refresh_choice = next((label for label, seconds in REFRESH_CHOICES.items() if seconds == REFRESH_SECONDS), f"{REFRESH_SECONDS}s")
+    refresh_var = tkinter.StringVar(value=refresh_choice)
+    refresh_menu = ctk.CTkOptionMenu(control_section, variable=refresh_var, values=list(REFRESH_CHOICES), command=lambda choice: schedule_refresh())
+    refresh_menu.pack(padx=5, pady=(0, 5))
+
+    close_button = ctk.CTkButton(control_section, text="Close Page", command=close)
     close_button.pack(padx=5, pady=(0, 5))
 
     watchlist_section = ctk.CTkScrollableFrame(sidebar_frame, fg_color="#131313")
     watchlist_section.pack(padx=5, pady =5, fill='both', expand=True)
-    
-    # Display watchlist data
-    refresh_watchlist(watchlist_section, watchlist)
 
     # Dip Finder chart
-    dip_data = calculate_dip_data(watchlist)
-    display_dip_finder_chart(dip_data, main_frame)
+    dip_chart = display_dip_finder_chart(calculate_dip_data(quotes), main_frame)
+
+    # Display watchlist data
+    refresh_watchlist(watchlist_section, list_var.get(), watchlist, quotes, rows, on_select=on_select)
+
+    ## Named lists
+    def show_list(name):
+        watchlist[:] = watchlist_store.symbols(name)
+        quotes.drop(index=quotes.index, inplace=True)
+        merge_quotes(quotes, stored_quotes(watchlist))
+        refresh_watchlist(watchlist_section, name, watchlist, quotes, rows, dip_chart, on_select)
+        refresh_quotes(refresh=False)
+
+    def new_list():
+        name = ctk.CTkInputDialog(text="Name of the new watchlist:", title="New List").get_input()
+        if name and name.strip():
+            watchlist_store.create_list(name.strip())
+            list_menu.configure(values=watchlist_store.list_names())
+            list_var.set(name.strip())
+            show_list(name.strip())
+
+    ## Scheduled refresh
+    # Quotes are re-fetched on a worker thread and saved to the store, the
+    # results are merged into the table on the main thread and only the changed
+    # labels and bars are redrawn. The stored closes are synced after that and
+    # the dips redrawn when they are up to date.
+    pending_refresh = [None]
+
+    def refresh_seconds():
+        choice = refresh_var.get()
+        return REFRESH_CHOICES.get(choice, REFRESH_SECONDS)
+
+    def fetch(tickers, refresh):
+        fresh = fetch_quotes(tickers, refresh=refresh)
+        watchlist_store.save_quotes(fresh)
+        return fresh
+
+    def apply_quotes(fresh):
+        merge_quotes(quotes, fresh, watchlist)
+        refresh_watchlist(watchlist_section, list_var.get(), watchlist, quotes, rows, dip_chart, on_select)
+        schedule_refresh()
+        workers.submit(lambda: sync_dips(fresh), apply_dips)
+
+    def apply_dips(fresh):
+        merge_quotes(quotes, fresh, watchlist, DIP_COLUMNS)
+        refresh_watchlist(watchlist_section, list_var.get(), watchlist, quotes, rows, dip_chart, on_select)
+
+    def refresh_quotes(refresh=True):
+        # Called by the timer or straight away, a timer still waiting would
+        # refresh a second time
+        if pending_refresh[0] is not None:
+            root.after_cancel(pending_refresh[0])
+            pending_refresh[0] = None
+        tickers = list(watchlist)
+        if not tickers:
+            schedule_refresh()
+            return
+        # A new generation drops a fetch still running for the previous list
+        workers.new_generation()
+        workers.submit(lambda: fetch(tickers, refresh), apply_quotes, lambda error: schedule_refresh())
+
+    def schedule_refresh():
+        if pending_refresh[0] is not None:
+            root.after_cancel(pending_refresh[0])
+            pending_refresh[0] = None
+        seconds = refresh_seconds()
+        if seconds > 0:
+            pending_refresh[0] = root.after(seconds * 1000, refresh_quotes)
 
-    root.mainloop()
\ No newline at end of file
+    refresh_quotes(refresh=False)
+    return show
@@ -0,0 +1,178 @@
+import contextlib
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from cache import CACHE_DIR
+
+# Named watchlists and the last known quote for every ticker on them. Each add
+# or remove is a single transaction, and the stored names and prices let the
+# watchlist draw before any network call has finished. Also remembers the
+# tickers most recently opened on the dashboard.
+WATCHLIST_FILE = os.path.join(CACHE_DIR, 'watchlists.sqlite')
+DEFAULT_LIST = 'Default'
+MAX_RECENT = 50
+
+# Older versions kept one list as a JSON array in the working directory, it is
+# imported into the default list the first time the store is created
+LEGACY_FILES = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'watchlist_config.json'),
+    os.path.abspath('watchlist_config.json'),
+]
+
+_schema_ready = False
+
+@contextlib.contextmanager
+def connect():
+    global _schema_ready
+    if not _schema_ready:
+        create_schema()
+        _schema_ready = True
+
+    conn = sqlite3.connect(WATCHLIST_FILE, timeout=30)
+    conn.execute('PRAGMA foreign_keys = ON')
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def create_schema():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(WATCHLIST_FILE, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS lists (
+            name TEXT PRIMARY KEY,
+            created_at REAL NOT NULL
+        )''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS entries (
+            list TEXT NOT NULL REFERENCES lists (name) ON DELETE CASCADE,
+            symbol TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            added_at REAL NOT NULL,
+            PRIMARY KEY (list, symbol)
+        )''')
+    conn.execute('CREATE INDEX IF NOT EXISTS entries_position ON entries (list, position)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tickers (
+            symbol TEXT PRIMARY KEY,
+            short_name TEXT,
+            exchange TEXT,
+            price REAL,
+            previous_close REAL,
+            quoted_at REAL
+        )''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS recent (
+            symbol TEXT PRIMARY KEY,
+            viewed_at REAL NOT NULL
+        )''')
+
+    if conn.execute('SELECT COUNT(*) FROM lists').fetchone()[0] == 0:
+        conn.execute('INSERT INTO lists VALUES (?, ?)', (DEFAULT_LIST, time.time()))
+        _import_legacy(conn)
+    conn.commit()
+    conn.close()
+
+def _import_legacy(conn):
+    for path in dict.fromkeys(LEGACY_FILES):
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'r') as f:
+                symbols = json.load(f)
+        except (OSError, ValueError):
+            continue
+        now = time.time()
+        conn.executemany('INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?)',
+                         [(DEFAULT_LIST, str(symbol).upper(), position, now) for position, symbol in enumerate(symbols)])
+        return
+
+## Lists
+def list_names():
+    with connect() as conn:
+        return [name for name, in conn.execute('SELECT name FROM lists ORDER BY created_at, name')]
+
+def create_list(name):
+    with connect() as conn:
+        conn.execute('INSERT OR IGNORE INTO lists VALUES (?, ?)', (name, time.time()))
+
+def delete_list(name):
+    with connect() as conn:
+        conn.execute('DELETE FROM lists WHERE name = ?', (name,))
+
+def symbols(name=DEFAULT_LIST):
+    with connect() as conn:
+        return [symbol for symbol, in conn.execute('SELECT symbol FROM entries WHERE list = ? ORDER BY position', (name,))]
+
+def add(name, symbol):
+    # Appends to the end of the list, returns False if it was already on it
+    with connect() as conn:
+        conn.execute('INSERT OR IGNORE INTO lists VALUES (?, ?)', (name, time.time()))
+        position = conn.execute('SELECT COALESCE(MAX(position) + 1, 0) FROM entries WHERE list = ?', (name,)).fetchone()[0]
+        cursor = conn.execute('INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?)', (name, symbol.upper(), position, time.time()))
+        return cursor.rowcount == 1
+
+def remove(name, symbol):
+    with connect() as conn:
+        return conn.execute('DELETE FROM entries WHERE list = ? AND symbol = ?', (name, symbol.upper())).rowcount == 1
+
+## Recently viewed
+def viewed(symbol):
+    # Moves the symbol to the front, only the last MAX_RECENT are kept
+    with connect() as conn:
+        conn.execute('INSERT OR REPLACE INTO recent VALUES (?, ?)', (symbol.upper(), time.time()))
+        conn.execute('DELETE FROM recent WHERE symbol NOT IN (SELECT symbol FROM recent ORDER BY viewed_at DESC LIMIT ?)', (MAX_RECENT,))
+
+def recent(limit=MAX_RECENT):
+    # Most recent first
+    with connect() as conn:
+        return [symbol for symbol, in conn.execute('SELECT symbol FROM recent ORDER BY viewed_at DESC LIMIT ?', (limit,))]
+
+## Ticker metadata
+def save_quotes(quotes):
+    # Stores name, exchange and price from a quote table (see quotes.py) with
+    # the time it was fetched. Rows without a price keep what was stored before.
+    now = time.time()
+    rows = [
+        (ticker.upper(), quote['short_name'], quote['exchange'], float(quote['price']), _real(quote['previous_close']), now)
+        for ticker, quote in quotes.iterrows()
+        if pd.notna(quote['price'])
+    ]
+    with connect() as conn:
+        conn.executemany('''
+            INSERT INTO tickers VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (symbol) DO UPDATE SET
+                short_name = excluded.short_name,
+                exchange = COALESCE(excluded.exchange, tickers.exchange),
+                price = excluded.price,
+                previous_close = excluded.previous_close,
+                quoted_at = excluded.quoted_at''', rows)
+
+def _real(value):
+    return None if pd.isna(value) else float(value)
+
+def metadata(tickers):
+    # Stored name, exchange and last quote per ticker, indexed like the input.
+    # Tickers never quoted have NaN prices.
+    tickers = list(tickers)
+    columns = ['short_name', 'exchange', 'price', 'previous_close', 'quoted_at']
+    frames = []
+    with connect() as conn:
+        for chunk in range(0, len(tickers), 500):  # SQLite caps the number of parameters
+            batch = [ticker.upper() for ticker in tickers[chunk:chunk + 500]]
+            marks = ', '.join('?' * len(batch))
+            rows = conn.execute(f'SELECT symbol, {", ".join(columns)} FROM tickers WHERE symbol IN ({marks})', batch).fetchall()
+            frames.append(pd.DataFrame(rows, columns=['symbol'] + columns))
+
+    stored = pd.concat(frames).set_index('symbol') if frames else pd.DataFrame(columns=columns)
+    table = stored.reindex([ticker.upper() for ticker in tickers])
+    table.index = pd.Index(tickers, name='ticker')
+    table[['price', 'previous_close', 'quoted_at']] = table[['price', 'previous_close', 'quoted_at']].astype(float)
+    return table.replace({None: np.nan})
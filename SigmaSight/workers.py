@@ -0,0 +1,74 @@
+import queue
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Runs fetching and computation on a thread pool and hands each result back to
+# Tk on the main thread. Every submit belongs to a generation, starting a new
+# generation cancels queued work and drops results that arrive late.
+class UiWorkerPool:
+    def __init__(self, root, max_workers=8, poll_ms=25, executor=None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sigmasight')
+        self.results = queue.Queue()
+        self.generation = 0
+        self.pending = []
+        self.closed = False
+        self.root.after(self.poll_ms, self._poll)
+
+    def new_generation(self):
+        self.generation += 1
+        for future in self.pending:
+            future.cancel()
+        self.pending = []
+        return self.generation
+
+    def submit(self, work, on_done, on_error=None):
+        generation = self.generation
+        future = self.executor.submit(work)
+        future.add_done_callback(lambda f: self.results.put((generation, f, on_done, on_error)))
+        self.pending.append(future)
+        return future
+
+    def share(self):
+        # A pool on the same threads with generations of its own, for another
+        # window whose updates must not cancel this one's work
+        return UiWorkerPool(self.root, poll_ms=self.poll_ms, executor=self.executor)
+
+    def shutdown(self):
+        self.closed = True
+        if self.owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            self.new_generation()
+
+    def _poll(self):
+        if self.closed:
+            return
+        try:
+            while True:
+                try:
+                    generation, future, on_done, on_error = self.results.get_nowait()
+                except queue.Empty:
+                    break
+
+                # Results for a symbol the user has moved away from are dropped
+                if generation != self.generation or future.cancelled():
+                    continue
+                if future in self.pending:
+                    self.pending.remove(future)
+
+                try:
+                    error = future.exception()
+                    if error is None:
+                        on_done(future.result())
+                    elif on_error is not None:
+                        on_error(error)
+                    else:
+                        traceback.print_exception(error)
+                except Exception:
+                    traceback.print_exc()
+        finally:
+            self.root.after(self.poll_ms, self._poll)